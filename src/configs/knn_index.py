@@ -0,0 +1,14 @@
+import os
+
+# Directory of the nearest-neighbour index of the labeled questions, built
+# with `scripts/knn/build_knn_index.py`.
+KNN_INDEX_DIRECTORY = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "knn_index"
+)
+
+# Dimension of the hashed TF-IDF vectors.
+KNN_INDEX_DIMENSION = 256
+
+# Number of inverted lists probed first by a query. More lists are probed when
+# they hold too few questions of the accepted labels.
+KNN_INDEX_PROBED_LISTS = 8
@@ -0,0 +1,21 @@
+from typing import Dict, TypeVar
+
+DEFAULT_MODEL = "default"
+
+T = TypeVar("T")
+
+
+def get_model_setting(settings: Dict[str, T], model: str) -> T:
+    """
+    Retrieve the setting of a model from settings indexed by model name prefix,
+    the longest matching prefix first, falling back to the `default` entry.
+    """
+    matching_models = [
+        model_prefix
+        for model_prefix in settings
+        if model_prefix != DEFAULT_MODEL and model.startswith(model_prefix)
+    ]
+    if len(matching_models):
+        return settings[max(matching_models, key=len)]
+
+    return settings[DEFAULT_MODEL]
@@ -0,0 +1,37 @@
+from typing import Dict
+from models.Pricing import Pricing
+from models.Prompt import WrapperEnum
+from configs.models import DEFAULT_MODEL, get_model_setting
+
+# Public list prices in US dollars per million tokens, matched by model name
+# prefix like the rate limits. To be updated along with the provider pages.
+PRICING: Dict[WrapperEnum, Dict[str, Pricing]] = {
+    WrapperEnum.OpenAI: {
+        DEFAULT_MODEL: Pricing(input=2.50, cached_input=1.25, output=10.00),
+        "gpt-4o-mini": Pricing(input=0.15, cached_input=0.075, output=0.60),
+        "gpt-3.5-turbo": Pricing(input=0.50, output=1.50),
+    },
+    WrapperEnum.Anthropic: {
+        DEFAULT_MODEL: Pricing(input=3.00, cached_input=0.30, output=15.00),
+        "claude-3-haiku": Pricing(input=0.25, cached_input=0.03, output=1.25),
+    },
+    WrapperEnum.Mistral: {
+        DEFAULT_MODEL: Pricing(input=2.00, output=6.00),
+        "mistral-small": Pricing(input=0.20, output=0.60),
+    },
+    WrapperEnum.Google: {
+        DEFAULT_MODEL: Pricing(input=0.075, cached_input=0.01875, output=0.30),
+        "gemini-1.5-pro": Pricing(input=1.25, cached_input=0.3125, output=5.00),
+    },
+}
+
+# Minimum length of a prompt prefix cached by the providers, in tokens.
+MIN_CACHED_PREFIX_TOKENS = 1024
+
+
+def get_pricing(wrapper: WrapperEnum, model: str) -> Pricing:
+    """
+    Retrieve the price of a provider model, falling back to the provider
+    default.
+    """
+    return get_model_setting(PRICING[wrapper], model)
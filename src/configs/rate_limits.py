@@ -0,0 +1,33 @@
+from typing import Dict
+from models.Prompt import WrapperEnum
+from models.RateLimit import RateLimit
+from configs.models import DEFAULT_MODEL, get_model_setting
+
+# Conservative defaults matching the lowest paid tier of each provider. Model
+# names are matched by prefix, so "gpt-4o-mini" covers dated snapshots.
+RATE_LIMITS: Dict[WrapperEnum, Dict[str, RateLimit]] = {
+    WrapperEnum.OpenAI: {
+        DEFAULT_MODEL: RateLimit(requests_per_minute=500, tokens_per_minute=30_000),
+        "gpt-4o-mini": RateLimit(requests_per_minute=500, tokens_per_minute=200_000),
+        "gpt-3.5-turbo": RateLimit(requests_per_minute=500, tokens_per_minute=200_000),
+    },
+    WrapperEnum.Anthropic: {
+        DEFAULT_MODEL: RateLimit(requests_per_minute=50, tokens_per_minute=40_000),
+        "claude-3-haiku": RateLimit(requests_per_minute=50, tokens_per_minute=50_000),
+    },
+    WrapperEnum.Mistral: {
+        DEFAULT_MODEL: RateLimit(requests_per_minute=60, tokens_per_minute=500_000),
+    },
+    WrapperEnum.Google: {
+        DEFAULT_MODEL: RateLimit(requests_per_minute=15, tokens_per_minute=1_000_000),
+        "gemini-1.5-pro": RateLimit(requests_per_minute=2, tokens_per_minute=32_000),
+    },
+}
+
+
+def get_rate_limit(wrapper: WrapperEnum, model: str) -> RateLimit:
+    """
+    Retrieve the rate limits of a provider model, falling back to the provider
+    defaults.
+    """
+    return get_model_setting(RATE_LIMITS[wrapper], model)
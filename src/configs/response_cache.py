@@ -0,0 +1,16 @@
+import os
+
+# Directory of the on-disk LLM response cache, next to the logs.
+RESPONSE_CACHE_DIRECTORY = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "responses"
+)
+
+# Responses are evicted, least recently used first, above this size.
+RESPONSE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Responses older than this number of seconds are not reused.
+RESPONSE_CACHE_MAX_AGE = 90 * 24 * 60 * 60
+
+# Sampled responses (temperature > 0) are not cached by default, so that
+# repeated runs still draw new samples.
+RESPONSE_CACHE_SAMPLED = False
@@ -0,0 +1,16 @@
+import os
+
+# Directory of the append-only spool files of the prompt results not yet
+# written to the database.
+RESULT_SPOOL_DIRECTORY = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "spool"
+)
+
+# Maximum number of prompt results written in a single insert.
+RESULT_SINK_BATCH_SIZE = 100
+
+# Maximum number of seconds a prompt result waits for its batch to fill.
+RESULT_SINK_FLUSH_INTERVAL = 2.0
+
+# Number of seconds between two attempts while the database is unreachable.
+RESULT_SINK_RETRY_DELAY = 5.0
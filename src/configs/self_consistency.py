@@ -0,0 +1,6 @@
+# Number of samples drawn for each question before the agreement of the
+# samples is first checked.
+MIN_SAMPLES = 3
+# Share of the samples agreeing on the majority label above which no more
+# samples are drawn for the question.
+AGREEMENT_THRESHOLD = 0.8
@@ -0,0 +1,4 @@
+# If True, the LLM answers are validated with guardrails instead of the
+# precompiled validators of `prompting/validators.py`. The guardrails hub
+# validators (ValidChoices, ValidRange) must then be installed.
+USE_GUARDRAILS = False
@@ -15,6 +15,9 @@ from tests.fixtures.search_tool import (
     search_tool_question_links_html,
 )
 from tests.fixtures.metrics.confidence_data import confidence_data
+from tests.fixtures.databases import sqlite_client
+from tests.fixtures.batch_api import batch_api_server
+from tests.fixtures.run_prompt import prompt_runner
 from tests.fixtures.prompts.prompt import (
     few_shot_prompt,
     few_shot_cot_prompt,
@@ -23,9 +26,13 @@ from tests.fixtures.prompts.prompt import (
     real_prompt_commerce_et_artisanat,
     real_prompt_enseignement,
 )
-
+from tests.fixtures.prompts.prompt_run import prompt_and_run
 
 __all__ = [
+    "prompt_runner",
+    "prompt_and_run",
+    "batch_api_server",
+    "sqlite_client",
     "real_prompt_enseignement",
     "real_prompt_commerce_et_artisanat",
     "real_prompt_environnement",
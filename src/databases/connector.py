@@ -1,12 +1,20 @@
+import os
 from models.ExportFormat import ExportFormat
 from databases.mongo_connector import Mongo
+from databases.sqlite_connector import SQLite
 
 
 class Connector:
     """
     Wrapper to connect to external export format.
+
+    The embedded SQLite backend is used either when explicitly requested or
+    when the `DATABASE_BACKEND` environment variable is set to `sqlite`.
     """
 
     def __init__(self, export_format: ExportFormat):
-        if export_format.MONGO:
+        backend = os.getenv("DATABASE_BACKEND", ExportFormat.MONGO.value)
+        if export_format == ExportFormat.SQLITE or backend == ExportFormat.SQLITE.value:
+            self.client = SQLite()
+        else:
             self.client = Mongo()
@@ -2,18 +2,37 @@ import os
 import logging
 from bson import ObjectId
 from models.Batch import Batch
-from models.Theme import Theme
+from models.Theme import SubThemes, Theme
 from dotenv import load_dotenv
 from pymongo.cursor import Cursor
 from models.Question import Question
+from pymongo.errors import BulkWriteError
 from pymongo.results import InsertOneResult
 from utils.helpers import flatten_list
-from typing import Any, Dict, List, Optional
+from prompting.example_store import invalidate_example_store
+from utils.theme_tree import (
+    STRUCTURAL_THEME_FIELDS,
+    ThemeTree,
+    cached_theme_tree,
+    changed_themes,
+    invalidate_theme_tree,
+)
+from typing import Any, Dict, List, Optional, Set
 from pymongo.command_cursor import CommandCursor
-from models.Prompt import Prompt, PromptResult, PromptRun
-from pymongo import MongoClient, ReturnDocument, ASCENDING, collation
+from models.Prompt import FailedGenerations, Prompt, PromptResult, PromptRun
+from pymongo import (
+    MongoClient,
+    ReturnDocument,
+    UpdateMany,
+    UpdateOne,
+    ASCENDING,
+    collation,
+)
 
 load_dotenv()
+
+DUPLICATE_KEY_ERROR_CODE = 11000
+
 french_collation = collation.Collation(locale="fr", strength=1)
 
 
@@ -37,6 +56,7 @@ class Mongo:
         self.prompts_collection = self.client["prompts"]["Prompts"]
         self.prompt_runs_collection = self.client["prompts"]["PromptRuns"]
         self.prompt_results_collection = self.client["prompts"]["PromptResults"]
+        self.failed_generations_collection = self.client["prompts"]["FailedGenerations"]
         self.batches_collection = self.client["batches"]["Batches"]
         try:
             self.client.admin.command("ping")
@@ -60,13 +80,108 @@ class Mongo:
         """
 
         collection = self.themes_collection
-        theme = collection.find_one_and_update(
+        previous_theme = collection.find_one_and_update(
             {"unique_identifier": theme.unique_identifier},
             {"$set": theme.model_dump()},
             upsert=True,
-            return_document=ReturnDocument.AFTER,
+            return_document=ReturnDocument.BEFORE,
         )
-        return theme
+        invalidate_theme_tree()
+
+        if previous_theme is not None and (
+            previous_theme["name"] != theme.name
+            or previous_theme["parent_theme_identifier"]
+            != theme.parent_theme_identifier
+        ):
+            self.refresh_question_theme_ancestors(theme.unique_identifier)
+
+        return collection.find_one({"unique_identifier": theme.unique_identifier})
+
+    def bulk_upsert_themes(self, themes: List[Theme], diff: bool = False) -> int:
+        """
+        Insert or update many themes with a single unordered bulk write.
+
+        Parameters
+        ----------
+        themes : List[Theme]
+            The themes to insert or update, e.g. from `flatten_hierarchy`.
+        diff : bool, default=False
+            If True, only write the themes which are new or whose name, level or
+            parent changed, and keep the `total` of existing themes.
+
+        The theme ancestors of the questions are refreshed whenever existing
+        themes are modified.
+
+        Returns
+        -------
+        int
+            The number of inserted or modified themes.
+        """
+        collection = self.themes_collection
+        moved_existing_themes = False
+
+        if diff:
+            existing_themes = list(
+                collection.find(
+                    {},
+                    {field: 1 for field in STRUCTURAL_THEME_FIELDS}
+                    | {"unique_identifier": 1},
+                )
+            )
+            existing_identifiers = {
+                existing_theme["unique_identifier"]
+                for existing_theme in existing_themes
+            }
+            themes = changed_themes(themes, existing_themes)
+            moved_existing_themes = any(
+                theme.unique_identifier in existing_identifiers for theme in themes
+            )
+            operations = [
+                UpdateOne(
+                    {"unique_identifier": theme.unique_identifier},
+                    {
+                        "$set": theme.model_dump(
+                            include=set(STRUCTURAL_THEME_FIELDS) | {"unique_identifier"}
+                        ),
+                        "$setOnInsert": {"total": theme.total},
+                    },
+                    upsert=True,
+                )
+                for theme in themes
+            ]
+        else:
+            operations = [
+                UpdateOne(
+                    {"unique_identifier": theme.unique_identifier},
+                    {"$set": theme.model_dump()},
+                    upsert=True,
+                )
+                for theme in themes
+            ]
+
+        if not len(operations):
+            return 0
+
+        result = collection.bulk_write(operations, ordered=False)
+        invalidate_theme_tree()
+
+        # Without diff, modified themes may have been renamed or moved.
+        if moved_existing_themes or (not diff and result.modified_count > 0):
+            self.refresh_question_theme_ancestors()
+
+        return result.upserted_count + result.modified_count
+
+    def get_theme_tree(self) -> ThemeTree:
+        """
+        Retrieve the in-memory themes tree. It is loaded once per process from the
+        Themes collection and rebuilt after a theme is updated.
+
+        Returns
+        -------
+        ThemeTree
+            The themes tree.
+        """
+        return cached_theme_tree(lambda: self.themes_collection.find({}))
 
     def aggregate_themes(self, filters: List[Dict[str, Any]]) -> CommandCursor:
         """
@@ -143,38 +258,30 @@ class Mongo:
             A list of dictionaries representing the sub-themes. If `flatten` is True, the list
             is flattened to include nested sub-themes at the top level.
         """
-        collection = self.themes_collection
-        children_themes = collection.find({"parent_theme_identifier": theme_identifier})
-
-        themes = []
-
-        for children_theme in children_themes:
-            sub_themes = self.get_sub_themes_list_from_theme(
-                children_theme["unique_identifier"], themes
-            )
-            if len(sub_themes):
-                themes.append(
-                    {
-                        "name": children_theme["name"],
-                        "level": children_theme["level"],
-                        "total": children_theme["total"],
-                        "children": sub_themes,
-                    }
-                )
-            else:
-                themes.append(
-                    {
-                        "name": children_theme["name"],
-                        "level": children_theme["level"],
-                        "total": children_theme["total"],
-                    }
-                )
+        themes = self.get_theme_tree().sub_themes(theme_identifier)
 
         if flatten:
             return flatten_list(themes, "children")
 
         return themes
 
+    def expand_sub_themes(self, theme_identifiers: List[str]) -> Dict[str, SubThemes]:
+        """
+        Retrieves the sub-themes of several themes at once, from the in-memory
+        themes tree (a single query for the whole hierarchy).
+
+        Parameters
+        ----------
+        theme_identifiers : List[str]
+            The unique identifiers of the parent themes.
+
+        Returns
+        ----------
+        Dict[str, SubThemes]
+            The nested and flattened sub-themes, indexed by parent theme identifier.
+        """
+        return self.get_theme_tree().expand(theme_identifiers)
+
     def get_themes_by_level(self, level: int) -> Cursor:
         """
         Returns a Cursor of the themes of the given level (from 0 to 3), sorted ASC by name.
@@ -206,9 +313,8 @@ class Mongo:
         Theme
             The parent theme.
         """
-        child_theme = self.get_theme(
-            {"name": child_theme_name, "level": base_theme_level}
-        )
+        theme_tree = self.get_theme_tree()
+        child_theme = theme_tree.get(child_theme_name, base_theme_level)
 
         if child_theme.parent_theme_identifier:
             parent_theme = self.get_parent_theme(
@@ -248,24 +354,19 @@ class Mongo:
         Theme
             A parent theme.
         """
-        parent_theme = self.get_theme(
-            {
-                "unique_identifier": parent_theme_identifier,
-                "level": base_theme_level + 1,
-            }
-        )
+        theme_tree = self.get_theme_tree()
+        parent_theme = theme_tree.get_by_identifier(parent_theme_identifier)
 
-        if parent_theme.level < 3 and parent_theme.level != stop_at_level:
-            while parent_theme.parent_theme_identifier:
-                parent_theme = self.get_theme(
-                    {"unique_identifier": parent_theme.parent_theme_identifier}
-                )
+        if parent_theme.level != base_theme_level + 1:
+            raise ValueError(
+                "There are no theme corresponding to your query in the database."
+            )
 
-        return parent_theme
+        return theme_tree.ancestor_at(parent_theme, stop_at_level)
 
     def upsert_question(self, question: Question) -> Question | None:
         """
-        Add a question to the database.
+        Add a question to the database, along with the ancestors of its theme.
 
         Parameters
         ----------
@@ -273,14 +374,76 @@ class Mongo:
             A question and its associated metadata.
         """
         collection = self.questions_collection
+        question.theme_ancestors = self.get_theme_tree().question_theme_ancestors(
+            question.theme
+        )
         question = collection.find_one_and_update(
             {"id": question.id},
             {"$set": question.model_dump()},
             upsert=True,
             return_document=ReturnDocument.AFTER,
         )
+        # The new question is a candidate few-shot example.
+        invalidate_example_store()
         return question
 
+    def refresh_question_theme_ancestors(
+        self, theme_identifier: str | None = None
+    ) -> int:
+        """
+        Recompute the theme ancestors stored on questions, with one update per
+        level 0 theme sent in a single bulk write.
+
+        Parameters
+        ----------
+        theme_identifier : str | None, default=None
+            Only refresh the questions tagged with this theme or one of its
+            descendants. Refresh every question by default.
+
+        Returns
+        -------
+        int
+            The number of modified questions.
+        """
+        theme_tree = self.get_theme_tree()
+        if theme_identifier is None:
+            themes = theme_tree.get_level(0)
+        else:
+            theme = theme_tree.get_by_identifier(theme_identifier)
+            themes = [theme] + theme_tree.descendants(theme)
+
+        operations = [
+            UpdateMany(
+                {"theme": theme.name},
+                {
+                    "$set": {
+                        "theme_ancestors": {
+                            level: ancestor.model_dump()
+                            for level, ancestor in theme_tree.theme_ancestors(
+                                theme
+                            ).items()
+                        }
+                    }
+                },
+            )
+            for theme in themes
+            if theme.level == 0
+        ]
+        if not len(operations):
+            return 0
+
+        result = self.questions_collection.bulk_write(operations, ordered=False)
+        return result.modified_count
+
+    def create_question_theme_indexes(self) -> None:
+        """
+        Create the indexes used to filter questions by theme or by theme ancestor.
+        """
+        collection = self.questions_collection
+        collection.create_index("theme")
+        for level in range(1, 4):
+            collection.create_index(f"theme_ancestors.{level}.name")
+
     def get_question(self, filters: Dict[str, Any]) -> Optional[Question]:
         """
         Retrieve a single question matching the given filters.
@@ -341,6 +504,36 @@ class Mongo:
         collection = self.questions_collection
         return collection.aggregate(filters)
 
+    def get_question_ids_by_theme(self, themes: List[str]) -> Dict[str, List[str]]:
+        """
+        Retrieve the IDs of the non empty questions of the given themes, with a
+        single aggregation.
+
+        Parameters
+        ----------
+        themes: List[str]
+            The themes names (level 0).
+
+        Returns
+        -------
+        Dict[str, List[str]]
+            The sorted question IDs indexed by theme name.
+        """
+        collection = self.questions_collection
+        groups = collection.aggregate(
+            [
+                {
+                    "$match": {
+                        "theme": {"$in": themes},
+                        "question_text": {"$ne": ""},
+                        "congressman": {"$ne": None},
+                    }
+                },
+                {"$group": {"_id": "$theme", "question_ids": {"$push": "$id"}}},
+            ]
+        )
+        return {group["_id"]: sorted(group["question_ids"]) for group in groups}
+
     def get_random_questions(
         self,
         number_of_questions: int = 1000,
@@ -404,6 +597,51 @@ class Mongo:
         collection = self.questions_collection
         return collection.count_documents({"theme": theme})
 
+    def count_questions_by_theme(self) -> Dict[str, int]:
+        """
+        Count the questions of each theme in a single aggregation.
+
+        Returns
+        -------
+        Dict[str, int]
+            The number of questions indexed by theme name (level 0).
+        """
+        collection = self.questions_collection
+        counts = collection.aggregate(
+            [{"$group": {"_id": "$theme", "total": {"$sum": 1}}}]
+        )
+        return {count["_id"]: count["total"] for count in counts}
+
+    def update_theme_totals(self, totals: Dict[str, int]) -> int:
+        """
+        Write the `total` of several themes with a single bulk write.
+
+        Parameters
+        ----------
+        totals: Dict[str, int]
+            The totals indexed by theme unique identifier.
+
+        Returns
+        -------
+        int
+            The number of modified themes.
+        """
+        if not len(totals):
+            return 0
+
+        collection = self.themes_collection
+        result = collection.bulk_write(
+            [
+                UpdateOne(
+                    {"unique_identifier": unique_identifier}, {"$set": {"total": total}}
+                )
+                for unique_identifier, total in totals.items()
+            ],
+            ordered=False,
+        )
+        invalidate_theme_tree()
+        return result.modified_count
+
     def check_question(self, question_id: str) -> bool:
         """
         Verify if the question is already registered in the database.
@@ -524,6 +762,35 @@ class Mongo:
             "There are no prompt result corresponding to your query in the database."
         )
 
+    def create_prompt_result_indexes(self) -> None:
+        """
+        Create the indexes used to find the questions already answered, or which
+        failed, in a run.
+        """
+        for collection in [
+            self.prompt_results_collection,
+            self.failed_generations_collection,
+        ]:
+            collection.create_index([("run_id", ASCENDING), ("question_id", ASCENDING)])
+
+    def get_answered_question_ids(self, run_id: str) -> Set[str]:
+        """
+        Retrieve the IDs of the questions with a prompt result in a prompt run,
+        with a single query covered by the (run_id, question_id) index.
+
+        Parameters
+        ----------
+        run_id: str
+            The ID of the prompt run.
+
+        Returns
+        -------
+        Set[str]
+            The IDs of the answered questions.
+        """
+        collection = self.prompt_results_collection
+        return set(collection.distinct("question_id", {"run_id": run_id}))
+
     def add_prompt_result(self, prompt_result: PromptResult) -> InsertOneResult:
         """
         Inserts a new prompt result document into the PromptResults collection.
@@ -541,6 +808,116 @@ class Mongo:
         collection = self.prompt_results_collection
         return collection.insert_one(prompt_result.model_dump())
 
+    def record_failed_generation(self, failed_generation: FailedGenerations) -> None:
+        """
+        Record a failed generation in the dead-letter collection, or increment
+        the attempts of a question which already failed in the same run.
+
+        Parameters
+        ----------
+        failed_generation: FailedGenerations
+            The failure of the last attempt.
+        """
+        collection = self.failed_generations_collection
+        collection.update_one(
+            {
+                "run_id": failed_generation.run_id,
+                "question_id": failed_generation.question_id,
+            },
+            {
+                "$set": failed_generation.model_dump(
+                    include={
+                        "error_class",
+                        "error_message",
+                        "last_failed_at",
+                        "duration",
+                    }
+                ),
+                "$setOnInsert": {
+                    "first_failed_at": failed_generation.first_failed_at,
+                },
+                "$inc": {"attempts": failed_generation.attempts},
+            },
+            upsert=True,
+        )
+
+    def get_failed_generations(
+        self, run_id: str, max_attempts: int | None = None
+    ) -> List[FailedGenerations]:
+        """
+        Retrieve the failed generations of a prompt run.
+
+        Parameters
+        ----------
+        run_id: str
+            The ID of the prompt run.
+        max_attempts: int | None, default=None
+            If provided, only retrieve the questions attempted fewer times.
+
+        Returns
+        -------
+        List[FailedGenerations]
+            The failed generations.
+        """
+        filters: Dict[str, Any] = {"run_id": run_id}
+        if max_attempts is not None:
+            filters["attempts"] = {"$lt": max_attempts}
+
+        collection = self.failed_generations_collection
+        return [FailedGenerations(**failure) for failure in collection.find(filters)]
+
+    def delete_failed_generations(self, run_id: str, question_ids: List[str]) -> int:
+        """
+        Remove the questions of a prompt run from the dead-letter collection,
+        once they succeeded.
+
+        Returns
+        -------
+        int
+            The number of removed failed generations.
+        """
+        collection = self.failed_generations_collection
+        result = collection.delete_many(
+            {"run_id": run_id, "question_id": {"$in": question_ids}}
+        )
+        return result.deleted_count
+
+    def add_prompt_results(self, documents: List[Dict[str, Any]]) -> int:
+        """
+        Insert several prompt results with a single unordered bulk insert.
+        Documents whose `_id` is already in the collection are skipped, so that
+        a batch can be safely written again.
+
+        Parameters
+        ----------
+        documents: List[Dict[str, Any]]
+            The prompt results, with an `_id` set by the caller (an ObjectId or
+            its string representation).
+
+        Returns
+        -------
+        int
+            The number of inserted prompt results.
+
+        Raises
+        ------
+        BulkWriteError
+            If a write fails for another reason than a duplicate `_id`.
+        """
+        collection = self.prompt_results_collection
+        documents = [
+            {**document, "_id": ObjectId(document["_id"])} for document in documents
+        ]
+        try:
+            return len(collection.insert_many(documents, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            if e.details.get("writeConcernErrors") or any(
+                error["code"] != DUPLICATE_KEY_ERROR_CODE
+                for error in e.details["writeErrors"]
+            ):
+                raise
+            return e.details["nInserted"]
+
     def add_prompt_run(self, prompt_run: PromptRun) -> InsertOneResult:
         """
         Inserts a new prompt run document into the PromptRuns collection.
@@ -0,0 +1,618 @@
+import os
+import re
+import json
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from bson import ObjectId
+from models.Theme import SubThemes, Theme
+from dotenv import load_dotenv
+from configs.env import get_src_path
+from models.Prompt import FailedGenerations, Prompt
+from utils.helpers import flatten_list
+from utils.theme_tree import ThemeTree, cached_theme_tree, invalidate_theme_tree
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+load_dotenv()
+
+COLLECTIONS = {
+    "themes": ["name", "level", "unique_identifier", "parent_theme_identifier"],
+    "questions": [
+        "id",
+        "theme",
+        "theme_ancestors.1.name",
+        "theme_ancestors.2.name",
+        "theme_ancestors.3.name",
+    ],
+    "prompts": ["unique_identifier"],
+    "prompt_runs": ["name", "batch_id"],
+    "prompt_results": ["run_id", "question_id"],
+    "failed_generations": ["run_id", "question_id"],
+    "batches": [],
+}
+
+
+def _json_path(field: str) -> str:
+    """
+    Translate a Mongo dotted field name into a SQLite JSON path.
+
+    Parameters
+    ----------
+    field: str
+        A Mongo field name, e.g. `parameters.model`.
+
+    Returns
+    -------
+    str
+        The corresponding JSON path, e.g. `$."parameters"."model"`.
+    """
+    return "$." + ".".join(f'"{part}"' for part in field.split("."))
+
+
+def _field_expression(field: str) -> str:
+    if field == "_id":
+        return "_id"
+    return f"json_extract(document, '{_json_path(field)}')"
+
+
+def _to_sql_value(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return value
+
+
+def _build_condition(field: str, condition: Any) -> Tuple[str, List[Any]]:
+    """
+    Build the SQL condition matching a single Mongo field filter.
+
+    Parameters
+    ----------
+    field: str
+        The filtered field.
+    condition: Any
+        Either a plain value (equality) or a dictionary of Mongo operators.
+
+    Returns
+    -------
+    Tuple[str, List[Any]]
+        The SQL condition and its parameters.
+
+    Raises
+    ------
+    NotImplementedError
+        If the filter uses an operator that is not supported by the backend.
+    """
+    expression = _field_expression(field)
+
+    if not isinstance(condition, dict):
+        if condition is None:
+            return f"{expression} IS NULL", []
+        return f"{expression} = ?", [_to_sql_value(condition)]
+
+    clauses = []
+    parameters = []
+    for operator, value in condition.items():
+        match operator:
+            case "$eq":
+                clause, params = _build_condition(field, value)
+            case "$ne":
+                if value is None:
+                    clause, params = f"{expression} IS NOT NULL", []
+                else:
+                    clause = f"({expression} IS NULL OR {expression} != ?)"
+                    params = [_to_sql_value(value)]
+            case "$in" | "$nin":
+                values = [_to_sql_value(v) for v in value]
+                if not values:
+                    clause = "0" if operator == "$in" else "1"
+                else:
+                    negation = "NOT " if operator == "$nin" else ""
+                    placeholders = ", ".join("?" for _ in values)
+                    clause = f"{expression} {negation}IN ({placeholders})"
+                params = values
+            case "$gt" | "$gte" | "$lt" | "$lte":
+                sql_operator = {"$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+                clause = f"{expression} {sql_operator[operator]} ?"
+                params = [_to_sql_value(value)]
+            case "$regex":
+                clause, params = f"{expression} REGEXP ?", [value]
+            case "$exists":
+                clause = f"{expression} IS {'NOT ' if value else ''}NULL"
+                params = []
+            case _:
+                raise NotImplementedError(
+                    f"The '{operator}' operator is not supported by the SQLite backend."
+                )
+        clauses.append(clause)
+        parameters += params
+
+    return " AND ".join(clauses), parameters
+
+
+def build_where_clause(filters: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    """
+    Translate a Mongo query into a SQL `WHERE` clause.
+
+    Parameters
+    ----------
+    filters: Dict[str, Any]
+        A Mongo query using equality, `$in`, `$nin`, `$ne`, `$regex`,
+        comparison, `$exists`, `$and` and `$or` filters.
+
+    Returns
+    -------
+    Tuple[str, List[Any]]
+        The SQL condition and its parameters.
+    """
+    clauses = []
+    parameters = []
+
+    for field, condition in filters.items():
+        if field in ("$and", "$or"):
+            sub_clauses = []
+            for sub_filters in condition:
+                sub_clause, sub_parameters = build_where_clause(sub_filters)
+                sub_clauses.append(f"({sub_clause})")
+                parameters += sub_parameters
+            joiner = " AND " if field == "$and" else " OR "
+            clauses.append(f"({joiner.join(sub_clauses)})")
+        else:
+            clause, params = _build_condition(field, condition)
+            clauses.append(clause)
+            parameters += params
+
+    if not clauses:
+        return "1", []
+
+    return " AND ".join(clauses), parameters
+
+
+def _regexp(pattern: str, value: Any) -> bool:
+    if value is None:
+        return False
+    return re.search(pattern, str(value)) is not None
+
+
+class SQLite:
+    """
+    Embedded SQLite database exposing the read helpers of the `Mongo` wrapper.
+
+    Every collection is stored as a table of JSON documents, with expression
+    indexes on the fields used by the metrics and prompting modules. Mongo
+    queries are translated to SQL, so the same filters can be used with both
+    backends.
+    """
+
+    def __init__(self, database_path: str | None = None) -> None:
+        self.database_path = database_path or os.getenv(
+            "SQLITE_DATABASE_PATH",
+            f"{get_src_path(Path(__file__))}/data/parl_ia_ment.sqlite",
+        )
+        self.lock = threading.Lock()
+        self.client = sqlite3.connect(self.database_path, check_same_thread=False)
+        self.client.row_factory = sqlite3.Row
+        self.client.create_function("REGEXP", 2, _regexp, deterministic=True)
+        self._create_tables()
+        logging.debug(f"Connexion réussie à SQLite ({self.database_path}).")
+
+    def _create_tables(self) -> None:
+        with self.lock, self.client:
+            for collection, indexed_fields in COLLECTIONS.items():
+                self.client.execute(
+                    f"CREATE TABLE IF NOT EXISTS {collection} "
+                    "(_id TEXT PRIMARY KEY, document TEXT NOT NULL)"
+                )
+                for field in indexed_fields:
+                    self.client.execute(
+                        f"CREATE INDEX IF NOT EXISTS idx_{collection}_{field.replace('.', '_')} "
+                        f"ON {collection} ({_field_expression(field)})"
+                    )
+
+    def _find(
+        self,
+        collection: str,
+        filters: Dict[str, Any],
+        order_by: str | None = None,
+        limit: int | None = None,
+    ) -> List[Dict[str, Any]]:
+        where, parameters = build_where_clause(filters)
+        query = f"SELECT _id, document FROM {collection} WHERE {where}"
+        if order_by is not None:
+            query += f" ORDER BY {order_by}"
+        if limit is not None:
+            query += " LIMIT ?"
+            parameters.append(limit)
+
+        with self.lock:
+            rows = self.client.execute(query, parameters).fetchall()
+
+        documents = []
+        for row in rows:
+            document = json.loads(row["document"])
+            document["_id"] = row["_id"]
+            documents.append(document)
+
+        return documents
+
+    def _find_one(
+        self, collection: str, filters: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        documents = self._find(collection, filters, limit=1)
+        return documents[0] if documents else None
+
+    def _match_pipeline(
+        self, collection: str, pipeline: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Run an aggregation pipeline made of `$match`, `$sample` and `$limit` stages.
+        """
+        filters = []
+        order_by = None
+        limit = None
+        for stage in pipeline:
+            ((operator, value),) = stage.items()
+            match operator:
+                case "$match":
+                    filters.append(value)
+                case "$sample":
+                    order_by, limit = "RANDOM()", value["size"]
+                case "$limit":
+                    limit = value
+                case _:
+                    raise NotImplementedError(
+                        f"The '{operator}' stage is not supported by the SQLite backend."
+                    )
+
+        return self._find(
+            collection, {"$and": filters} if filters else {}, order_by, limit
+        )
+
+    def insert_documents(
+        self, collection: str, documents: Iterable[Dict[str, Any]]
+    ) -> int:
+        """
+        Insert or replace documents in a collection, in a single transaction.
+
+        Parameters
+        ----------
+        collection: str
+            Name of the collection (e.g. `questions`, `prompt_results`).
+        documents: Iterable[Dict[str, Any]]
+            The documents to store. Documents without `_id` get a new ObjectId.
+
+        Returns
+        -------
+        int
+            The number of documents written.
+        """
+        rows = []
+        for document in documents:
+            document = dict(document)
+            document_id = str(document.pop("_id", None) or ObjectId())
+            rows.append((document_id, json.dumps(document, default=str)))
+
+        with self.lock, self.client:
+            self.client.executemany(
+                f"INSERT OR REPLACE INTO {collection} (_id, document) VALUES (?, ?)",
+                rows,
+            )
+
+        if collection == "themes":
+            invalidate_theme_tree()
+
+        return len(rows)
+
+    def clear_collection(self, collection: str) -> None:
+        """
+        Remove all the documents of a collection.
+        """
+        with self.lock, self.client:
+            self.client.execute(f"DELETE FROM {collection}")
+
+    def query(
+        self, sql: str, parameters: Tuple[Any, ...] | List[Any] = ()
+    ) -> List[Dict[str, Any]]:
+        """
+        Run a raw SQL query, for group-by analytics that have no Mongo counterpart.
+
+        Parameters
+        ----------
+        sql: str
+            The SQL query. Document fields are available through
+            `json_extract(document, '$.field')`.
+        parameters: Tuple[Any, ...] | List[Any], default=()
+            The query parameters.
+
+        Returns
+        -------
+        List[Dict[str, Any]]
+            The result rows.
+        """
+        with self.lock:
+            rows = self.client.execute(sql, parameters).fetchall()
+
+        return [dict(row) for row in rows]
+
+    def get_theme_tree(self) -> ThemeTree:
+        """
+        Retrieve the in-memory themes tree. See `Mongo.get_theme_tree`.
+        """
+        return cached_theme_tree(lambda: self._find("themes", {}))
+
+    def aggregate_themes(self, filters: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Run a `$match`/`$sample`/`$limit` pipeline on themes. See `Mongo.aggregate_themes`.
+        """
+        return self._match_pipeline("themes", filters)
+
+    def get_theme(self, filters: Dict[str, Any]) -> Optional[Theme]:
+        """
+        Retrieve a single theme matching the given filters. See `Mongo.get_theme`.
+        """
+        theme = self._find_one("themes", filters)
+        if theme:
+            return Theme(**theme)
+        raise ValueError(
+            "There are no theme corresponding to your query in the database."
+        )
+
+    def get_themes(self, filters: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Retrieve themes matching the given filters.
+        """
+        return self._find("themes", filters)
+
+    def get_themes_by_level(self, level: int) -> List[Dict[str, Any]]:
+        """
+        Returns the themes of the given level (from 0 to 3), sorted ASC by name.
+        """
+        return self._find(
+            "themes",
+            {"level": level},
+            order_by=f"{_field_expression('name')} COLLATE NOCASE",
+        )
+
+    def get_sub_themes_list_from_theme(
+        self, theme_identifier: str, flatten: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Retrieves a list of sub-themes for a given theme identifier.
+        """
+        themes = self.get_theme_tree().sub_themes(theme_identifier)
+
+        if flatten:
+            return flatten_list(themes, "children")
+
+        return themes
+
+    def expand_sub_themes(self, theme_identifiers: List[str]) -> Dict[str, SubThemes]:
+        """
+        Retrieves the nested and flattened sub-themes of several themes at once.
+        """
+        return self.get_theme_tree().expand(theme_identifiers)
+
+    def get_parent_theme_from_child_theme_name(
+        self, child_theme_name: str, stop_at_level: int = 3, base_theme_level: int = 0
+    ) -> Theme:
+        """
+        Retrieve the parent theme given a child theme name.
+        """
+        child_theme = self.get_theme_tree().get(child_theme_name, base_theme_level)
+
+        if child_theme.parent_theme_identifier:
+            return self.get_parent_theme(
+                child_theme.parent_theme_identifier,
+                stop_at_level=stop_at_level,
+                base_theme_level=base_theme_level,
+            )
+
+        raise ValueError(
+            "There are corresponding parent theme to your query in the database."
+        )
+
+    def get_parent_theme(
+        self,
+        parent_theme_identifier: str,
+        stop_at_level: int = 3,
+        base_theme_level: int = 0,
+    ) -> Theme:
+        """
+        Retrieve the top level theme of a theme. See `Mongo.get_parent_theme`.
+        """
+        theme_tree = self.get_theme_tree()
+        parent_theme = theme_tree.get_by_identifier(parent_theme_identifier)
+
+        if parent_theme.level != base_theme_level + 1:
+            raise ValueError(
+                "There are no theme corresponding to your query in the database."
+            )
+
+        return theme_tree.ancestor_at(parent_theme, stop_at_level)
+
+    def get_question(self, filters: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Retrieve a single question matching the given filters.
+        """
+        return self._find_one("questions", filters)
+
+    def get_questions(
+        self, filters: Dict[str, Any], projection: Optional[Dict[str, int]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Retrieve questions matching the given filters.
+        """
+        return self._find("questions", filters)
+
+    def aggregate_questions(
+        self, filters: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Run a `$match`/`$sample`/`$limit` pipeline on questions.
+        """
+        return self._match_pipeline("questions", filters)
+
+    def get_question_ids_by_theme(self, themes: List[str]) -> Dict[str, List[str]]:
+        """
+        Retrieve the IDs of the non empty questions of the given themes. See
+        `Mongo.get_question_ids_by_theme`.
+        """
+        where, parameters = build_where_clause(
+            {
+                "theme": {"$in": themes},
+                "question_text": {"$ne": ""},
+                "congressman": {"$ne": None},
+            }
+        )
+        rows = self.query(
+            f"SELECT {_field_expression('theme')} AS theme, "
+            f"{_field_expression('id')} AS id FROM questions WHERE {where} "
+            "ORDER BY id",
+            parameters,
+        )
+
+        question_ids_by_theme: Dict[str, List[str]] = {}
+        for row in rows:
+            question_ids_by_theme.setdefault(row["theme"], []).append(row["id"])
+
+        return question_ids_by_theme
+
+    def get_random_questions(
+        self,
+        number_of_questions: int = 1000,
+        legislature: Optional[int] = None,
+        accepted_themes: Optional[List[str]] = None,
+        remove_empty_questions: bool = True,
+    ) -> List[Dict[str, Any]]:
+        """
+        Sample a set of random questions. See `Mongo.get_random_questions`.
+        """
+        pipeline = []
+
+        if accepted_themes:
+            pipeline.append({"$match": {"theme": {"$in": accepted_themes}}})
+
+        if legislature is not None:
+            pipeline.append({"$match": {"id": {"$regex": rf"{legislature}-.*"}}})
+
+        if remove_empty_questions:
+            pipeline.append({"$match": {"question_text": {"$ne": ""}}})
+
+        pipeline.append({"$match": {"congressman": {"$ne": None}}})
+
+        pipeline.append({"$sample": {"size": number_of_questions}})
+
+        return self._match_pipeline("questions", pipeline)
+
+    def count_documents_by_theme(self, theme: str) -> int:
+        """
+        Count documents based on a specified theme name.
+        """
+        rows = self.query(
+            f"SELECT COUNT(*) AS count FROM questions "
+            f"WHERE {_field_expression('theme')} = ?",
+            (theme,),
+        )
+        return rows[0]["count"]
+
+    def count_questions_by_theme(self) -> Dict[str, int]:
+        """
+        Count the questions of each theme in a single query.
+        """
+        rows = self.query(
+            f"SELECT {_field_expression('theme')} AS theme, COUNT(*) AS total "
+            f"FROM questions GROUP BY {_field_expression('theme')}"
+        )
+        return {row["theme"]: row["total"] for row in rows}
+
+    def check_question(self, question_id: str) -> bool:
+        """
+        Verify if the question is already registered in the database.
+        """
+        return self._find_one("questions", {"id": question_id}) is not None
+
+    def get_prompt(self, filters: Dict[str, Any] = {}) -> Prompt:
+        """
+        Retrieve a prompt following given filters.
+        """
+        prompt = self._find_one("prompts", filters)
+
+        if prompt:
+            return Prompt(**prompt)
+
+        raise ValueError(
+            "There are no prompt corresponding to your query in the database."
+        )
+
+    def get_prompts(self, filters: Dict[str, Any] = {}) -> List[Dict[str, Any]]:
+        """
+        Retrieve prompts matching the given filters.
+        """
+        return self._find("prompts", filters)
+
+    def get_prompt_results(self, filters: Dict[str, Any] = {}) -> List[Dict[str, Any]]:
+        """
+        Retrieve prompt results following the given filters.
+        """
+        return self._find("prompt_results", filters)
+
+    def get_answered_question_ids(self, run_id: str) -> Set[str]:
+        """
+        Retrieve the IDs of the questions with a prompt result in a prompt run.
+        """
+        rows = self.query(
+            f"SELECT DISTINCT {_field_expression('question_id')} AS question_id "
+            f"FROM prompt_results WHERE {_field_expression('run_id')} = ?",
+            (run_id,),
+        )
+        return {row["question_id"] for row in rows}
+
+    def get_failed_generations(
+        self, run_id: str, max_attempts: int | None = None
+    ) -> List[FailedGenerations]:
+        """
+        Retrieve the failed generations of a prompt run, optionally only the
+        ones attempted fewer than `max_attempts` times.
+        """
+        filters: Dict[str, Any] = {"run_id": run_id}
+        if max_attempts is not None:
+            filters["attempts"] = {"$lt": max_attempts}
+
+        return [
+            FailedGenerations(**failure)
+            for failure in self._find("failed_generations", filters)
+        ]
+
+    def get_prompt_run(self, filters: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Retrieves a single prompt run based on the provided filters.
+        """
+        return self._find_one("prompt_runs", filters)
+
+    def get_prompt_runs(self, filters: Dict[str, Any] = {}) -> List[Dict[str, Any]]:
+        """
+        Retrieve prompt runs following the given filters.
+        """
+        return self._find("prompt_runs", filters)
+
+    def get_batch(self, filters: Dict[str, Any]) -> Dict:
+        """
+        Retrieve a batch following given filters.
+        """
+        batch = self._find_one("batches", filters)
+        if batch:
+            return batch
+
+        raise ValueError(
+            "There are no prompt corresponding to your query in the database."
+        )
+
+    def get_batches(self, filters: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Retrieves batches based on the provided filters.
+        """
+        return self._find("batches", filters)
@@ -0,0 +1,11 @@
+class BudgetExceededException(Exception):
+    """
+    Exception raised when a request would exceed the token or cost budget of
+    a prompt run.
+    """
+
+    def __init__(self, msg: str | None = None):
+        if not msg:
+            msg = "The budget of the prompt run is exhausted."
+        self.msg = msg
+        super().__init__(msg)
@@ -0,0 +1,11 @@
+class InvalidLLMOutputException(Exception):
+    """
+    Exception raised when an LLM answer does not follow the expected format
+    or label space of the prompt run.
+    """
+
+    def __init__(self, msg: str | None = None):
+        if not msg:
+            msg = "The LLM output is not valid."
+        self.msg = msg
+        super().__init__(msg)
@@ -0,0 +1,11 @@
+class InvalidThemesHierarchyException(Exception):
+    """
+    Exception raised when the themes CSV files do not describe a valid tree
+    (a theme without parent or a theme listed under several parents).
+    """
+
+    def __init__(self, msg: str | None = None):
+        if not msg:
+            msg = "The themes hierarchy is not a valid tree."
+        self.msg = msg
+        super().__init__(msg)
@@ -1,7 +1,7 @@
 from utils.database import (
     batch_from_batch_id,
     questions_from_question_ids,
-    parent_theme_from_child_theme_name,
+    theme_tree,
 )
 from errors.WrongBatchIdProvided import WrongBatchIdProvided
 
@@ -13,17 +13,22 @@ def compute_batch_theme_counts(batch_id: str, level: int):
 
     questions = questions_from_question_ids(batch["question_ids"])
 
+    tree = theme_tree()
     theme_counts = {}
     total_count = 0
     for question in questions:
-        parent_theme = dict(
-            parent_theme_from_child_theme_name(question["theme"], level, 0)
-        )
-
-        if parent_theme["name"] not in theme_counts.keys():
-            theme_counts[parent_theme["name"]] = 0
-
-        theme_counts[parent_theme["name"]] += 1
+        theme_ancestors = question.get("theme_ancestors") or {}
+        if str(level) in theme_ancestors:
+            parent_theme_name = theme_ancestors[str(level)]["name"]
+        else:
+            parent_theme_name = tree.ancestor_at(
+                tree.get(question["theme"], 0), level
+            ).name
+
+        if parent_theme_name not in theme_counts.keys():
+            theme_counts[parent_theme_name] = 0
+
+        theme_counts[parent_theme_name] += 1
         total_count += 1
 
     theme_counts["total_count"] = total_count
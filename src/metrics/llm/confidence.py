@@ -5,6 +5,7 @@ import pandas as pd
 from tqdm import tqdm
 from collections import Counter
 from metrics.softmax import softmax
+from prompting.provider_requests import TOP_LOGPROBS
 from databases.connector import Connector
 from typing import Any, Dict, List, Tuple
 from models.ExportFormat import ExportFormat
@@ -71,6 +72,20 @@ def _build_results_and_confidence(
                 run_ids,
                 prompt_results,  # type: ignore
             )
+        case ConfidenceType.LabelDistribution:
+            for result in tqdm(prompt_results):
+                if not result.get("label_distribution"):
+                    raise WrongConfidenceTypeException(confidence_type)
+                results_and_confidence.append(
+                    ResultAndConfidence(  # type: ignore
+                        question_id=result["question_id"],
+                        predicted_label=result["final_answer"],
+                        gold_label=result["gold_label"],
+                        confidence=result["label_distribution"].get(
+                            result["final_answer"], 0.0
+                        ),
+                    )
+                )
         case ConfidenceType.SelfConsistency:
             results_and_confidence += _compute_self_consistency_confidence(
                 prompt_results
@@ -97,6 +112,7 @@ def _compute_self_consistency_confidence(
     List[ResultAndConfidence]
         A list of ResultAndConfidence objects containing the question ID, the most consistently predicted label,
         the gold label, and the confidence score, which represents the proportion of runs that predicted the same label.
+        The results of runs drawing several samples per question count each of their samples.
     """
     results_and_confidence = []
 
@@ -116,7 +132,15 @@ def _compute_self_consistency_confidence(
                     and prompt_result["question_id"] == question_id
                 )
             )
-            predicted_labels_for_question.append(selected_prompt_result["final_answer"])
+            if selected_prompt_result.get("samples"):
+                predicted_labels_for_question += [
+                    sample["predicted_label"]
+                    for sample in selected_prompt_result["samples"]
+                ]
+            else:
+                predicted_labels_for_question.append(
+                    selected_prompt_result["final_answer"]
+                )
 
         counts = Counter(predicted_labels_for_question)
 
@@ -220,7 +244,9 @@ def _compute_verbalized_confidence(llm_raw_response: str) -> float:
 
 def _compute_logprobs_confidence(tokens_metrics: List[TokenMetrics]) -> float:
     """
-    Compute logprobs confidence of an LLM prediction.
+    Compute logprobs confidence of an LLM prediction. Only the first
+    `TOP_LOGPROBS` alternatives of each token are used, so that the confidence
+    of label distribution runs, which request more, stays comparable.
 
     Parameters
     ----------
@@ -234,7 +260,9 @@ def _compute_logprobs_confidence(tokens_metrics: List[TokenMetrics]) -> float:
     """
     all_logprobs = []
     for token_metrics in tokens_metrics:
-        logprob_array = [x["logprob"] for x in token_metrics["top_logprobs"]]  # type: ignore
+        logprob_array = [
+            x["logprob"] for x in token_metrics["top_logprobs"][:TOP_LOGPROBS]  # type: ignore
+        ]
         all_logprobs.append(softmax(np.array(logprob_array)))
 
     logprobs_prod = np.array(all_logprobs).transpose()[0].prod()
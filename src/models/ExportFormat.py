@@ -5,3 +5,4 @@ class ExportFormat(str, Enum):
     MONGO = "mongo"
     JSON = "json"
     CSV = "csv"
+    SQLITE = "sqlite"
@@ -1,6 +1,6 @@
 from enum import Enum
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 
 class LogProb(BaseModel):
@@ -21,11 +21,21 @@ class ConfidenceType(str, Enum):
     Logprobs = "logprobs"
     SelfCalibration = "self-calibration"
     SelfConsistency = "self-consistency"
+    LabelDistribution = "label-distribution"
+
+
+class Sample(BaseModel):
+    response: str
+    predicted_label: str
 
 
 class WrapperOutput(BaseModel):
     raw_response: str
     prompt_tokens: int
+    cached_prompt_tokens: int = 0
     response_tokens: int
     predicted_label: str
     logprobs: Optional[List[TokenMetrics]] = None
+    cache_hit: bool = False
+    samples: Optional[List[Sample]] = None
+    label_distribution: Optional[Dict[str, float]] = None
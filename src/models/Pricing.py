@@ -0,0 +1,25 @@
+from pydantic import BaseModel
+
+
+class Pricing(BaseModel):
+    """
+    Price of a provider model, in US dollars per million tokens. Cached prompt
+    tokens are billed as regular prompt tokens if `cached_input` is None.
+    """
+
+    input: float
+    cached_input: float | None = None
+    output: float
+
+    def cost(
+        self, prompt_tokens: int, response_tokens: int, cached_prompt_tokens: int = 0
+    ) -> float:
+        """
+        Compute the cost of some tokens, in US dollars.
+        """
+        cached_price = self.input if self.cached_input is None else self.cached_input
+        return (
+            (prompt_tokens - cached_prompt_tokens) * self.input
+            + cached_prompt_tokens * cached_price
+            + response_tokens * self.output
+        ) / 1_000_000
@@ -1,6 +1,7 @@
 from enum import Enum
 from pydantic import BaseModel, field_serializer
-from typing import Any, Optional, List
+from typing import Any, Dict, Optional, List
+from models.LLMOutput import Sample
 
 
 class WrapperEnum(str, Enum):
@@ -29,6 +30,7 @@ class PromptType(str, Enum):
     ChainOfThought = "chain-of-thought"
     SelfCalibration = "self-calibration"
     VerbalizedConfidence = "verbalized confidence"
+    LabelDistribution = "label distribution"
 
 
 class CotExplanation(BaseModel):
@@ -69,6 +71,9 @@ class PromptRun(BaseModel):
     themes_list: List[str]
     description: str | None = None
     name: str
+    ministry_mask: bool = False
+    samples: int = 1
+    agreement_threshold: float = 1.0
 
 
 class PromptResult(BaseModel):
@@ -80,14 +85,25 @@ class PromptResult(BaseModel):
     run_id: str
     response_tokens: int
     prompt_tokens: int
+    cached_prompt_tokens: int = 0
     legislature: int
     logprobs: Optional[List[Any]] = None
     question_theme: str
     gold_label: str
+    cache_hit: bool = False
+    samples: Optional[List[Sample]] = None
+    label_distribution: Optional[Dict[str, float]] = None
 
 
 class FailedGenerations(BaseModel):
     question_id: str
+    run_id: str
+    error_class: str
+    error_message: str
+    attempts: int = 1
+    first_failed_at: int
+    last_failed_at: int
+    duration: float
 
 
 class PromptRunInfo(BaseModel):
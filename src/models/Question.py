@@ -29,9 +29,21 @@ class QuestionsByTheme(BaseModel):
     urls: List[str]
 
 
+class ThemeAncestor(BaseModel):
+    """
+    Ancestor of the theme of a question at a given hierarchy level.
+    """
+    name: str
+    unique_identifier: str
+
+
 class Question(BaseModel):
     """
     Representation of a question.
+
+    `theme_ancestors` stores the ancestor of `theme` at each hierarchy level,
+    indexed by level ("0" to "3"). It is filled at ingest and kept up to date
+    when the themes hierarchy changes.
     """
     id: str
     congressman: str
@@ -45,6 +57,14 @@ class Question(BaseModel):
     question_text: str
     response_text: str | None
     question_type: QuestionType
+    theme_ancestors: Dict[str, ThemeAncestor] = {}
+
+    def ancestor_at(self, level: int) -> ThemeAncestor | None:
+        """
+        Retrieve the stored ancestor of the question theme at a given level, if
+        the ancestry has been computed.
+        """
+        return self.theme_ancestors.get(str(level))
 
     @staticmethod
     def extract_question_type(question_id: str) -> QuestionType:
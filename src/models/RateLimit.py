@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+
+
+class RateLimit(BaseModel):
+    """
+    Rate limits of a provider model: requests per minute and tokens per minute
+    (prompt and completion tokens, None if the provider does not limit tokens).
+    """
+
+    requests_per_minute: int
+    tokens_per_minute: int | None = None
@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+
+
+class RunPlan(BaseModel):
+    """
+    Estimated tokens, cost and duration of a prompt run, before launching it.
+    """
+
+    number_of_questions: int
+    prompt_tokens: int
+    cached_prompt_tokens: int
+    response_tokens: int
+    max_prompt_tokens_per_question: int
+    exact_token_counts: bool
+    estimated_cost: float
+    estimated_duration: float
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.response_tokens
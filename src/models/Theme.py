@@ -1,4 +1,4 @@
-from typing import Optional, Annotated
+from typing import Any, Dict, List, Optional, Annotated
 from pydantic import BaseModel, Field, BeforeValidator
 
 PyObjectId = Annotated[str, BeforeValidator(str)]
@@ -14,3 +14,11 @@ class Theme(BaseModel):
     unique_identifier: str
     level: int
     total: int
+
+
+class SubThemes(BaseModel):
+    """
+    Sub-themes of a theme, both as a nested hierarchy and as a flat list.
+    """
+    nested: List[Dict[str, Any]]
+    flattened: List[Dict[str, Any]]
@@ -0,0 +1,214 @@
+import io
+import json
+import time
+from typing import Any, Callable, Dict, List
+from models.Prompt import WrapperEnum
+
+OPENAI_BATCH_ENDPOINT = "/v1/chat/completions"
+OPENAI_BATCH_COMPLETION_WINDOW = "24h"
+OPENAI_BATCH_FINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+ANTHROPIC_BATCH_FINAL_STATUS = "ended"
+BATCH_WRAPPERS = {WrapperEnum.OpenAI, WrapperEnum.Anthropic}
+
+
+def get_batch_client(wrapper: WrapperEnum, base_url: str | None = None) -> Any:
+    """
+    Build the provider client used for batch requests.
+
+    Parameters
+    ----------
+    wrapper: WrapperEnum
+        The provider, either OpenAI or Anthropic.
+    base_url: str | None, default=None
+        A custom API URL, e.g. a local stand-in server.
+
+    Returns
+    -------
+    OpenAI | Anthropic
+        The provider client.
+    """
+    match wrapper:
+        case WrapperEnum.OpenAI:
+            from openai import OpenAI
+
+            return OpenAI(base_url=base_url)
+        case WrapperEnum.Anthropic:
+            from anthropic import Anthropic
+
+            return Anthropic(base_url=base_url)
+        case _:
+            raise ValueError(f"The {wrapper.value} wrapper has no batch API.")
+
+
+def _openai_http_body(request: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The HTTP body of a chat completion request, the extra fields sent by the
+    client included.
+    """
+    body = {key: value for key, value in request.items() if key != "extra_body"}
+    body.update(request.get("extra_body", {}))
+    return body
+
+
+def render_openai_batch(requests: Dict[str, Dict[str, Any]]) -> str:
+    """
+    Render chat completion requests into the OpenAI Batch API JSONL format.
+
+    Parameters
+    ----------
+    requests: Dict[str, Dict[str, Any]]
+        The request bodies, indexed by custom ID (the question ID).
+
+    Returns
+    -------
+    str
+        The JSONL batch input file.
+    """
+    return "".join(
+        json.dumps(
+            {
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": OPENAI_BATCH_ENDPOINT,
+                "body": _openai_http_body(body),
+            },
+            ensure_ascii=False,
+        )
+        + "\n"
+        for custom_id, body in requests.items()
+    )
+
+
+def render_anthropic_batch(requests: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Render messages requests into the Anthropic Message Batches format.
+
+    Parameters
+    ----------
+    requests: Dict[str, Dict[str, Any]]
+        The request bodies, indexed by custom ID (the question ID).
+
+    Returns
+    -------
+    List[Dict[str, Any]]
+        The batch requests.
+    """
+    return [
+        {"custom_id": custom_id, "params": params}
+        for custom_id, params in requests.items()
+    ]
+
+
+def submit_batch(
+    wrapper: WrapperEnum, client: Any, requests: Dict[str, Dict[str, Any]]
+) -> str:
+    """
+    Submit a batch of requests to the provider.
+
+    Parameters
+    ----------
+    wrapper: WrapperEnum
+        The provider, either OpenAI or Anthropic.
+    client: OpenAI | Anthropic
+        The provider client.
+    requests: Dict[str, Dict[str, Any]]
+        The request bodies, indexed by custom ID (the question ID).
+
+    Returns
+    -------
+    str
+        The provider batch ID.
+    """
+    match wrapper:
+        case WrapperEnum.OpenAI:
+            input_file = client.files.create(
+                file=(
+                    "batch_input.jsonl",
+                    io.BytesIO(render_openai_batch(requests).encode("utf-8")),
+                ),
+                purpose="batch",
+            )
+            batch = client.batches.create(
+                input_file_id=input_file.id,
+                endpoint=OPENAI_BATCH_ENDPOINT,
+                completion_window=OPENAI_BATCH_COMPLETION_WINDOW,
+            )
+            return batch.id
+        case WrapperEnum.Anthropic:
+            batch = client.messages.batches.create(
+                requests=render_anthropic_batch(requests)
+            )
+            return batch.id
+        case _:
+            raise ValueError(f"The {wrapper.value} wrapper has no batch API.")
+
+
+def _openai_batch_results(client: Any, batch: Any) -> Dict[str, Dict[str, Any]]:
+    if batch.output_file_id is None:
+        return {}
+
+    results = {}
+    content = client.files.content(batch.output_file_id).text
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+        result = json.loads(line)
+        response = result.get("response") or {}
+        if result.get("error") is None and response.get("status_code") == 200:
+            results[result["custom_id"]] = response["body"]
+
+    return results
+
+
+def _anthropic_batch_results(client: Any, batch: Any) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    for result in client.messages.batches.results(batch.id):
+        if result.result.type == "succeeded":
+            results[result.custom_id] = result.result.message.to_dict()
+
+    return results
+
+
+def wait_for_batch(
+    wrapper: WrapperEnum,
+    client: Any,
+    batch_id: str,
+    poll_interval: float = 60.0,
+    sleep: Callable[[float], None] = time.sleep,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Poll a provider batch until it ends, then download its results.
+
+    Parameters
+    ----------
+    wrapper: WrapperEnum
+        The provider, either OpenAI or Anthropic.
+    client: OpenAI | Anthropic
+        The provider client.
+    batch_id: str
+        The provider batch ID.
+    poll_interval: float, default=60.0
+        Number of seconds between two status checks.
+    sleep: Callable[[float], None], default=time.sleep
+        Function used to wait between two status checks.
+
+    Returns
+    -------
+    Dict[str, Dict[str, Any]]
+        The successful responses, as returned by the regular API, indexed by
+        custom ID. Failed requests are left out.
+    """
+    while True:
+        match wrapper:
+            case WrapperEnum.OpenAI:
+                batch = client.batches.retrieve(batch_id)
+                if batch.status in OPENAI_BATCH_FINAL_STATUSES:
+                    return _openai_batch_results(client, batch)
+            case WrapperEnum.Anthropic:
+                batch = client.messages.batches.retrieve(batch_id)
+                if batch.processing_status == ANTHROPIC_BATCH_FINAL_STATUS:
+                    return _anthropic_batch_results(client, batch)
+            case _:
+                raise ValueError(f"The {wrapper.value} wrapper has no batch API.")
+
+        sleep(poll_interval)
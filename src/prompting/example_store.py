@@ -0,0 +1,319 @@
+import json
+import random
+import threading
+from models.Prompt import CotExplanation
+from models.Question import Question, QuestionType
+from utils.helpers import find_src_directory
+from utils.theme_tree import ThemeTree
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+StrataKey = Tuple[Tuple[str, ...], int, int | None, QuestionType | None]
+
+
+def _stratified_sample(
+    strata: Dict[str, List[T]], k: int, rng: random.Random
+) -> List[T]:
+    """
+    Sample `k` examples of distinct labels, the labels being sampled among the
+    ones with at least one example.
+    """
+    labels = sorted(label for label, examples in strata.items() if len(examples))
+    if k > len(labels):
+        raise ValueError(
+            "The number of shots is higher than the number of available parent themes."
+        )
+
+    return [rng.choice(strata[label]) for label in rng.sample(labels, k)]
+
+
+def _matches(
+    question_id: str,
+    question_legislature: int,
+    legislature: int | None,
+    question_type: QuestionType | None,
+) -> bool:
+    if legislature is not None and question_legislature != legislature:
+        return False
+    if question_type is not None:
+        return Question.extract_question_type(question_id) == question_type
+    return True
+
+
+class ExampleStore:
+    """
+    In-memory index of the few-shot examples: the chain-of-thought explanations
+    and the IDs of the candidate questions, by parent theme, legislature and
+    question type.
+
+    The strata of a set of accepted themes are built on their first use, after
+    which sampling a few-shot set costs O(k) without any database round trip.
+    They are built again once the themes tree is rebuilt, or after `clear`.
+    Sampling is deterministic for a given seed.
+
+    Parameters
+    ----------
+    explanations: List[CotExplanation]
+        The chain-of-thought explanations, labelled with their parent theme.
+    get_theme_tree: Callable[[], ThemeTree]
+        Returns the themes tree.
+    get_question_ids_by_theme: Callable[[List[str]], Dict[str, List[str]]]
+        Returns the IDs of the candidate questions of the given themes.
+    """
+
+    def __init__(
+        self,
+        explanations: List[CotExplanation],
+        get_theme_tree: Callable[[], ThemeTree],
+        get_question_ids_by_theme: Callable[[List[str]], Dict[str, List[str]]],
+    ) -> None:
+        self.explanations = explanations
+        self._get_theme_tree = get_theme_tree
+        self._get_question_ids_by_theme = get_question_ids_by_theme
+        self._lock = threading.Lock()
+        self._question_strata: Dict[StrataKey, Dict[str, List[str]]] = {}
+        self._explanation_strata: Dict[StrataKey, Dict[str, List[CotExplanation]]] = {}
+        self._labels: Dict[Tuple[Tuple[str, ...], int], Dict[str, str]] = {}
+        self._theme_tree: ThemeTree | None = None
+
+    def clear(self) -> None:
+        """
+        Drop the strata, e.g. once new questions are added. They are built
+        again on next use.
+        """
+        with self._lock:
+            self._clear()
+
+    def _clear(self) -> None:
+        self._question_strata.clear()
+        self._explanation_strata.clear()
+        self._labels.clear()
+
+    def _check_theme_tree(self) -> None:
+        """
+        Drop the strata built from a previous themes tree. Must be called with
+        the lock held.
+        """
+        theme_tree = self._get_theme_tree()
+        if theme_tree is not self._theme_tree:
+            self._clear()
+            self._theme_tree = theme_tree
+
+    @classmethod
+    def from_explanations_file(
+        cls,
+        get_theme_tree: Callable[[], ThemeTree],
+        get_question_ids_by_theme: Callable[[List[str]], Dict[str, List[str]]],
+        path: str | None = None,
+    ) -> "ExampleStore":
+        """
+        Build the store from `data/explanations.json`.
+        """
+        if path is None:
+            path = f"{find_src_directory()}/data/explanations.json"
+        with open(path, "r") as json_file:
+            explanations = [
+                CotExplanation(**explanation) for explanation in json.load(json_file)
+            ]
+
+        return cls(explanations, get_theme_tree, get_question_ids_by_theme)
+
+    def _children_by_parent(
+        self, accepted_themes: Iterable[str], stop_at_level: int
+    ) -> Dict[str, List[str]]:
+        theme_tree = self._get_theme_tree()
+        children_by_parent: Dict[str, List[str]] = {}
+        for theme in sorted(set(accepted_themes)):
+            parent_theme = theme_tree.ancestor_at(
+                theme_tree.get(theme, 0), stop_at_level
+            )
+            children_by_parent.setdefault(parent_theme.name, []).append(theme)
+
+        return children_by_parent
+
+    def labels_by_theme(
+        self, accepted_themes: Sequence[str], stop_at_level: int
+    ) -> Dict[str, str]:
+        """
+        The parent theme of each accepted theme.
+        """
+        key = (tuple(sorted(accepted_themes)), stop_at_level)
+        with self._lock:
+            self._check_theme_tree()
+            if key not in self._labels:
+                self._labels[key] = {
+                    theme: parent
+                    for parent, children in self._children_by_parent(
+                        key[0], stop_at_level
+                    ).items()
+                    for theme in children
+                }
+
+            return self._labels[key]
+
+    def question_strata(
+        self,
+        accepted_themes: Sequence[str],
+        stop_at_level: int,
+        legislature: int | None = None,
+        question_type: QuestionType | None = None,
+    ) -> Dict[str, List[str]]:
+        """
+        The IDs of the candidate questions by parent theme.
+        """
+        key = (
+            tuple(sorted(accepted_themes)),
+            stop_at_level,
+            legislature,
+            question_type,
+        )
+        with self._lock:
+            self._check_theme_tree()
+            if key not in self._question_strata:
+                question_ids_by_theme = self._get_question_ids_by_theme(list(key[0]))
+                self._question_strata[key] = {
+                    parent: [
+                        question_id
+                        for theme in children
+                        for question_id in question_ids_by_theme.get(theme, [])
+                        if _matches(
+                            question_id,
+                            int(question_id[: question_id.index("-")]),
+                            legislature,
+                            question_type,
+                        )
+                    ]
+                    for parent, children in self._children_by_parent(
+                        key[0], stop_at_level
+                    ).items()
+                }
+
+            return self._question_strata[key]
+
+    def explanation_strata(
+        self,
+        accepted_themes: Sequence[str],
+        stop_at_level: int,
+        legislature: int | None = None,
+        question_type: QuestionType | None = None,
+    ) -> Dict[str, List[CotExplanation]]:
+        """
+        The chain-of-thought explanations by parent theme.
+        """
+        key = (
+            tuple(sorted(accepted_themes)),
+            stop_at_level,
+            legislature,
+            question_type,
+        )
+        with self._lock:
+            self._check_theme_tree()
+            if key not in self._explanation_strata:
+                strata: Dict[str, List[CotExplanation]] = {
+                    parent: []
+                    for parent in self._children_by_parent(key[0], stop_at_level)
+                }
+                for explanation in self.explanations:
+                    if explanation.label in strata and _matches(
+                        explanation.question_id,
+                        explanation.legislature,
+                        legislature,
+                        question_type,
+                    ):
+                        strata[explanation.label].append(explanation)
+                self._explanation_strata[key] = strata
+
+            return self._explanation_strata[key]
+
+    def sample_question_ids(
+        self,
+        k: int,
+        accepted_themes: Sequence[str],
+        stop_at_level: int,
+        legislature: int | None = None,
+        question_type: QuestionType | None = None,
+        seed: int | None = None,
+    ) -> List[str]:
+        """
+        Sample the IDs of `k` questions of distinct parent themes.
+
+        Parameters
+        ----------
+        k: int
+            Number of question examples.
+        accepted_themes: Sequence[str]
+            List of themes from which to sample questions from.
+        stop_at_level: int
+            The level of the parent themes.
+        legislature: int | None, default=None
+            If provided, only sample questions of this legislature.
+        question_type: QuestionType | None, default=None
+            If provided, only sample questions of this type.
+        seed: int | None, default=None
+            Makes the sampling deterministic.
+
+        Returns
+        -------
+        List[str]
+            The IDs of the sampled questions.
+
+        Raises
+        ------
+        ValueError
+            If fewer than `k` parent themes have candidate questions.
+        """
+        strata = self.question_strata(
+            accepted_themes, stop_at_level, legislature, question_type
+        )
+        return _stratified_sample(strata, k, random.Random(seed))
+
+    def sample_explanations(
+        self,
+        k: int,
+        accepted_themes: Sequence[str],
+        stop_at_level: int,
+        legislature: int | None = None,
+        question_type: QuestionType | None = None,
+        seed: int | None = None,
+    ) -> List[CotExplanation]:
+        """
+        Sample `k` chain-of-thought explanations of distinct parent themes. See
+        `sample_question_ids` for the parameters.
+        """
+        strata = self.explanation_strata(
+            accepted_themes, stop_at_level, legislature, question_type
+        )
+        return _stratified_sample(strata, k, random.Random(seed))
+
+
+_example_store: ExampleStore | None = None
+_example_store_lock = threading.Lock()
+
+
+def get_example_store(
+    get_theme_tree: Callable[[], ThemeTree],
+    get_question_ids_by_theme: Callable[[List[str]], Dict[str, List[str]]],
+) -> ExampleStore:
+    """
+    Retrieve the process-wide example store, loading the explanations file on
+    the first call.
+    """
+    global _example_store
+
+    with _example_store_lock:
+        if _example_store is None:
+            _example_store = ExampleStore.from_explanations_file(
+                get_theme_tree, get_question_ids_by_theme
+            )
+
+        return _example_store
+
+
+def invalidate_example_store() -> None:
+    """
+    Drop the strata of the process-wide example store, if it is loaded.
+    """
+    with _example_store_lock:
+        if _example_store is not None:
+            _example_store.clear()
@@ -1,7 +1,5 @@
 import re
 from typing import List
-from guardrails import Guard
-from guardrails.hub import ValidChoices, ValidRange
 from models.Prompt import WrapperEnum
 from models.Prompt import PromptText, PromptType, RoleEnum
 from prompting.prompt_templates import (
@@ -10,7 +8,11 @@ from prompting.prompt_templates import (
 )
 from utils.helpers import print_prompts
 from utils.helpers import retrieve_theme_from_cot_response
-
+from prompting.validators import (
+    choices_validator,
+    range_validator,
+    regex_capture,
+)
 
 """
 ZERO-SHOT PROMPT BUILDERS
@@ -173,10 +175,7 @@ def zero_shot_expert_role(themes_list: List[str], themes_hierarchy_level: int):
 def zero_shot_proxy(themes_list: List[str], themes_hierarchy_level: int):
     a_to_z_selectors = [chr(i) for i in range(ord("A"), ord("["))]
 
-    def validation_func(response: str):
-        a_to_z_selectors = [chr(i) for i in range(ord("A"), ord("["))]
-        guard = Guard().use(ValidChoices, choices=a_to_z_selectors, on_fail="exception")
-        guard.validate(response)
+    validation_func = choices_validator(a_to_z_selectors)
 
     built_themes_list = build_prompt_themes_list(
         themes_list=themes_list,
@@ -223,7 +222,7 @@ def zero_shot_proxy(themes_list: List[str], themes_hierarchy_level: int):
         prompts,
         {},
         accepted_themes_for_questions,
-        [PromptType.ZeroShot],
+        [PromptType.ZeroShot, PromptType.LabelDistribution],
         validation_func,
         retrieve_theme_func,
     )
@@ -274,17 +273,16 @@ def zero_shot_cot_vanilla(themes_list: List[str], themes_hierarchy_level: int):
 def zero_shot_cot_proxy(themes_list: List[str], themes_hierarchy_level: int):
     a_to_z_selectors = [chr(i) for i in range(ord("A"), ord("["))]
 
-    def validation_func(response: str):
-        a_to_z_selectors = [chr(i) for i in range(ord("A"), ord("["))]
+    selector_regex = re.compile(r"(\w)\.")
+    validate_selector = choices_validator(a_to_z_selectors)
 
+    def validation_func(response: str):
         if response.endswith("."):
             response = response.rsplit(".", 1)[0]
 
-        pattern = r"(\w)\."
-        predicted_label = re.findall(pattern, response.strip())[-1]
+        predicted_label = selector_regex.findall(response.strip())[-1]
 
-        guard = Guard().use(ValidChoices, choices=a_to_z_selectors, on_fail="exception")
-        guard.validate(predicted_label)
+        validate_selector(predicted_label)
 
     built_themes_list = build_prompt_themes_list(
         themes_list=themes_list,
@@ -304,8 +302,7 @@ def zero_shot_cot_proxy(themes_list: List[str], themes_hierarchy_level: int):
         if llm_response.endswith("."):
             llm_response = llm_response.rsplit(".", 1)[0]
 
-        pattern = r"(\w)\."
-        predicted_label = re.findall(pattern, llm_response.strip())[-1]
+        predicted_label = selector_regex.findall(llm_response.strip())[-1]
 
         for theme_name, selector in selector_associations_table.items():
             if selector.lower() == predicted_label.lower():
@@ -349,26 +346,25 @@ def zero_shot_verbalized_confidence_vanilla(
     themes_list_as_string = built_themes_list["themes_list_as_string"]
     accepted_themes_for_questions = built_themes_list["accepted_themes_for_questions"]
 
+    capture_theme = regex_capture(r"^(Thème:) ([\w| |'|,|-]+)", group=2)
+    capture_probability = regex_capture(r"(Probabilité:) ([\d|\.]+)", group=2)
+    validate_theme = choices_validator(themes_list)
+    validate_probability = range_validator(0.0, 1.0)
+
     def validation_func(response: str):
-        regex = re.compile(r"^(Thème:) ([\w| |'|,|-]+)")
-        capture = re.search(regex, response)
-        guard = Guard().use(ValidChoices, choices=themes_list, on_fail="exception")
-        guard.validate(capture.group(2).strip())  # type: ignore
-        regex = re.compile(r"(Probabilité:) ([\d|\.]+)")
-        capture = re.search(regex, response)
-        guard = Guard().use(ValidRange(min=0.0, max=1.0, on_fail="exception"))  # type: ignore
-        guard.validate(capture.group(2).strip())  # type: ignore
+        validate_theme(capture_theme(response))
+        validate_probability(capture_probability(response))
 
     built_themes_list = build_prompt_themes_list(
         themes_list=themes_list, theme_level=themes_hierarchy_level
     )
 
+    retrieve_theme = regex_capture(r"^(Thème:) ([\w| |'|,]+)", group=2)
+
     def retrieve_theme_func(
         themes_list: List[str], theme_level: int, llm_response: str
     ) -> str:
-        regex = re.compile(r"^(Thème:) ([\w| |'|,]+)")
-        capture = re.search(regex, llm_response)
-        return capture.group(2).strip()  # type: ignore
+        return retrieve_theme(llm_response)
 
     themes_list_as_string = built_themes_list["themes_list_as_string"]
     accepted_themes_for_questions = built_themes_list["accepted_themes_for_questions"]
@@ -416,30 +412,25 @@ def zero_shot_cot_verbalized_confidence_vanilla(
     themes_list_as_string = built_themes_list["themes_list_as_string"]
     accepted_themes_for_questions = built_themes_list["accepted_themes_for_questions"]
 
-    def validation_func(response: str):
-        regex = re.compile(r"(Thème:) ([\w| |'|,|-]+)")
-        capture = re.search(regex, response)
-
-        guard = Guard().use(ValidChoices, choices=themes_list, on_fail="exception")
-        guard.validate(capture.group(2).strip())  # type: ignore
-
-        regex = re.compile(r"(Probabilité:) ([\d|\.]+)")
-        capture = re.search(regex, response)
+    capture_theme = regex_capture(r"(Thème:) ([\w| |'|,|-]+)", group=2)
+    capture_probability = regex_capture(r"(Probabilité:) ([\d|\.]+)", group=2)
+    validate_theme = choices_validator(themes_list)
+    validate_probability = range_validator(0.0, 1.0)
 
-        guard = Guard().use(ValidRange(min=0.0, max=1.0, on_fail="exception"))  # type: ignore
-        guard.validate(capture.group(2).strip())  # type: ignore
+    def validation_func(response: str):
+        validate_theme(capture_theme(response))
+        validate_probability(capture_probability(response))
 
     built_themes_list = build_prompt_themes_list(
         themes_list=themes_list, theme_level=themes_hierarchy_level
     )
 
+    retrieve_theme = regex_capture(r"(Thème:) ([\w| |'|,]+)", group=2)
+
     def retrieve_theme_func(
         themes_list: List[str], theme_level: int, llm_response: str
     ) -> str:
-        regex = re.compile(r"(Thème:) ([\w| |'|,]+)")
-        capture = re.search(regex, llm_response)
-
-        return capture.group(2).strip()  # type: ignore
+        return retrieve_theme(llm_response)
 
     themes_list_as_string = built_themes_list["themes_list_as_string"]
     accepted_themes_for_questions = built_themes_list["accepted_themes_for_questions"]
@@ -534,10 +525,7 @@ def one_shot_proxy(
 ):
     a_to_z_selectors = [chr(i) for i in range(ord("A"), ord("["))]
 
-    def validation_func(response: str):
-        a_to_z_selectors = [chr(i) for i in range(ord("A"), ord("["))]
-        guard = Guard().use(ValidChoices, choices=a_to_z_selectors, on_fail="exception")
-        guard.validate(response)
+    validation_func = choices_validator(a_to_z_selectors)
 
     built_themes_list = build_prompt_themes_list(
         themes_list=themes_list,
@@ -657,10 +645,7 @@ def few_shot_proxy(
 ):
     a_to_z_selectors = [chr(i) for i in range(ord("A"), ord("["))]
 
-    def validation_func(response: str):
-        a_to_z_selectors = [chr(i) for i in range(ord("A"), ord("["))]
-        guard = Guard().use(ValidChoices, choices=a_to_z_selectors, on_fail="exception")
-        guard.validate(response)
+    validation_func = choices_validator(a_to_z_selectors)
 
     built_themes_list = build_prompt_themes_list(
         themes_list=themes_list,
@@ -717,7 +702,7 @@ def few_shot_proxy(
         prompts,
         {},
         accepted_themes_for_questions,
-        [PromptType.FewShot],
+        [PromptType.FewShot, PromptType.LabelDistribution],
         validation_func,
         retrieve_theme_func,
     )
@@ -788,11 +773,12 @@ def few_shot_cot_proxy(
 ):
     a_to_z_selectors = [chr(i) for i in range(ord("A"), ord("["))]
 
+    validate_selector = choices_validator(a_to_z_selectors)
+
     def validation_func(response: str):
         predicted_label = retrieve_theme_from_cot_response(response)
 
-        guard = Guard().use(ValidChoices, choices=a_to_z_selectors, on_fail="exception")
-        guard.validate(predicted_label.upper())
+        validate_selector(predicted_label.upper())
 
     built_themes_list = build_prompt_themes_list(
         themes_list=themes_list,
@@ -1,21 +1,46 @@
-from typing import Tuple, List
+from typing import Any, Dict, Tuple, List
 from databases.connector import Connector
 from models.ExportFormat import ExportFormat
 
 connector = Connector(ExportFormat.JSON)
 
 
-def get_accepted_themes_list_from_themes_list(themes_list: List[str]) -> List[str]:
-    accepted_themes_for_questions = []
+def get_accepted_themes_list_from_themes_list(
+    themes_list: List[str] | List[Dict[str, Any]], theme_level: int = 1
+) -> List[str]:
+    """
+    The names of the descendants of the given themes. The given themes
+    themselves are not included.
+
+    Parameters
+    ----------
+    themes_list: List[str] | List[Dict[str, Any]]
+        The themes names, or the theme documents returned by
+        `connector.client.get_themes`, which are retrieved by their unique
+        identifier whatever their level.
+    theme_level: int, default=1
+        The level of the themes given by name. Names which are not in the
+        hierarchy at this level are ignored.
+
+    Returns
+    -------
+    List[str]
+        The accepted theme names, without duplicates.
+
+    Raises
+    ------
+    ValueError
+        If the unique identifier of a theme document is not in the hierarchy.
+    """
+    theme_tree = connector.client.get_theme_tree()
+    themes = []
     for theme in themes_list:
-        sub_themes = connector.client.get_sub_themes_list_from_theme(
-            theme["unique_identifier"], flatten=True
-        )
-        for sub_theme in sub_themes:
-            if sub_theme["name"] not in accepted_themes_for_questions:
-                accepted_themes_for_questions.append(sub_theme["name"])
+        if isinstance(theme, dict):
+            themes.append(theme_tree.get_by_identifier(theme["unique_identifier"]))
+        else:
+            themes += theme_tree.get_many([theme], theme_level)
 
-    return accepted_themes_for_questions
+    return theme_tree.accepted_theme_names(themes)
 
 
 def selected_level_1_themes_first_version(
@@ -1,6 +1,7 @@
 import os
 import anthropic
 from typing import Dict
+from functools import lru_cache
 from openai import OpenAI
 from mistralai import Mistral
 from pydantic import BaseModel
@@ -9,7 +10,16 @@ from utils.logger import get_logger
 import google.generativeai as genai
 from typing import Optional, Callable
 from models.LLMOutput import WrapperOutput
-from models.Prompt import Prompt, PromptRun, RoleEnum
+from models.Prompt import Prompt, PromptRun
+from prompting.provider_requests import (
+    MAX_TOKEN,
+    build_anthropic_request,
+    build_openai_request,
+    format_messages,
+    get_render_plan,
+    parse_anthropic_response,
+    parse_openai_response,
+)
 
 load_dotenv()
 logger = get_logger()
@@ -18,10 +28,20 @@ openai_client = OpenAI()
 anthropic_client = anthropic.Anthropic(
     api_key=os.getenv("ANTHROPIC_API_KEY"),
 )
-mistral_client = Mistral(api_key=os.getenv("MISTRAL_API_KEY"))
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-
-MAX_TOKEN = 512
+# OPENAI_BASE_URL and ANTHROPIC_BASE_URL are read by their clients: with the
+# two variables below, every provider can be pointed at a local stand-in server
+# (see `utils/mock_llm_server.py`).
+mistral_client = Mistral(
+    api_key=os.getenv("MISTRAL_API_KEY"), server_url=os.getenv("MISTRAL_SERVER_URL")
+)
+if os.getenv("GEMINI_API_ENDPOINT"):
+    genai.configure(
+        api_key=os.getenv("GEMINI_API_KEY"),
+        transport="rest",
+        client_options={"api_endpoint": os.getenv("GEMINI_API_ENDPOINT")},
+    )
+else:
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
 
 def prompt_openai(
@@ -31,6 +51,7 @@ def prompt_openai(
     assoc: Dict[str, str] | None = None,
     response_format: Optional[BaseModel] = None,
     retrieve_theme_func: Callable[..., str] | None = None,
+    samples: int = 1,
 ) -> WrapperOutput:
     """
     Sends a prompt to OpenAI's API and retrieves a response.
@@ -49,66 +70,29 @@ def prompt_openai(
         If provided, defines the format of the response to be expected, by default None.
     retrieve_theme_func : Callable[..., str] | None, optional
         A callable function that can be used to retrieve themes for the prompt, by default None.
+    samples : int, optional
+        Number of completions drawn from the request, by default 1.
 
     Returns
     -------
     WrapperOutput
         The response object wrapping the output from the OpenAI API, including the generated text.
     """
-    messages = [
-        {
-            "role": pr.role.value,
-            # Template user content contains '{0}'
-            "content": pr.content.format(question_text),
-        }
-        for pr in list(prompt.prompts)
-    ]
-
-    if assoc:
-        for i, msg in enumerate(messages):
-            for k, v in assoc.items():
-                messages[i]["content"] = msg["content"].replace(k, v)
+    request = build_openai_request(prompt, prompt_run, question_text, assoc, samples)
 
     if response_format is not None:
         response = openai_client.beta.chat.completions.parse(
-            temperature=prompt_run.parameters.temperature,
-            max_tokens=MAX_TOKEN,
-            model=prompt_run.parameters.model,
-            messages=messages,  # type: ignore
-            logprobs=True,
-            top_logprobs=4,
+            **request,
             response_format=response_format,  # type: ignore
         )
     else:
-        response = openai_client.chat.completions.create(
-            temperature=prompt_run.parameters.temperature,
-            max_tokens=MAX_TOKEN,
-            model=prompt_run.parameters.model,
-            messages=messages,  # type: ignore
-            logprobs=True,
-            top_logprobs=4,
-        )
+        response = openai_client.chat.completions.create(**request)
 
     dict_response = response.to_dict()
 
     logger.info(dict_response["choices"][0]["message"]["content"])
 
-    if retrieve_theme_func is not None:
-        predicted_label = retrieve_theme_func(
-            prompt_run.themes_list,
-            prompt_run.parameters.theme_hierarchy_level,
-            dict_response["choices"][0]["message"]["content"],  # type: ignore
-        )
-    else:
-        predicted_label = dict_response["choices"][0]["message"]["content"]  # type: ignore
-
-    return WrapperOutput(
-        raw_response=dict_response["choices"][0]["message"]["content"],  # type: ignore
-        prompt_tokens=dict_response["usage"]["prompt_tokens"],  # type: ignore
-        response_tokens=dict_response["usage"]["completion_tokens"],  # type: ignore
-        predicted_label=predicted_label.lower().strip(),
-        logprobs=dict_response["choices"][0]["logprobs"]["content"],  # type: ignore
-    )
+    return parse_openai_response(dict_response, prompt_run, retrieve_theme_func)
 
 
 def prompt_anthropic(
@@ -141,53 +125,13 @@ def prompt_anthropic(
     WrapperOutput
         The response object wrapping the output from the Anthropic API, including the generated text.
     """
-    system_prompt = next(
-        (pr for pr in prompt.prompts if pr.role == RoleEnum.System.value),
-        None,
-    )
-    messages = [
-        {
-            "role": pr.role.value,
-            # Template user content contains '{0}'
-            "content": pr.content.format(question_text),
-        }
-        for pr in list(prompt.prompts)
-        if pr.role != RoleEnum.System.value
-    ]
-
-    if assoc:
-        for i, msg in enumerate(messages):
-            for k, v in assoc.items():
-                messages[i]["content"] = msg["content"].replace(k, v)
-
-    response = anthropic_client.messages.create(
-        model=prompt_run.parameters.model,
-        max_tokens=MAX_TOKEN,
-        temperature=prompt_run.parameters.temperature,
-        system=system_prompt.content,  # type: ignore
-        # ? top_k=1,
-        # ? top_p=3,
-        messages=messages,
-    )
+    request = build_anthropic_request(prompt, prompt_run, question_text, assoc)
 
-    dict_response = response.to_dict()
+    response = anthropic_client.messages.create(**request)
 
-    if retrieve_theme_func is not None:
-        predicted_label = retrieve_theme_func(
-            prompt_run.themes_list,
-            prompt_run.parameters.theme_hierarchy_level,
-            dict_response["content"][0]["text"],  # type: ignore
-        )
-    else:
-        predicted_label = dict_response["content"][0]["text"]  # type: ignore
+    dict_response = response.to_dict()
 
-    return WrapperOutput(
-        raw_response=dict_response["content"][0]["text"],  # type: ignore
-        prompt_tokens=dict_response["usage"]["input_tokens"],  # type: ignore
-        response_tokens=dict_response["usage"]["output_tokens"],  # type: ignore
-        predicted_label=predicted_label,
-        logprobs=None,
-    )
+    return parse_anthropic_response(dict_response, prompt_run, retrieve_theme_func)
 
 
 def prompt_mistral(
@@ -220,19 +164,7 @@ def prompt_mistral(
     WrapperOutput
         The response object wrapping the output from the Mistral API, including the generated text.
     """
-    messages = [
-        {
-            "role": pr.role.value,
-            # Template user content contains '{0}'
-            "content": pr.content.format(question_text),
-        }
-        for pr in list(prompt.prompts)
-    ]
-
-    if assoc:
-        for i, msg in enumerate(messages):
-            for k, v in assoc.items():
-                messages[i]["content"] = msg["content"].replace(k, v)
+    messages = format_messages(prompt, question_text, assoc)
 
     response = mistral_client.chat.complete(
         model=prompt_run.parameters.model,
@@ -259,6 +191,13 @@ def prompt_mistral(
     )
 
 
+@lru_cache(maxsize=32)
+def _get_google_model(
+    model: str, system_instruction: str | None
+) -> genai.GenerativeModel:
+    return genai.GenerativeModel(model, system_instruction=system_instruction)
+
+
 def prompt_google(
     prompt: Prompt,
     prompt_run: PromptRun,
@@ -289,36 +228,11 @@ def prompt_google(
     WrapperOutput
         The response object wrapping the output from the Google API, including the generated text.
     """
-    system_prompt = next(
-        (pr for pr in prompt.prompts if pr.role == RoleEnum.System.value),
-        None,
-    )
-
-    parts = [
-        {
-            "parts": [
-                {
-                    "text": pr.content.format(question_text),
-                }
-            ],
-            "role": pr.role.value,
-        }
-        for pr in prompt.prompts
-        if pr.role != RoleEnum.System.value
-    ]
-
-    if assoc:
-        for i, msg in enumerate(parts):
-            for k, v in assoc.items():
-                parts[i]["parts"][0]["text"] = msg["parts"][0]["text"].replace(k, v)
-
-    model = genai.GenerativeModel(
-        prompt_run.parameters.model,
-        system_instruction=system_prompt.content,
-    )
+    plan = get_render_plan(prompt, assoc)
+    model = _get_google_model(prompt_run.parameters.model, plan.system_prompt)
 
     response = model.generate_content(
-        parts,
+        plan.google_contents(question_text, assoc),
         generation_config=genai.types.GenerationConfig(
             max_output_tokens=MAX_TOKEN,
             temperature=prompt_run.parameters.temperature,
@@ -340,6 +254,9 @@ def prompt_google(
     return WrapperOutput(
         raw_response=dict_response["candidates"][0]["content"]["parts"][0]["text"],
         prompt_tokens=dict_response["usage_metadata"]["prompt_token_count"],
+        cached_prompt_tokens=dict_response["usage_metadata"].get(
+            "cached_content_token_count", 0
+        ),
         response_tokens=dict_response["usage_metadata"]["candidates_token_count"],
         predicted_label=predicted_label,
         logprobs=None,  # ? Gratuit = pas logprobs ? :(
@@ -1,46 +1,175 @@
 import json
 import re
-from typing import List
+import threading
+from typing import Dict, Iterable, List
 from pathlib import Path
 from configs.env import get_src_path
 from difflib import SequenceMatcher
 
+# The ministry introduction after which a mask is removed, e.g. " du " in
+# "M. le ministre du travail".
+MINISTRY_CONTEXT = r"(?<=ministre) (d[u|e]s?\s)"
+MINISTRY_CONTEXT_REGEX = re.compile(MINISTRY_CONTEXT)
+
+
+class MinistryMask:
+    """
+    Masking engine of the ministries named in the questions, built once from a
+    list of masks.
+
+    A mask is only removed right after a ministry introduction, so the masks
+    are compiled into a trie walked from the end of each introduction found in
+    the question. This finds every mask which can be removed in a single pass
+    over the question, however many masks there are, and the first of them in
+    the list is removed as `question_processing` always did.
+
+    Parameters
+    ----------
+    masks: List[str]
+        The ministries to mask, by priority, usually longest first. Only the
+        lowercase masks can match.
+    """
+
+    def __init__(self, masks: List[str]) -> None:
+        self.masks = masks
+        self._trie: Dict = {}
+        self._regexes: Dict[int, re.Pattern] = {}
+
+        for priority, mask in enumerate(masks):
+            if mask != mask.lower():
+                continue
+            node = self._trie
+            for char in mask:
+                node = node.setdefault(char, {})
+            # The first mask of the list wins over its duplicates.
+            node.setdefault(None, priority)
+
+    def _selected_mask(self, question: str) -> int | None:
+        selected = None
+        for match in MINISTRY_CONTEXT_REGEX.finditer(question):
+            node = self._trie
+            position = match.end()
+            while True:
+                priority = node.get(None)
+                if priority is not None and (selected is None or priority < selected):
+                    selected = priority
+                if position == len(question) or question[position] not in node:
+                    break
+                node = node[question[position]]
+                position += 1
+
+        return selected
+
+    def _regex(self, priority: int) -> re.Pattern:
+        regex = self._regexes.get(priority)
+        if regex is None:
+            regex = self._regexes[priority] = re.compile(
+                MINISTRY_CONTEXT + re.escape(self.masks[priority])
+            )
+        return regex
+
+    def mask(self, question: str) -> str:
+        """
+        Remove the ministry named after the ministry introduction of a question.
+
+        Parameters
+        ----------
+        question: str
+            The question text.
+
+        Returns
+        -------
+        str
+            The masked question.
+
+        Raises
+        ------
+        ValueError
+            If no mask matches the question, or if applying it removed another
+            part of the question.
+        """
+        input_size = len(question)
+        priority = self._selected_mask(question)
+        selected_mask = ""
+        output_size = 0
+        if priority is not None:
+            selected_mask = self.masks[priority]
+            question = self._regex(priority).sub("", question)
+            output_size = len(question)
+
+        # Remove 4 because the pattern introducing the ministry is included
+        # in the regex (see MINISTRY_CONTEXT)
+        if input_size - len(selected_mask) - 4 != output_size:
+            raise ValueError(
+                "An error occurred when applying the ministries mask. "
+                "Another part of the question was propably croped."
+            )
+
+        return question
+
+    def mask_questions(self, questions: Iterable[str]) -> List[str]:
+        """
+        Mask a batch of questions. See `mask`.
+        """
+        return [self.mask(question) for question in questions]
+
+
+_ministry_mask: MinistryMask | None = None
+_ministry_mask_lock = threading.Lock()
+
+
+def get_ministry_mask() -> MinistryMask:
+    """
+    Retrieve the process-wide masking engine, loading `data/positions.json` on
+    the first call.
+    """
+    global _ministry_mask
+
+    with _ministry_mask_lock:
+        if _ministry_mask is None:
+            ministries = f"{get_src_path(Path(__file__))}/data/positions.json"
+            with open(ministries, "r", encoding="utf-8") as file:
+                masks = json.load(file)
+
+            if masks is None:
+                raise ValueError(
+                    "No ministries pattern provided. Make you sure you either "
+                    "provide a positions.json file with existing ministries patterns "
+                    "or a list of masks to apply."
+                )
+            _ministry_mask = MinistryMask(masks)
+
+        return _ministry_mask
+
 
 def question_processing(question: str, masks: List[str] | None = None) -> str:
-    from copy import deepcopy
-    question_copy = deepcopy(question)
-    input_size = len(question)
-    if masks is None:
-        ministries = f"{get_src_path(Path(__file__))}/data/positions.json"
-        with open(ministries, "r", encoding="utf-8") as file:
-            masks = json.load(file)
-
-    if masks is None:
-        raise ValueError(
-            "No ministries pattern provided. Make you sure you either "
-            "provide a positions.json file with existing ministries patterns "
-            "or a list of masks to apply."
-        )
-
-    output_size = 0
-    selected_mask = ""
-    for mask in masks:
-        if mask in question.lower():
-            question = re.sub(rf"(?<=ministre) (d[u|e]s?\s){mask}", "", question)
-            if len(question) < input_size:
-                selected_mask = mask
-                output_size = len(question)
-                break
-
-    # Remove 4 because the pattern introducing the ministry is included
-    # in the regex (line 29)
-    if input_size - len(selected_mask) - 4 != output_size:
-        raise ValueError(
-            "An error occurred when applying the ministries mask. "
-            "Another part of the question was propably croped."
-        )
-
-    return question
+    """
+    Remove the ministry named in a question.
+
+    Parameters
+    ----------
+    question: str
+        The question text.
+    masks: List[str] | None, default=None
+        The ministries to mask, by priority. By default, the ones of
+        `data/positions.json`.
+
+    Returns
+    -------
+    str
+        The masked question.
+    """
+    ministry_mask = get_ministry_mask() if masks is None else MinistryMask(masks)
+    return ministry_mask.mask(question)
+
+
+def mask_questions(questions: Iterable[str]) -> List[str]:
+    """
+    Remove the ministry named in each question, with the masks of
+    `data/positions.json`.
+    """
+    return get_ministry_mask().mask_questions(questions)
+
 
 def save_government_positions(filename: str):
     results = []
@@ -1,8 +1,6 @@
-import json
 import random
 import time
-import pandas as pd
-from typing import List, TypedDict, Dict, Optional, Set
+from typing import Callable, List, TypedDict, Dict, Optional
 from tqdm import tqdm
 from errors.ThemesListTooLongException import ThemesListTooLongException
 from databases.connector import Connector
@@ -18,10 +16,12 @@ from models.Prompt import (
     RoleEnum,
     PromptResult,
 )
-from models.Question import Question
+from models.Question import Question, ThemeAncestor
+from models.Theme import Theme
 from prompting.run_prompt import run_prompt
 from utils.helpers import hash_list
-from utils.helpers import find_src_directory
+from prompting.example_store import ExampleStore, get_example_store
+from utils.knn_index import get_knn_index
 
 connector = Connector(ExportFormat.JSON)
 
@@ -151,6 +151,8 @@ def build_random_few_shot_prompt(
     accepted_themes: Optional[List[str]] = None,
     json_format: bool = False,
     selector_associations_table: Optional[Dict[str, str]] = None,
+    seed: Optional[int] = None,
+    similar_to: Optional[Question] = None,
 ) -> str | List[PromptText]:
     """
     Either sample random questions or sample random questions and explanations from the
@@ -178,12 +180,53 @@ def build_random_few_shot_prompt(
         Defines if the prompt should be formated as JSON.
     selector_associations_table: Dict[str, str], default=None
         Dictionany describing the association between a label and a proxy identifier. Used with proxy prompts.
+    seed: int | None, default=None
+        Makes the sampling of the examples deterministic.
+    similar_to: Question | None, default=None
+        If provided, the examples are the questions most similar to this one
+        in the nearest-neighbour index, of distinct labels when stratified.
+        Not available with chain-of-thought. Use `similar_examples_func` to
+        select them for each question of a run.
 
     Returns
     -------
     str
         The few-shot prompt template.
     """
+    if similar_to is not None:
+        if cot:
+            raise ValueError(
+                "Similar examples are not available with chain-of-thought."
+            )
+        if accepted_themes is None:
+            raise ValueError(
+                "When selecting similar examples, the accepted theme "
+                "list should also be provided."
+            )
+
+        similar_examples = get_few_shot_similar_examples(
+            k=k,
+            question=similar_to,
+            accepted_themes=accepted_themes,
+            stop_at_level=stop_at_level,
+            max_per_label=1 if stratified else k,
+        )
+        if as_context:
+            return _build_few_shot_prompt_as_context(
+                similar_examples,
+                llm_wrapper,
+                stop_at_level,
+                json_format,
+                selector_associations_table,
+            )
+        else:
+            return _build_few_shot_prompt_as_string(
+                similar_examples,
+                stop_at_level,
+                json_format,
+                selector_associations_table,
+            )
+
     if stratified:
         if accepted_themes is None:
             raise ValueError(
@@ -197,6 +240,7 @@ def build_random_few_shot_prompt(
                 legislature=legislature,
                 accepted_themes=accepted_themes,
                 stop_at_level=stop_at_level,
+                seed=seed,
             )
         else:
             stratified_examples = get_few_shot_stratified_examples(
@@ -204,6 +248,7 @@ def build_random_few_shot_prompt(
                 legislature=legislature,
                 accepted_themes=accepted_themes,
                 stop_at_level=stop_at_level,
+                seed=seed,
             )
 
         if as_context:
@@ -223,13 +268,7 @@ def build_random_few_shot_prompt(
             )
     else:
         if cot:
-            with open(f"{find_src_directory()}/data/explanations.json", "r") as file:
-                json_file = file.read()
-                questions = json.loads(json_file)
-                questions = [
-                    CotExplanation(**question)
-                    for question in random.sample(questions, k)
-                ]
+            questions = random.Random(seed).sample(_get_example_store().explanations, k)
         else:
             questions = connector.client.get_random_questions(
                 number_of_questions=k,
@@ -252,23 +291,46 @@ def build_random_few_shot_prompt(
             )
 
 
-def _build_child_to_parent_theme_mapping(
+def similar_examples_func(
+    k: int,
+    llm_wrapper: WrapperEnum,
     accepted_themes: List[str],
-    stop_at_level: int,
-) -> Dict[str, Set[str]]:
-    parent_to_child_theme = {}
-    for theme in accepted_themes:
-        parent_theme = connector.client.get_parent_theme_from_child_theme_name(
-            theme,
+    stop_at_level: int = 3,
+    stratified: bool = True,
+    json_format: bool = False,
+    selector_associations_table: Optional[Dict[str, str]] = None,
+) -> Callable[[Question], List[PromptText]]:
+    """
+    Build the `examples_func` of `run_prompts` selecting, for each question,
+    the `k` labelled questions most similar to it as few-shot examples. See
+    `build_random_few_shot_prompt` for the parameters.
+
+    Returns
+    -------
+    Callable[[Question], List[PromptText]]
+        Returns the few-shot examples of a question, as LLM context objects.
+    """
+
+    def examples_func(question: Question) -> List[PromptText]:
+        return build_random_few_shot_prompt(  # type: ignore
+            k,
+            llm_wrapper,
+            as_context=True,
+            stratified=stratified,
             stop_at_level=stop_at_level,
+            accepted_themes=accepted_themes,
+            json_format=json_format,
+            selector_associations_table=selector_associations_table,
+            similar_to=question,
         )
-        try:
-            parent_to_child_theme[parent_theme.name].add(theme)
-        except KeyError:
-            parent_to_child_theme[parent_theme.name] = set()
-            parent_to_child_theme[parent_theme.name].add(theme)
 
-    return parent_to_child_theme
+    return examples_func
+
+
+def _get_example_store() -> ExampleStore:
+    return get_example_store(
+        connector.client.get_theme_tree, connector.client.get_question_ids_by_theme
+    )
 
 
 def get_few_shot_cot_stratified_examples(
@@ -276,7 +338,8 @@ def get_few_shot_cot_stratified_examples(
     legislature: int | None,
     accepted_themes: List[str],
     stop_at_level: int,
-) -> List[Question]:
+    seed: int | None = None,
+) -> List[CotExplanation]:
     """
     Get stratified question examples for few-shot chain-of-thought settings.
 
@@ -290,44 +353,17 @@ def get_few_shot_cot_stratified_examples(
         List of themes from which to sample questions from.
     stop_at_level: int
         Defines the level from which to start looking from the child theme.
+    seed: int | None, default=None
+        Makes the sampling deterministic.
 
     Returns
     -------
-    List[Question]
-        The list of questions sampled.
+    List[CotExplanation]
+        The list of explanations sampled.
     """
-    sampled_questions = []
-    parent_to_child_theme = _build_child_to_parent_theme_mapping(
-        accepted_themes, stop_at_level
+    return _get_example_store().sample_explanations(
+        k, accepted_themes, stop_at_level, legislature=legislature, seed=seed
     )
-    with open(f"{find_src_directory()}/data/explanations.json", "r") as json_file:
-        content = json_file.read()
-        explanations = json.loads(content)
-        explanations_df = pd.DataFrame(explanations)
-
-    for _ in range(k):
-        try:
-            theme = random.choice(list(parent_to_child_theme.keys()))
-        except IndexError:
-            raise ValueError(
-                "The number of shots is higher than the number of available parent themes."
-            )
-        if legislature:
-            sampled_question = explanations_df[
-                (explanations_df["legislature"] == legislature)
-                & (explanations_df["label"] == theme)
-            ]
-        else:
-            sampled_question = (
-                explanations_df[explanations_df["label"] == theme]
-                .sample()
-                .iloc[0]
-                .to_dict()
-            )
-        sampled_questions.append(CotExplanation(**sampled_question))
-        del parent_to_child_theme[theme]
-
-    return sampled_questions
 
 
 def get_few_shot_stratified_examples(
@@ -335,6 +371,7 @@ def get_few_shot_stratified_examples(
     legislature: int | None,
     accepted_themes: List[str],
     stop_at_level: int,
+    seed: int | None = None,
 ) -> List[Question]:
     """
     Get stratified question examples for few-shot settings.
@@ -349,39 +386,86 @@ def get_few_shot_stratified_examples(
         List of themes from which to sample questions from.
     stop_at_level: int
         Defines the level from which to start looking from the child theme.
+    seed: int | None, default=None
+        Makes the sampling deterministic.
 
     Returns
     -------
     List[Question]
         The list of questions sampled.
     """
-    sampled_questions = []
-    parent_to_child_theme = _build_child_to_parent_theme_mapping(
-        accepted_themes, stop_at_level
+    question_ids = _get_example_store().sample_question_ids(
+        k, accepted_themes, stop_at_level, legislature=legislature, seed=seed
     )
+    return _get_questions_in_order(question_ids)
 
-    for _ in range(k):
-        try:
-            theme = random.choice(list(parent_to_child_theme.keys()))
-        except IndexError:
-            raise ValueError(
-                "The number of shots is higher than the number of available parent themes."
-            )
-        if legislature is None:
-            question = connector.client.get_question(
-                {"theme": {"$in": list(parent_to_child_theme[theme])}}
-            )
-        else:
-            question = connector.client.get_question(
-                {
-                    "legislature": {"$in": legislature},
-                    "theme": {"$in": list(parent_to_child_theme[theme])},
-                }
-            )
-        sampled_questions.append(Question(**question))
-        del parent_to_child_theme[theme]
 
-    return sampled_questions
+def get_few_shot_similar_examples(
+    k: int,
+    question: Question,
+    accepted_themes: List[str],
+    stop_at_level: int,
+    max_per_label: int = 1,
+) -> List[Question]:
+    """
+    Get the labeled questions most similar to a question for few-shot settings,
+    from the nearest-neighbour index built by `scripts/knn/build_knn_index.py`.
+
+    Parameters
+    ----------
+    k: int
+        Number of question examples.
+    question: Question
+        The incoming question, never returned as an example.
+    accepted_themes: List[str]
+        List of themes from which to select questions from.
+    stop_at_level: int
+        Defines the level of the labels of the examples.
+    max_per_label: int, default=1
+        Maximum number of examples of a same label.
+
+    Returns
+    -------
+    List[Question]
+        The examples, most similar first.
+    """
+    matches = get_knn_index().query(
+        question.question_text,
+        k,
+        labels=_get_example_store().labels_by_theme(accepted_themes, stop_at_level),
+        max_per_label=max_per_label,
+        exclude_ids={question.id},
+    )
+    return _get_questions_in_order([question_id for question_id, _, _ in matches])
+
+
+def _get_questions_in_order(question_ids: List[str]) -> List[Question]:
+    questions = {
+        question["id"]: Question(**question)
+        for question in connector.client.aggregate_questions(
+            [{"$match": {"id": {"$in": question_ids}}}]
+        )
+    }
+
+    return [questions[question_id] for question_id in question_ids]
+
+
+def _parent_theme_of_question(
+    question: Question, stop_at_level: int
+) -> Theme | ThemeAncestor:
+    """
+    Retrieve the parent theme of a question at a given level, from the ancestry
+    stored on the question or from the themes tree for older documents.
+    """
+    parent_theme = question.ancestor_at(stop_at_level)
+    if parent_theme is not None:
+        return parent_theme
+
+    return connector.client.get_parent_theme_from_child_theme_name(
+        question.theme,
+        stop_at_level=stop_at_level,
+        base_theme_level=0,
+    )
 
 
 def _build_llm_context_as_json(
@@ -432,11 +516,7 @@ def _build_llm_context_as_json(
         user_input = f"\n\nQuestion: {question.question_text}"
         user_question = PromptText(role=RoleEnum.User, content=str(user_input))
         llm_context.append(user_question)
-        parent_theme = connector.client.get_parent_theme_from_child_theme_name(
-            question.theme,  # type: ignore
-            stop_at_level=stop_at_level,
-            base_theme_level=0,
-        )
+        parent_theme = _parent_theme_of_question(question, stop_at_level)
         if selector_associations_table is not None:
             llm_answer = {"label": selector_associations_table[parent_theme.name]}
         else:
@@ -495,11 +575,7 @@ def _build_llm_context_as_string(
         user_text = f"\n{question.question_text}"
         user_question = PromptText(role=RoleEnum.User, content=user_text)
         llm_context.append(user_question)
-        parent_theme = connector.client.get_parent_theme_from_child_theme_name(
-            question.theme,  # type: ignore
-            stop_at_level=stop_at_level,
-            base_theme_level=0,
-        )
+        parent_theme = _parent_theme_of_question(question, stop_at_level)
         if selector_associations_table is not None:
             llm_text = f"\n{selector_associations_table[parent_theme.name]}"
         else:
@@ -592,11 +668,7 @@ def _build_few_shot_prompt_as_string(
                 else:
                     json_template["label"] = question.label
             else:
-                parent_theme = connector.client.get_parent_theme_from_child_theme_name(
-                    question.theme,  # type: ignore
-                    stop_at_level=stop_at_level,
-                    base_theme_level=0,
-                )
+                parent_theme = _parent_theme_of_question(question, stop_at_level)
                 json_template["question"] = question.question_text
                 if selector_associations_table is not None:
                     json_template["label"] = selector_associations_table[
@@ -617,11 +689,7 @@ def _build_few_shot_prompt_as_string(
                 else:
                     template += f"\n\nLabel: {question.label}"
             else:
-                parent_theme = connector.client.get_parent_theme_from_child_theme_name(
-                    question.theme,  # type: ignore
-                    stop_at_level=stop_at_level,
-                    base_theme_level=0,
-                )
+                parent_theme = _parent_theme_of_question(question, stop_at_level)
                 if selector_associations_table is not None:
                     template += (
                         f"\n\nLabel: {selector_associations_table[parent_theme.name]}"
@@ -666,24 +734,11 @@ def build_prompt_themes_list(
     if with_selector and len(themes_list) > (len(selectors)):
         raise ThemesListTooLongException
 
-    theme_documents = connector.client.get_themes(
-        {"level": theme_level, "name": {"$in": themes_list}}
+    theme_tree = connector.client.get_theme_tree()
+    accepted_themes_for_questions = theme_tree.accepted_theme_names(
+        theme_tree.get_many(themes_list, theme_level)
     )
 
-    theme_documents = list(theme_documents)
-    themes = []
-
-    accepted_themes_for_questions = []
-
-    for theme in theme_documents:
-        themes.append(theme)
-        sub_themes = connector.client.get_sub_themes_list_from_theme(
-            theme["unique_identifier"], flatten=True
-        )
-        for sub_theme in sub_themes:
-            if sub_theme["name"] not in accepted_themes_for_questions:
-                accepted_themes_for_questions.append(sub_theme["name"])
-
     themes_string = ""
 
     selector_associations_table = {}
@@ -0,0 +1,460 @@
+import math
+import weakref
+from functools import lru_cache
+from string import Formatter
+from typing import Any, Callable, Dict, List, Tuple
+from models.LLMOutput import Sample, WrapperOutput
+from models.Prompt import Prompt, PromptRun, PromptType, RoleEnum
+
+MAX_TOKEN = 512
+RENDER_PLANS_MAX_SIZE = 32
+
+# Marks the end of a prompt prefix which Anthropic may cache and reuse across
+# the questions of a run.
+ANTHROPIC_CACHE_CONTROL = {"type": "ephemeral"}
+
+TOP_LOGPROBS = 4
+# Maximum number of alternatives per token returned by OpenAI.
+OPENAI_MAX_TOP_LOGPROBS = 20
+
+
+class RenderPlan:
+    """
+    A prompt compiled once for a run into the messages expected by each
+    provider.
+
+    The messages which neither hold the question slot nor a key of the
+    association table are rendered at compilation and the same objects are
+    reused by every question, only the other ones are rendered per question.
+    The rendered messages are therefore shared and must not be mutated.
+
+    Parameters
+    ----------
+    prompt_texts : Tuple[Tuple[str, str], ...]
+        The role and content of each message of the prompt.
+    assoc_keys : Tuple[str, ...], optional
+        The keys of the association table applied to the messages, by default ().
+    """
+
+    def __init__(
+        self,
+        prompt_texts: Tuple[Tuple[str, str], ...],
+        assoc_keys: Tuple[str, ...] = (),
+    ):
+        self.system_prompt = next(
+            (
+                content
+                for role, content in prompt_texts
+                if role == RoleEnum.System.value
+            ),
+            None,
+        )
+        self._roles = [role for role, _ in prompt_texts]
+        self._templates = [content for _, content in prompt_texts]
+        self._all = list(range(len(prompt_texts)))
+        self._without_system = [
+            i for i in self._all if self._roles[i] != RoleEnum.System.value
+        ]
+        self._cached_index = (
+            self._without_system[-2] if len(self._without_system) > 1 else None
+        )
+        self.anthropic_system = [
+            {
+                "type": "text",
+                "text": self.system_prompt,
+                "cache_control": ANTHROPIC_CACHE_CONTROL,
+            }
+        ]
+
+        static: List[str | None] = []
+        for content in self._templates:
+            if any(field is not None for _, field, _, _ in Formatter().parse(content)):
+                static.append(None)
+                continue
+            content = content.format()
+            static.append(
+                None if any(key in content for key in assoc_keys) else content
+            )
+
+        self._chat = [
+            None if content is None else _chat_message(role, content)
+            for role, content in zip(self._roles, static)
+        ]
+        self._anthropic = [
+            None if content is None else _anthropic_message(role, content, cached)
+            for role, content, cached in zip(
+                self._roles, static, (i == self._cached_index for i in self._all)
+            )
+        ]
+        self._google = [
+            None if content is None else _google_content(role, content)
+            for role, content in zip(self._roles, static)
+        ]
+
+    def _content(
+        self, index: int, question_text: str, assoc: Dict[str, str] | None
+    ) -> str:
+        # Template user content contains '{0}'
+        content = self._templates[index].format(question_text)
+        if assoc:
+            for k, v in assoc.items():
+                content = content.replace(k, v)
+        return content
+
+    def messages(
+        self,
+        question_text: str,
+        assoc: Dict[str, str] | None = None,
+        with_system_prompt: bool = True,
+    ) -> List[Dict[str, str]]:
+        """
+        The chat messages of a question, as expected by OpenAI and Mistral.
+        """
+        return [
+            self._chat[i]
+            or _chat_message(self._roles[i], self._content(i, question_text, assoc))
+            for i in (self._all if with_system_prompt else self._without_system)
+        ]
+
+    def anthropic_messages(
+        self, question_text: str, assoc: Dict[str, str] | None = None
+    ) -> List[Dict[str, Any]]:
+        """
+        The messages of a question without the system prompt, the turn preceding
+        the question being marked as cacheable.
+        """
+        return [
+            self._anthropic[i]
+            or _anthropic_message(
+                self._roles[i],
+                self._content(i, question_text, assoc),
+                i == self._cached_index,
+            )
+            for i in self._without_system
+        ]
+
+    def google_contents(
+        self, question_text: str, assoc: Dict[str, str] | None = None
+    ) -> List[Dict[str, Any]]:
+        """
+        The contents of a question without the system prompt, as expected by
+        Gemini.
+        """
+        return [
+            self._google[i]
+            or _google_content(self._roles[i], self._content(i, question_text, assoc))
+            for i in self._without_system
+        ]
+
+
+def _chat_message(role: str, content: str) -> Dict[str, str]:
+    return {"role": role, "content": content}
+
+
+def _anthropic_message(role: str, content: str, cached: bool) -> Dict[str, Any]:
+    if not cached:
+        return {"role": role, "content": content}
+    return {
+        "role": role,
+        "content": [
+            {
+                "type": "text",
+                "text": content,
+                "cache_control": ANTHROPIC_CACHE_CONTROL,
+            }
+        ],
+    }
+
+
+def _google_content(role: str, content: str) -> Dict[str, Any]:
+    return {"parts": [{"text": content}], "role": role}
+
+
+# Render plans of the prompts being run, by identity, so that finding the plan
+# of a question does not depend on the size of the prompt. The prompts are not
+# modified once their run started.
+_prompt_render_plans: Dict[
+    Tuple[int, Tuple[str, ...]], Tuple[weakref.ref, RenderPlan]
+] = {}
+
+
+@lru_cache(maxsize=RENDER_PLANS_MAX_SIZE)
+def _compile_render_plan(
+    prompt_texts: Tuple[Tuple[str, str], ...], assoc_keys: Tuple[str, ...]
+) -> RenderPlan:
+    return RenderPlan(prompt_texts, assoc_keys)
+
+
+def get_render_plan(prompt: Prompt, assoc: Dict[str, str] | None = None) -> RenderPlan:
+    """
+    Get the render plan of a prompt, compiled on the first question of the run.
+
+    Parameters
+    ----------
+    prompt : Prompt
+        The prompt object containing the initial prompt data.
+    assoc : Dict[str, str] | None, optional
+        The association table applied to the messages, by default None. Only
+        its keys are part of the plan, its values may change between questions.
+
+    Returns
+    -------
+    RenderPlan
+        The compiled prompt.
+    """
+    assoc_keys = tuple(assoc) if assoc else ()
+    key = (id(prompt), assoc_keys)
+    entry = _prompt_render_plans.get(key)
+    if entry is not None and entry[0]() is prompt:
+        return entry[1]
+
+    plan = _compile_render_plan(
+        tuple((pr.role.value, pr.content) for pr in prompt.prompts), assoc_keys
+    )
+    if len(_prompt_render_plans) >= RENDER_PLANS_MAX_SIZE:
+        _prompt_render_plans.clear()
+    _prompt_render_plans[key] = (weakref.ref(prompt), plan)
+
+    return plan
+
+
+def format_messages(
+    prompt: Prompt,
+    question_text: str,
+    assoc: Dict[str, str] | None = None,
+    with_system_prompt: bool = True,
+) -> List[Dict[str, str]]:
+    """
+    Format the prompt texts as chat messages, inserting the question text and
+    applying the association table.
+
+    Parameters
+    ----------
+    prompt : Prompt
+        The prompt object containing the initial prompt data.
+    question_text : str
+        The text of the question being processed.
+    assoc : Dict[str, str] | None, optional
+        An optional dictionary of replacements applied to the messages, by default None.
+    with_system_prompt : bool, optional
+        If False, the system prompt is left out of the messages, by default True.
+
+    Returns
+    -------
+    List[Dict[str, str]]
+        The messages, as expected by the chat completion APIs.
+    """
+    return get_render_plan(prompt, assoc).messages(
+        question_text, assoc, with_system_prompt
+    )
+
+
+def get_top_logprobs(prompt_run: PromptRun) -> int:
+    """
+    Number of alternatives requested for each answer token: label distribution
+    prompts request one for each label of the run.
+    """
+    if PromptType.LabelDistribution in prompt_run.parameters.types:
+        return min(
+            max(len(prompt_run.themes_list), TOP_LOGPROBS), OPENAI_MAX_TOP_LOGPROBS
+        )
+    return TOP_LOGPROBS
+
+
+def build_openai_request(
+    prompt: Prompt,
+    prompt_run: PromptRun,
+    question_text: str,
+    assoc: Dict[str, str] | None = None,
+    samples: int = 1,
+) -> Dict[str, Any]:
+    """
+    Build the body of an OpenAI chat completion request.
+
+    OpenAI automatically caches long prompt prefixes: the messages shared by
+    every question of the run come first and only the last one holds the
+    question, and the prompt identifier routes the requests of a same prompt
+    to the same cache. Above one sample, the completions are drawn from a
+    single request billing the prompt once. Label distribution prompts request
+    an alternative for each label of the run.
+    """
+    request = {
+        "temperature": prompt_run.parameters.temperature,
+        "max_tokens": MAX_TOKEN,
+        "model": prompt_run.parameters.model,
+        "messages": format_messages(prompt, question_text, assoc),
+        "logprobs": True,
+        "top_logprobs": get_top_logprobs(prompt_run),
+        # Sent as an extra body field, unknown to the client of older SDKs.
+        "extra_body": {"prompt_cache_key": prompt.unique_identifier},
+    }
+    if samples > 1:
+        request["n"] = samples
+
+    return request
+
+
+def build_anthropic_request(
+    prompt: Prompt,
+    prompt_run: PromptRun,
+    question_text: str,
+    assoc: Dict[str, str] | None = None,
+) -> Dict[str, Any]:
+    """
+    Build the body of an Anthropic messages request.
+
+    The system prompt, and the example turns preceding the question if any,
+    are marked as cacheable so that the following questions of the run reuse
+    them. Prefixes below the minimum cacheable length of the model are sent
+    without caching.
+    """
+    plan = get_render_plan(prompt, assoc)
+
+    return {
+        "model": prompt_run.parameters.model,
+        "max_tokens": MAX_TOKEN,
+        "temperature": prompt_run.parameters.temperature,
+        "system": plan.anthropic_system,
+        # ? top_k=1,
+        # ? top_p=3,
+        "messages": plan.anthropic_messages(question_text, assoc),
+    }
+
+
+def parse_openai_response(
+    dict_response: Dict[str, Any],
+    prompt_run: PromptRun,
+    retrieve_theme_func: Callable[..., str] | None = None,
+) -> WrapperOutput:
+    """
+    Build the wrapper output from an OpenAI chat completion response. When the
+    response holds several completions, they are all kept as samples.
+    """
+    samples = []
+    for choice in dict_response["choices"]:
+        content = choice["message"]["content"]
+
+        if retrieve_theme_func is not None:
+            predicted_label = retrieve_theme_func(
+                prompt_run.themes_list,
+                prompt_run.parameters.theme_hierarchy_level,
+                content,
+            )
+        else:
+            predicted_label = content
+
+        samples.append(
+            Sample(response=content, predicted_label=predicted_label.lower().strip())
+        )
+
+    return WrapperOutput(
+        raw_response=samples[0].response,
+        prompt_tokens=dict_response["usage"]["prompt_tokens"],
+        cached_prompt_tokens=(
+            dict_response["usage"].get("prompt_tokens_details") or {}
+        ).get("cached_tokens")
+        or 0,
+        response_tokens=dict_response["usage"]["completion_tokens"],
+        predicted_label=samples[0].predicted_label,
+        logprobs=dict_response["choices"][0]["logprobs"]["content"],
+        samples=samples if len(samples) > 1 else None,
+        label_distribution=(
+            label_distribution(
+                dict_response["choices"][0]["logprobs"]["content"],
+                prompt_run,
+                retrieve_theme_func,
+            )
+            if PromptType.LabelDistribution in prompt_run.parameters.types
+            else None
+        ),
+    )
+
+
+def label_distribution(
+    tokens_metrics: List[Dict[str, Any]] | None,
+    prompt_run: PromptRun,
+    retrieve_theme_func: Callable[..., str] | None = None,
+) -> Dict[str, float] | None:
+    """
+    Compute the probability of each label of the run from the alternatives of
+    the first answer token, for prompts answering with a single selector.
+
+    Each alternative is mapped to its label with `retrieve_theme_func`, the
+    alternatives of a same label are summed and the distribution is normalised
+    over the label space, the labels missing from the alternatives having a
+    probability of 0.
+
+    Parameters
+    ----------
+    tokens_metrics : List[Dict[str, Any]] | None
+        The logprobs of the answer tokens, with their top alternatives.
+    prompt_run : PromptRun
+        All the parameters defining the prompt run.
+    retrieve_theme_func : Callable[..., str] | None, optional
+        Maps a selector to its label, by default None.
+
+    Returns
+    -------
+    Dict[str, float] | None
+        The probability of each label, or None if no alternative maps to a
+        label.
+    """
+    if not tokens_metrics:
+        return None
+
+    distribution = {label.lower().strip(): 0.0 for label in prompt_run.themes_list}
+    for alternative in tokens_metrics[0]["top_logprobs"]:
+        label = alternative["token"]
+        if retrieve_theme_func is not None:
+            label = retrieve_theme_func(
+                prompt_run.themes_list,
+                prompt_run.parameters.theme_hierarchy_level,
+                alternative["token"],
+            )
+        label = (label or "").lower().strip()
+        if label in distribution:
+            distribution[label] += math.exp(alternative["logprob"])
+
+    total = sum(distribution.values())
+    if total == 0:
+        return None
+
+    return {label: round(p / total, 6) for label, p in distribution.items()}
+
+
+def parse_anthropic_response(
+    dict_response: Dict[str, Any],
+    prompt_run: PromptRun,
+    retrieve_theme_func: Callable[..., str] | None = None,
+) -> WrapperOutput:
+    """
+    Build the wrapper output from an Anthropic messages response.
+    """
+    content = dict_response["content"][0]["text"]
+    usage = dict_response["usage"]
+    # Anthropic does not count the tokens read from or written to the cache in
+    # the input tokens.
+    cached_prompt_tokens = usage.get("cache_read_input_tokens") or 0
+    prompt_tokens = (
+        usage["input_tokens"]
+        + cached_prompt_tokens
+        + (usage.get("cache_creation_input_tokens") or 0)
+    )
+
+    if retrieve_theme_func is not None:
+        predicted_label = retrieve_theme_func(
+            prompt_run.themes_list,
+            prompt_run.parameters.theme_hierarchy_level,
+            content,
+        )
+    else:
+        predicted_label = content
+
+    return WrapperOutput(
+        raw_response=content,
+        prompt_tokens=prompt_tokens,
+        cached_prompt_tokens=cached_prompt_tokens,
+        response_tokens=usage["output_tokens"],
+        predicted_label=predicted_label,
+        logprobs=None,
+    )
@@ -0,0 +1,104 @@
+from typing import List
+from models.Prompt import Prompt, PromptRunParameters
+from models.Question import Question
+from models.RateLimit import RateLimit
+from models.RunPlan import RunPlan
+from configs.pricing import MIN_CACHED_PREFIX_TOKENS, get_pricing
+from configs.rate_limits import get_rate_limit
+from prompting.prompt_mask import question_processing
+from prompting.provider_requests import MAX_TOKEN, format_messages
+from utils.tokens import TokenCounter
+
+
+def plan_run(
+    question_list: List[Question],
+    prompt: Prompt,
+    parameters: PromptRunParameters,
+    ministry_mask: bool = False,
+    response_tokens_per_question: int = MAX_TOKEN,
+    max_concurrency: int = 1,
+    average_latency: float = 1.0,
+    rate_limit: RateLimit | None = None,
+) -> RunPlan:
+    """
+    Estimate the tokens, the cost and the duration of a prompt run, by
+    rendering the prompt of every question and counting its tokens.
+
+    Parameters
+    ----------
+    question_list: List[Question]
+        The questions of the batch.
+    prompt: Prompt
+        The prompt of the run.
+    parameters: PromptRunParameters
+        The parameters of the run.
+    ministry_mask: bool, default=False
+        If True, remove the ministry names in the question phrasing.
+    response_tokens_per_question: int, default=MAX_TOKEN
+        Expected number of response tokens per question. Defaults to the
+        maximum, giving an upper bound: a few tokens are enough for a label,
+        chain-of-thought prompts need a few hundreds.
+    max_concurrency: int, default=1
+        Maximum number of requests in flight.
+    average_latency: float, default=1.0
+        Expected duration of a request, in seconds.
+    rate_limit: RateLimit | None, default=None
+        Custom provider limits, replacing the ones of `configs/rate_limits.py`.
+
+    Returns
+    -------
+    RunPlan
+        The estimations.
+    """
+    token_counter = TokenCounter(parameters.wrapper, parameters.model)
+    pricing = get_pricing(parameters.wrapper, parameters.model)
+    rate_limit = rate_limit or get_rate_limit(parameters.wrapper, parameters.model)
+
+    prompt_tokens = 0
+    cached_prompt_tokens = 0
+    max_prompt_tokens_per_question = 0
+    for i, question in enumerate(question_list):
+        question_text = question.question_text
+        if ministry_mask:
+            question_text = question_processing(question_text)
+
+        messages = format_messages(prompt, question_text)
+        question_prompt_tokens = token_counter.count_messages(messages)
+
+        # Every message but the question is shared by the run: after the first
+        # question, providers serve long enough prefixes from their cache.
+        if i == 0:
+            prefix_tokens = token_counter.count_messages(messages[:-1])
+        elif prefix_tokens >= MIN_CACHED_PREFIX_TOKENS:
+            cached_prompt_tokens += prefix_tokens
+
+        prompt_tokens += question_prompt_tokens
+        max_prompt_tokens_per_question = max(
+            max_prompt_tokens_per_question, question_prompt_tokens
+        )
+
+    number_of_questions = len(question_list)
+    response_tokens = response_tokens_per_question * number_of_questions
+
+    # The slowest of the request rate, the token rate and the concurrency.
+    durations = [
+        number_of_questions * 60 / rate_limit.requests_per_minute,
+        number_of_questions * average_latency / max(1, max_concurrency),
+    ]
+    if rate_limit.tokens_per_minute is not None:
+        durations.append(
+            (prompt_tokens + response_tokens) * 60 / rate_limit.tokens_per_minute
+        )
+
+    return RunPlan(
+        number_of_questions=number_of_questions,
+        prompt_tokens=prompt_tokens,
+        cached_prompt_tokens=cached_prompt_tokens,
+        response_tokens=response_tokens,
+        max_prompt_tokens_per_question=max_prompt_tokens_per_question,
+        exact_token_counts=token_counter.is_exact,
+        estimated_cost=pricing.cost(
+            prompt_tokens, response_tokens, cached_prompt_tokens
+        ),
+        estimated_duration=max(durations),
+    )
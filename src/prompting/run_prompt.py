@@ -4,7 +4,9 @@ from tqdm import tqdm
 from bson import ObjectId
 from models.Batch import Batch
 from pydantic import BaseModel
+from concurrent.futures import ThreadPoolExecutor
 from prompting.llm_wrappers import (
+    MAX_TOKEN,
     prompt_openai,
     prompt_anthropic,
     prompt_google,
@@ -12,15 +14,35 @@ from prompting.llm_wrappers import (
 )
 from bson.errors import InvalidId
 from prompting.prompt_mask import question_processing
+from prompting.validators import themes_validator
+from prompting.batch_api import (
+    BATCH_WRAPPERS,
+    get_batch_client,
+    submit_batch,
+    wait_for_batch,
+)
+from prompting.provider_requests import (
+    build_anthropic_request,
+    build_openai_request,
+    format_messages,
+    get_top_logprobs,
+    parse_anthropic_response,
+    parse_openai_response,
+)
 from utils.logger import get_logger
 from utils.helpers import hash_list
+from utils.tokens import estimate_tokens
+from utils.rate_limiter import RateLimiter, get_rate_limiter
+from utils.token_budget import TokenBudget
+from utils.result_sink import ResultSink, get_result_sink
+from utils.response_cache import ResponseCache, get_response_cache, response_cache_key
+from models.RateLimit import RateLimit
 from models.Prompt import WrapperEnum
 from databases.connector import Connector
-from typing import Callable, List, Optional, Tuple, Dict
+from typing import Any, Callable, List, Optional, Tuple, Dict
 from models.ExportFormat import ExportFormat
-from guardrails import Guard
-from guardrails.hub import ValidChoices
 from models.Prompt import (
+    FailedGenerations,
     Prompt,
     PromptResult,
     PromptRun,
@@ -29,10 +51,24 @@ from models.Prompt import (
     PromptText,
 )
 from models.Question import Question
+from errors.WrongRunIdProvided import WrongRunIdProvided
+from errors.BudgetExceededException import BudgetExceededException
+from configs.pricing import get_pricing
+from configs.result_sink import RESULT_SINK_FLUSH_INTERVAL, RESULT_SPOOL_DIRECTORY
+from models.RunPlan import RunPlan
+from prompting.run_plan import plan_run
+from prompting.self_consistency import sample_until_consistent
+from configs.self_consistency import AGREEMENT_THRESHOLD
+from models.LLMOutput import WrapperOutput
 
 logger = get_logger()
 connector = Connector(ExportFormat.JSON)
 
+# Maximum number of attempts of a question, the first one included.
+MAX_ATTEMPTS = 3
+# Delay before the first retry round, doubled at each round.
+RETRY_BASE_DELAY = 30.0
+
 
 def _build_question_list(
     batch_id: str | None, number_of_questions: int, accepted_themes: List[str] | None
@@ -50,22 +86,261 @@ def _build_question_list(
 
         batch_id = str(connector.client.add_batch(batch).inserted_id)
     else:
-        error_msg = f"Batch with ID {batch_id} does not exist in the database."
-        try:
-            batch = connector.client.get_batch({"_id": ObjectId(batch_id)})
-            if batch is None:
-                logger.error(error_msg)
-                raise IndexError(error_msg)
-        except InvalidId:
-            logger.error(f"Batch with ID {batch_id} does not exist in the database.")
+        batch = _get_batch(batch_id)
+        question_list = _get_questions(batch["question_ids"])
+
+    return batch_id, question_list
+
+
+def _get_batch(batch_id: str) -> Dict[str, Any]:
+    error_msg = f"Batch with ID {batch_id} does not exist in the database."
+    try:
+        batch = connector.client.get_batch({"_id": ObjectId(batch_id)})
+        if batch is None:
+            logger.error(error_msg)
             raise IndexError(error_msg)
+    except InvalidId:
+        logger.error(error_msg)
+        raise IndexError(error_msg)
+
+    return batch
+
+
+def _get_questions(question_ids: List[str]) -> List[Question]:
+    question_list = connector.client.aggregate_questions(
+        [{"$match": {"id": {"$in": question_ids}}}]
+    )
+    return [Question(**question) for question in list(question_list)]
+
+
+def _get_result_sink() -> ResultSink:
+    return get_result_sink(connector.client.add_prompt_results)
+
+
+def _validate_response(
+    prompt_run: PromptRun,
+    response: WrapperOutput,
+    validation_func: Callable | None = None,
+) -> None:
+    """
+    Check an LLM response with the custom validation, or against the label
+    space of the prompt run.
+
+    Raises
+    ------
+    InvalidLLMOutputException
+        If the predicted theme is not in the label space of the prompt run.
+    Exception
+        If the response does not pass the custom validation.
+    """
+    if validation_func is not None:
+        validation_func(response.raw_response)
+    else:
+        themes_validator(tuple(prompt_run.themes_list))(response.predicted_label)
+
 
-        question_list = connector.client.aggregate_questions(
-            [{"$match": {"id": {"$in": batch["question_ids"]}}}]
+def _process_response(
+    question: Question,
+    prompt: Prompt,
+    prompt_run_id: str,
+    prompt_run: PromptRun,
+    response: WrapperOutput,
+    validation_func: Callable | None = None,
+    dry_run: bool = False,
+) -> PromptResult:
+    """
+    Validate an LLM response, attach the gold label of the question and save
+    the result. Shared by the direct and the batch API calls.
+
+    Raises
+    ------
+    ValueError
+        If the theme of the question has no ancestor at the hierarchy level of
+        the prompt run.
+    InvalidLLMOutputException
+        If the predicted theme is not in the label space of the prompt run.
+    Exception
+        If the response does not pass the custom validation.
+    """
+    start_time = time.perf_counter()
+
+    response_theme = response.predicted_label
+
+    elapsed_time = time.perf_counter() - start_time
+    logger.info(f"Time taken to retrieve theme: {elapsed_time:.4f} seconds")
+
+    start_time = time.perf_counter()
+
+    top_level_theme = question.ancestor_at(prompt_run.parameters.theme_hierarchy_level)
+    if top_level_theme is None:
+        theme_tree = connector.client.get_theme_tree()
+        question_theme = theme_tree.get(question.theme, 0)
+        top_level_theme = theme_tree.ancestor_at(
+            question_theme,
+            prompt_run.parameters.theme_hierarchy_level,
         )
-        question_list = [Question(**question) for question in list(question_list)]
 
-    return batch_id, question_list
+    elapsed_time = time.perf_counter() - start_time
+    logger.info(f"Time taken to retrieve theme from db: {elapsed_time:.4f} seconds")
+
+    if top_level_theme is None:
+        error_msg = "An error occurred with the theme mapping."
+        logger.error(error_msg)
+        raise ValueError(error_msg)
+
+    logger.info(f"Predicted theme : {response_theme}")
+    logger.info(f"Gold label theme : {top_level_theme.name}")
+
+    # ? edit batch to replace questions that are not valid (encoding, empty, etc.)
+
+    start_time = time.perf_counter()
+
+    _validate_response(prompt_run, response, validation_func)
+
+    elapsed_time = time.perf_counter() - start_time
+    logger.info(f"Time taken to validate the output: {elapsed_time:.4f} seconds")
+
+    legislature = question.id[: question.id.index("-")]
+
+    start_time = time.perf_counter()
+
+    prompt_result = PromptResult(
+        run_id=prompt_run_id,
+        question_id=question.id,
+        batch_id=prompt_run.batch_id,
+        prompt_id=prompt.unique_identifier,
+        response=response.raw_response,
+        final_answer=response_theme.lower().strip(),
+        response_tokens=response.response_tokens,
+        prompt_tokens=response.prompt_tokens,
+        cached_prompt_tokens=response.cached_prompt_tokens,
+        legislature=int(legislature),
+        logprobs=response.logprobs,
+        question_theme=question.theme,
+        gold_label=top_level_theme.name,
+        cache_hit=response.cache_hit,
+        samples=response.samples,
+        label_distribution=response.label_distribution,
+    )
+
+    if dry_run:
+        print(str(prompt_result) + "\n-------------------------")
+    else:
+        _get_result_sink().put({**prompt_result.model_dump(), "_id": str(ObjectId())})
+
+    elapsed_time = time.perf_counter() - start_time
+    logger.info(f"Time taken to spool the result: {elapsed_time:.4f} seconds")
+
+    return prompt_result
+
+
+def _call_wrapper(
+    prompt: Prompt,
+    prompt_run: PromptRun,
+    question_text: str,
+    assoc: Dict[str, str] | None = None,
+    response_format: Optional[BaseModel] = None,
+    retrieve_theme_func: Callable[..., str] | None = None,
+    samples: int = 1,
+) -> WrapperOutput:
+    """
+    Send a prompt to the provider of the prompt run. Several samples can only
+    be drawn from a single OpenAI request.
+
+    Raises
+    ------
+    TypeError
+        If the wrapper of the prompt run is not supported.
+    """
+    match prompt_run.parameters.wrapper:
+        case WrapperEnum.OpenAI:
+            return prompt_openai(
+                prompt,
+                prompt_run,
+                question_text,
+                assoc,
+                response_format,
+                retrieve_theme_func,
+                samples,
+            )
+        case WrapperEnum.Anthropic:
+            return prompt_anthropic(
+                prompt,
+                prompt_run,
+                question_text,
+                assoc,
+                retrieve_theme_func,
+            )
+        case WrapperEnum.Mistral:
+            return prompt_mistral(
+                prompt,
+                prompt_run,
+                question_text,
+                assoc,
+                retrieve_theme_func,
+            )
+        case WrapperEnum.Google:
+            return prompt_google(
+                prompt,
+                prompt_run,
+                question_text,
+                assoc,
+                retrieve_theme_func,
+            )
+        case _:
+            raise TypeError(
+                f"The provided wrapper {prompt_run.parameters.wrapper} does not exists."
+            )
+
+
+def _record_failure(
+    question_id: str,
+    prompt_run_id: str,
+    error: Exception,
+    duration: float,
+    dry_run: bool = False,
+) -> None:
+    """
+    Record a failed generation in the dead-letter collection, so that it can be
+    retried once the main sweep is done.
+    """
+    logger.error(f"Question #{question_id} failed with {type(error).__name__}")
+    if dry_run:
+        return
+
+    now = int(time.time())
+    try:
+        connector.client.record_failed_generation(
+            FailedGenerations(
+                question_id=question_id,
+                run_id=prompt_run_id,
+                error_class=type(error).__name__,
+                error_message=str(error),
+                first_failed_at=now,
+                last_failed_at=now,
+                duration=duration,
+            )
+        )
+    except Exception as _:
+        logger.error(traceback.format_exc())
+
+
+def _question_prompt(
+    prompt: Prompt,
+    question: Question,
+    examples_func: Callable[[Question], List[PromptText]] | None = None,
+) -> Prompt:
+    """
+    The prompt of a question: the examples selected for it are inserted before
+    the last prompt text, the one holding the question.
+    """
+    if examples_func is None:
+        return prompt
+
+    return Prompt(
+        unique_identifier=prompt.unique_identifier,
+        prompts=[*prompt.prompts[:-1], *examples_func(question), prompt.prompts[-1]],
+    )
 
 
 def run_prompt(
@@ -79,9 +354,14 @@ def run_prompt(
     validation_func: Callable | None = None,
     ministry_mask: bool = False,
     dry_run: bool = False,
-) -> None:
+    rate_limiter: RateLimiter | None = None,
+    response_cache: ResponseCache | None = None,
+    token_budget: TokenBudget | None = None,
+    examples_func: Callable[[Question], List[PromptText]] | None = None,
+) -> PromptResult | None:
     """
-    Run an LLM prompt for a single question.
+    Run an LLM prompt for a single question. Failures are logged and recorded
+    in the dead-letter collection instead of being raised.
 
     Parameters
     ----------
@@ -110,6 +390,27 @@ def run_prompt(
     dry_run: bool, default=False
         Controls if the LLM results should be written in the database
         or not.
+    rate_limiter: RateLimiter | None, default=None
+        If provided, wait for the provider limits before sending the request.
+    response_cache: ResponseCache | None, default=None
+        If provided, reuse the cached response of an identical request instead
+        of sending it again.
+    token_budget: TokenBudget | None, default=None
+        If provided, reserve the estimated usage of the request in the budget
+        of the run before sending it.
+    examples_func: Callable[[Question], List[PromptText]] | None, default=None
+        If provided, returns the few-shot examples of the question, inserted
+        before the last prompt text.
+
+    Returns
+    -------
+    PromptResult | None
+        The result, or None if the generation failed.
+
+    Raises
+    ------
+    BudgetExceededException
+        If the request could exceed the budget of the run.
     """
 
     logger.info(f"Question #{question.id}")
@@ -118,132 +419,429 @@ def run_prompt(
     if ministry_mask:
         question_text = question_processing(question_text)
 
-    start_time = time.perf_counter()
+    prompt_result = None
+    question_start_time = time.perf_counter()
 
     try:
-        match prompt_run.parameters.wrapper:
-            case WrapperEnum.OpenAI:
-                response = prompt_openai(
-                    prompt,
-                    prompt_run,
-                    question_text,
-                    assoc,
-                    response_format,
-                    retrieve_theme_func,
-                )
-            case WrapperEnum.Anthropic:
-                response = prompt_anthropic(
-                    prompt,
-                    prompt_run,
-                    question_text,
-                    assoc,
-                    retrieve_theme_func,
+        prompt = _question_prompt(prompt, question, examples_func)
+
+        def send_request(samples: int = 1) -> Dict[str, Any]:
+            estimated_prompt_tokens = estimate_tokens(
+                [pr.content for pr in prompt.prompts] + [question_text]
+            )
+            estimated_response_tokens = MAX_TOKEN * samples
+            if token_budget is not None:
+                token_budget.reserve(estimated_prompt_tokens, estimated_response_tokens)
+            if rate_limiter is not None:
+                rate_limiter.acquire(
+                    estimated_prompt_tokens + estimated_response_tokens
                 )
-            case WrapperEnum.Mistral:
-                response = prompt_mistral(
+
+            start_time = time.perf_counter()
+
+            try:
+                response = _call_wrapper(
                     prompt,
                     prompt_run,
                     question_text,
                     assoc,
+                    response_format,
                     retrieve_theme_func,
+                    samples,
                 )
-            case WrapperEnum.Google:
-                response = prompt_google(
-                    prompt,
-                    prompt_run,
-                    question_text,
-                    assoc,
-                    retrieve_theme_func,
+            except Exception as _:
+                if token_budget is not None:
+                    token_budget.record(
+                        estimated_prompt_tokens, estimated_response_tokens, 0, 0
+                    )
+                raise
+
+            elapsed_time = time.perf_counter() - start_time
+            logger.info(f"Time taken for API call: {elapsed_time:.4f} seconds")
+
+            if rate_limiter is not None:
+                rate_limiter.record(
+                    estimated_prompt_tokens + estimated_response_tokens,
+                    response.prompt_tokens + response.response_tokens,
                 )
-            case _:
-                raise TypeError(
-                    f"The provided wrapper {prompt_run.parameters.wrapper} does not exists."
+            if token_budget is not None:
+                token_budget.record(
+                    estimated_prompt_tokens,
+                    estimated_response_tokens,
+                    response.prompt_tokens,
+                    response.response_tokens,
+                    response.cached_prompt_tokens,
                 )
 
-        elapsed_time = time.perf_counter() - start_time
-        logger.info(f"Time taken for API call: {elapsed_time:.4f} seconds")
+            return response.model_dump(exclude={"cache_hit"})
 
-        prompt_tokens = response.prompt_tokens  # type: ignore
-        logger.info(f"Total prompt tokens : {prompt_tokens}")
-        logger.info(f"API response : {response.raw_response}")  # type: ignore
+        def draw_samples(size: int) -> List[WrapperOutput]:
+            if prompt_run.parameters.wrapper == WrapperEnum.OpenAI:
+                return [WrapperOutput(**send_request(size))]
+            with ThreadPoolExecutor(max_workers=size) as executor:
+                futures = [executor.submit(send_request) for _ in range(size)]
+                return [WrapperOutput(**future.result()) for future in futures]
 
-        start_time = time.perf_counter()
-
-        response_message = response.raw_response  # type: ignore
-        response_theme = response.predicted_label
+        if prompt_run.samples > 1:
+            # The samples of a same request must not be shared across questions
+            # or runs, they do not go through the response cache.
+            response_data = sample_until_consistent(
+                draw_samples, prompt_run.samples, prompt_run.agreement_threshold
+            ).model_dump(exclude={"cache_hit"})
+            cache_hit = False
+        elif response_cache is not None and response_cache.accepts(
+            prompt_run.parameters.temperature
+        ):
+            key = response_cache_key(
+                wrapper=prompt_run.parameters.wrapper.value,
+                model=prompt_run.parameters.model,
+                temperature=prompt_run.parameters.temperature,
+                types=[
+                    prompt_type.value for prompt_type in prompt_run.parameters.types
+                ],
+                top_logprobs=get_top_logprobs(prompt_run),
+                messages=format_messages(prompt, question_text, assoc),
+                themes_list=prompt_run.themes_list,
+                theme_hierarchy_level=prompt_run.parameters.theme_hierarchy_level,
+                response_format=getattr(response_format, "__name__", None),
+                retrieve_theme_func=getattr(retrieve_theme_func, "__qualname__", None),
+            )
+            response_data, cache_hit = response_cache.get_or_compute(
+                key,
+                send_request,
+                lambda response_data: _validate_response(
+                    prompt_run, WrapperOutput(**response_data), validation_func
+                ),
+            )
+        else:
+            response_data, cache_hit = send_request(), False
 
-        elapsed_time = time.perf_counter() - start_time
-        logger.info(f"Time taken to retrieve theme: {elapsed_time:.4f} seconds")
+        response = WrapperOutput(**response_data, cache_hit=cache_hit)
+        if cache_hit:
+            logger.info("Response retrieved from the cache")
 
-        start_time = time.perf_counter()
+        prompt_tokens = response.prompt_tokens
+        logger.info(
+            f"Total prompt tokens : {prompt_tokens}"
+            f" ({response.cached_prompt_tokens} cached)"
+        )
+        logger.info(f"API response : {response.raw_response}")
 
-        question_theme = connector.client.get_theme(
-            {"name": question.theme, "level": 0}
+        prompt_result = _process_response(
+            question=question,
+            prompt=prompt,
+            prompt_run_id=prompt_run_id,
+            prompt_run=prompt_run,
+            response=response,
+            validation_func=validation_func,
+            dry_run=dry_run,
         )
-        top_level_theme = connector.client.get_parent_theme(
-            question_theme.parent_theme_identifier,  # type: ignore
-            stop_at_level=prompt_run.parameters.theme_hierarchy_level,
+
+    except BudgetExceededException as _:
+        raise
+    except Exception as e:
+        logger.error(traceback.format_exc())
+        _record_failure(
+            question.id,
+            prompt_run_id,
+            e,
+            time.perf_counter() - question_start_time,
+            dry_run,
         )
 
-        elapsed_time = time.perf_counter() - start_time
-        logger.info(f"Time taken to retrieve theme from db: {elapsed_time:.4f} seconds")
+    logger.info("-----------------------")
 
-        if top_level_theme is None:
-            error_msg = "An error occurred with the theme mapping."
-            logger.error(error_msg)
-        else:
-            logger.info(f"Predicted theme : {response_theme}")
-            logger.info(f"Gold label theme : {top_level_theme.name}")
+    return prompt_result
 
-            # ? edit batch to replace questions that are not valid (encoding, empty, etc.)
 
-            start_time = time.perf_counter()
+def run_batch_prompts(
+    question_list: List[Question],
+    prompt: Prompt,
+    prompt_run_id: str,
+    prompt_run: PromptRun,
+    assoc: Dict[str, str] | None = None,
+    response_format: Optional[BaseModel] = None,
+    retrieve_theme_func: Callable[..., str] | None = None,
+    validation_func: Callable | None = None,
+    ministry_mask: bool = False,
+    dry_run: bool = False,
+    client: Any = None,
+    poll_interval: float = 60.0,
+    examples_func: Callable[[Question], List[PromptText]] | None = None,
+) -> List[PromptResult]:
+    """
+    Run an LLM prompt for a list of questions through the provider batch API
+    (OpenAI Batch API or Anthropic Message Batches): all requests are submitted
+    at once, the batch is polled until it ends, then each response goes through
+    the same validation and gold label logic as `run_prompt`.
 
-            if validation_func is not None:
-                validation_func(response_message)
-            else:
-                guard = Guard().use(
-                    ValidChoices, choices=prompt_run.themes_list, on_fail="exception"
-                )
-                guard.validate(response_theme)
+    Parameters
+    ----------
+    question_list: List[Question]
+        The questions to send.
+    prompt: Prompt
+        The input prompt provided to the LLM.
+    prompt_run_id: str
+        A unique identifier to identify the prompt run.
+    prompt_run: PromptRun
+        All the parameters defining the prompt run.
+    assoc: Dict[str, str] | None, default=None
+        An association table to replace previous LLM prompt answers.
+    response_format: Optional[BaseModel], default=None
+        Not supported by the batch mode.
+    retrieve_theme_func: Callable[..., str] | None = None
+        A function used to retrieve the original corresponding theme
+        in the database.
+    validation_func: Callable | None, default=None
+        A custom validation function in order to reject LLM answers
+        that do not follow the provided guardrails.
+    ministry_mask: bool, default=False
+        If True, remove the ministry names in the question phrasing.
+    dry_run: bool, default=False
+        Controls if the LLM results should be written in the database
+        or not.
+    client: OpenAI | Anthropic | None, default=None
+        The provider client. Defaults to a client built from the environment
+        (`OPENAI_BASE_URL` / `ANTHROPIC_BASE_URL` can point to a stand-in server).
+    poll_interval: float, default=60.0
+        Number of seconds between two batch status checks.
+    examples_func: Callable[[Question], List[PromptText]] | None, default=None
+        If provided, returns the few-shot examples of each question, inserted
+        before the last prompt text.
 
-            elapsed_time = time.perf_counter() - start_time
-            logger.info(
-                f"Time taken to validate the output: {elapsed_time:.4f} seconds"
+    Returns
+    -------
+    List[PromptResult]
+        The results which passed the validation. The other questions are
+        recorded in the dead-letter collection.
+
+    Raises
+    ------
+    ValueError
+        If the provider has no batch API, if a response format is provided or
+        if the prompt run draws several samples per question.
+    """
+    wrapper = prompt_run.parameters.wrapper
+    if wrapper not in BATCH_WRAPPERS:
+        raise ValueError(f"The {wrapper.value} wrapper has no batch API.")
+    if response_format is not None:
+        raise ValueError("Response formats are not supported in batch mode.")
+    if prompt_run.samples > 1:
+        raise ValueError("Self-consistency is not supported in batch mode.")
+
+    match wrapper:
+        case WrapperEnum.OpenAI:
+            build_request, parse_response = build_openai_request, parse_openai_response
+        case _:
+            build_request, parse_response = (
+                build_anthropic_request,
+                parse_anthropic_response,
             )
 
-            legislature = question.id[: question.id.index("-")]
+    requests = {}
+    for question in question_list:
+        question_text = question.question_text
+        if ministry_mask:
+            question_text = question_processing(question_text)
+        requests[question.id] = build_request(
+            _question_prompt(prompt, question, examples_func),
+            prompt_run,
+            question_text,
+            assoc,
+        )
 
-            start_time = time.perf_counter()
+    if client is None:
+        client = get_batch_client(wrapper)
 
-            prompt_result = PromptResult(
-                run_id=prompt_run_id,
-                question_id=question.id,
-                batch_id=prompt_run.batch_id,
-                prompt_id=prompt.unique_identifier,
-                response=response.raw_response,  # type: ignore
-                final_answer=response_theme.lower().strip(),
-                response_tokens=response.response_tokens,  # type: ignore
-                prompt_tokens=prompt_tokens,
-                legislature=int(legislature),
-                logprobs=response.logprobs,  # type: ignore
-                question_theme=question_theme.name,  # type: ignore
-                gold_label=top_level_theme.name,
+    provider_batch_id = submit_batch(wrapper, client, requests)
+    logger.info(f"Submitted provider batch #{provider_batch_id}")
+
+    responses = wait_for_batch(wrapper, client, provider_batch_id, poll_interval)
+
+    prompt_results = []
+    for question in tqdm(question_list):
+        logger.info(f"Question #{question.id}")
+        if question.id not in responses:
+            logger.error(f"No batch result for question #{question.id}")
+            _record_failure(
+                question.id,
+                prompt_run_id,
+                LookupError(f"No result in provider batch #{provider_batch_id}"),
+                0.0,
+                dry_run,
             )
+            continue
 
-            if dry_run:
-                print(str(prompt_result) + "\n-------------------------")
-            else:
-                connector.client.add_prompt_result(prompt_result)
+        try:
+            response = parse_response(
+                responses[question.id], prompt_run, retrieve_theme_func
+            )
+            logger.info(f"API response : {response.raw_response}")
+            prompt_result = _process_response(
+                question=question,
+                prompt=prompt,
+                prompt_run_id=prompt_run_id,
+                prompt_run=prompt_run,
+                response=response,
+                validation_func=validation_func,
+                dry_run=dry_run,
+            )
+            prompt_results.append(prompt_result)
+        except Exception as e:
+            logger.error(traceback.format_exc())
+            _record_failure(question.id, prompt_run_id, e, 0.0, dry_run)
 
-            elapsed_time = time.perf_counter() - start_time
-            logger.info(f"Time taken save the result to db: {elapsed_time:.4f} seconds")
+        logger.info("-----------------------")
 
-    except Exception as _:
-        logger.error(traceback.format_exc())
-        pass
+    return prompt_results
 
-    logger.info("-----------------------")
+
+def _flush_results() -> None:
+    """
+    Wait for the results of the run to be written to the database. If it is
+    unreachable, they stay in the local spool and are written by the next run.
+    """
+    if not _get_result_sink().flush(timeout=RESULT_SINK_FLUSH_INTERVAL * 5):
+        logger.error(
+            "The database is unreachable: the remaining results are kept in "
+            f"{RESULT_SPOOL_DIRECTORY} and will be written by the next run."
+        )
+
+
+def _run_questions(
+    question_list: List[Question],
+    max_concurrency: int,
+    sleep_time: float,
+    **run_prompt_kwargs,
+) -> List[PromptResult | None]:
+    """
+    Run the prompt for each question, one after another or through a thread
+    pool bounding the number of requests in flight. Progress is reported in
+    question order.
+    """
+    if max_concurrency <= 1:
+        prompt_results = []
+        for question in tqdm(question_list):
+            time.sleep(sleep_time)
+            prompt_results.append(run_prompt(question=question, **run_prompt_kwargs))
+        return prompt_results
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        futures = [
+            executor.submit(run_prompt, question=question, **run_prompt_kwargs)
+            for question in question_list
+        ]
+        return [future.result() for future in tqdm(futures)]
+
+
+def _retry_failed_generations(
+    max_attempts: int,
+    max_concurrency: int,
+    sleep_time: float,
+    retry_base_delay: float = RETRY_BASE_DELAY,
+    sleep: Callable[[float], None] = time.sleep,
+    **run_prompt_kwargs,
+) -> int:
+    """
+    Replay the failed generations of a prompt run with an exponential backoff
+    between rounds, until they all succeed or reach `max_attempts` attempts.
+
+    Returns
+    -------
+    int
+        The number of recovered questions.
+    """
+    prompt_run_id = run_prompt_kwargs["prompt_run_id"]
+    recovered_count = 0
+
+    # Each round increments the attempts of the questions still failing, so
+    # there are at most `max_attempts - 1` rounds.
+    for retry_round in range(max_attempts - 1):
+        failures = connector.client.get_failed_generations(
+            prompt_run_id, max_attempts=max_attempts
+        )
+        if not len(failures):
+            break
+
+        delay = retry_base_delay * 2**retry_round
+        logger.info(
+            f"Retrying {len(failures)} failed generations of #{prompt_run_id} "
+            f"in {delay:.0f} seconds"
+        )
+        sleep(delay)
+
+        question_list = _get_questions([failure.question_id for failure in failures])
+        prompt_results = _run_questions(
+            question_list, max_concurrency, sleep_time, **run_prompt_kwargs
+        )
+        recovered_question_ids = [
+            question.id
+            for question, prompt_result in zip(question_list, prompt_results)
+            if prompt_result is not None
+        ]
+        if len(recovered_question_ids):
+            connector.client.delete_failed_generations(
+                prompt_run_id, recovered_question_ids
+            )
+        recovered_count += len(recovered_question_ids)
+
+    remaining_failures = connector.client.get_failed_generations(prompt_run_id)
+    logger.info(
+        f"{recovered_count} failed generations recovered, "
+        f"{len(remaining_failures)} left in the dead-letter collection"
+    )
+
+    return recovered_count
+
+
+def _execute_prompts(
+    question_list: List[Question],
+    max_concurrency: int,
+    sleep_time: float,
+    batch_mode: bool = False,
+    batch_client: Any = None,
+    max_attempts: int = MAX_ATTEMPTS,
+    **run_prompt_kwargs,
+) -> None:
+    """
+    Run the prompt for each question, directly or through the provider batch
+    API, then retry the failed generations.
+    """
+    if batch_mode:
+        batch_kwargs = {
+            key: value
+            for key, value in run_prompt_kwargs.items()
+            if key not in ["rate_limiter", "response_cache", "token_budget"]
+        }
+        prompt_results = run_batch_prompts(
+            question_list, client=batch_client, **batch_kwargs
+        )
+    else:
+        prompt_results = _run_questions(
+            question_list, max_concurrency, sleep_time, **run_prompt_kwargs
+        )
+
+    if run_prompt_kwargs.get("dry_run", False):
+        return
+
+    _flush_results()
+
+    # Questions which failed in a previous attempt of a resumed run.
+    succeeded_question_ids = [
+        prompt_result.question_id
+        for prompt_result in prompt_results
+        if prompt_result is not None
+    ]
+    if len(succeeded_question_ids):
+        connector.client.delete_failed_generations(
+            run_prompt_kwargs["prompt_run_id"], succeeded_question_ids
+        )
+
+    if max_attempts > 1:
+        _retry_failed_generations(
+            max_attempts, max_concurrency, sleep_time, **run_prompt_kwargs
+        )
+        _flush_results()
 
 
 def run_prompts(
@@ -261,6 +859,17 @@ def run_prompts(
     validation_func: Callable | None = None,
     ministry_mask: bool = False,
     dry_run: bool = False,
+    max_concurrency: int = 1,
+    rate_limit: RateLimit | None = None,
+    batch_mode: bool = False,
+    batch_client: Any = None,
+    use_cache: bool = True,
+    max_attempts: int = MAX_ATTEMPTS,
+    max_tokens: int | None = None,
+    max_cost: float | None = None,
+    samples: int = 1,
+    agreement_threshold: float = AGREEMENT_THRESHOLD,
+    examples_func: Callable[[Question], List[PromptText]] | None = None,
 ) -> PromptRunInfo:
     """
     Run an LLM prompt for a batch of questions.
@@ -299,11 +908,55 @@ def run_prompts(
     dry_run: bool, default=False
         Controls if the LLM results should be written in the database
         or not.
+    max_concurrency: int, default=1
+        Maximum number of requests in flight. Above 1, questions are sent
+        concurrently within the provider rate limits and `sleep_time` is ignored.
+    rate_limit: RateLimit | None, default=None
+        Custom provider limits, replacing the ones of `configs/rate_limits.py`.
+    batch_mode: bool, default=False
+        If True, send all the questions through the provider batch API (OpenAI
+        and Anthropic only), at half the cost but without latency guarantee.
+    batch_client: OpenAI | Anthropic | None, default=None
+        The provider client used in batch mode.
+    use_cache: bool, default=True
+        If True, reuse the responses of identical previous requests from the
+        on-disk cache configured in `configs/response_cache.py`. Requests with
+        a temperature above 0 are not cached by default.
+    max_attempts: int, default=MAX_ATTEMPTS
+        Maximum number of attempts of each question. Once all the questions
+        are prompted, the failed generations are retried with an exponential
+        backoff until they succeed or reach this number. 1 disables retries.
+    max_tokens: int | None, default=None
+        Hard limit on the prompt and response tokens of the run. Use
+        `plan_batch` to estimate it beforehand. Not enforced in batch mode.
+    max_cost: float | None, default=None
+        Hard limit on the cost of the run in US dollars, following the prices
+        of `configs/pricing.py`. Not enforced in batch mode.
+    samples: int, default=1
+        Maximum number of samples drawn for each question (self-consistency).
+        The answer of a question is the majority label of its samples, which
+        are all stored with its result. OpenAI draws the samples of a round
+        from a single request, the other providers from concurrent requests.
+        Not supported in batch mode.
+    agreement_threshold: float, default=AGREEMENT_THRESHOLD
+        Share of the samples agreeing on the majority label above which no
+        more samples are drawn for the question.
+    examples_func: Callable[[Question], List[PromptText]] | None, default=None
+        If provided, returns the few-shot examples of each question, which are
+        inserted before the last prompt text, e.g. `similar_examples_func` to
+        select the labelled questions most similar to each question. The
+        stored prompt does not hold them.
 
     Returns
     -------
     PromptRunInfo
         A set of metadata providing high-level informations on the prompt run.
+
+    Raises
+    ------
+    BudgetExceededException
+        If the budget is exhausted. The run can then be continued with
+        `resume_run`.
     """
     batch_id, question_list = _build_question_list(
         batch_id, number_of_questions, accepted_themes_for_questions
@@ -319,6 +972,17 @@ def run_prompts(
         unique_identifier=hash_list([prompt.model_dump() for prompt in prompts]),
         prompts=prompts,
     )
+    rate_limiter = None
+    if max_concurrency > 1:
+        rate_limiter = get_rate_limiter(
+            parameters.wrapper, parameters.model, rate_limit
+        )
+    response_cache = get_response_cache() if use_cache else None
+    token_budget = None
+    if max_tokens is not None or max_cost is not None:
+        token_budget = TokenBudget(
+            get_pricing(parameters.wrapper, parameters.model), max_tokens, max_cost
+        )
     if not dry_run:
         prompt = connector.client.upsert_prompt(prompt)
 
@@ -330,7 +994,9 @@ def run_prompts(
             description=description,
             name=name,
             themes_list=themes_list,
-            ministry_mask=ministry_mask
+            ministry_mask=ministry_mask,
+            samples=samples,
+            agreement_threshold=agreement_threshold,
         )
         inserted_prompt_run = connector.client.add_prompt_run(prompt_run)
 
@@ -338,18 +1004,26 @@ def run_prompts(
             f"Running #{inserted_prompt_run.inserted_id} with batch #{batch_id}"
         )
 
-        for question in tqdm(question_list):
-            time.sleep(sleep_time)
-            run_prompt(
-                question=question,
-                prompt=prompt,
-                prompt_run=prompt_run,
-                prompt_run_id=str(inserted_prompt_run.inserted_id),
-                response_format=response_format,
-                retrieve_theme_func=retrieve_theme_func,
-                validation_func=validation_func,
-                dry_run=dry_run,
-            )
+        _execute_prompts(
+            question_list,
+            max_concurrency=max_concurrency,
+            sleep_time=sleep_time,
+            prompt=prompt,
+            prompt_run=prompt_run,
+            prompt_run_id=str(inserted_prompt_run.inserted_id),
+            response_format=response_format,
+            retrieve_theme_func=retrieve_theme_func,
+            validation_func=validation_func,
+            ministry_mask=ministry_mask,
+            dry_run=dry_run,
+            rate_limiter=rate_limiter,
+            response_cache=response_cache,
+            token_budget=token_budget,
+            batch_mode=batch_mode,
+            batch_client=batch_client,
+            max_attempts=max_attempts,
+            examples_func=examples_func,
+        )
 
         return PromptRunInfo(
             run_id=str(inserted_prompt_run.inserted_id),
@@ -365,23 +1039,203 @@ def run_prompts(
             description=description,
             name=name,
             themes_list=themes_list,
+            ministry_mask=ministry_mask,
+            samples=samples,
+            agreement_threshold=agreement_threshold,
         )
         prompt_run_id = "fake_prompt_run_id"
-        for question in tqdm(question_list):
-            time.sleep(sleep_time)
-            run_prompt(
-                question=question,
-                prompt=prompt,
-                prompt_run=prompt_run,
-                prompt_run_id=prompt_run_id,
-                response_format=response_format,
-                retrieve_theme_func=retrieve_theme_func,
-                validation_func=validation_func,
-                dry_run=dry_run,
-            )
+        _execute_prompts(
+            question_list,
+            max_concurrency=max_concurrency,
+            sleep_time=sleep_time,
+            prompt=prompt,
+            prompt_run=prompt_run,
+            prompt_run_id=prompt_run_id,
+            response_format=response_format,
+            retrieve_theme_func=retrieve_theme_func,
+            validation_func=validation_func,
+            ministry_mask=ministry_mask,
+            dry_run=dry_run,
+            rate_limiter=rate_limiter,
+            response_cache=response_cache,
+            token_budget=token_budget,
+            batch_mode=batch_mode,
+            batch_client=batch_client,
+            max_attempts=max_attempts,
+            examples_func=examples_func,
+        )
 
         return PromptRunInfo(
             run_id=prompt_run_id,
             prompts=prompts,
             prompt_run=prompt_run,
         )
+
+
+def resume_run(
+    run_id: str,
+    retrieve_theme_func: Callable[..., str] | None = None,
+    response_format: Optional[BaseModel] = None,
+    sleep_time: float = 0.0,
+    validation_func: Callable | None = None,
+    max_concurrency: int = 1,
+    rate_limit: RateLimit | None = None,
+    use_cache: bool = True,
+    max_attempts: int = MAX_ATTEMPTS,
+    max_tokens: int | None = None,
+    max_cost: float | None = None,
+    examples_func: Callable[[Question], List[PromptText]] | None = None,
+) -> PromptRunInfo:
+    """
+    Resume an interrupted prompt run, prompting only the questions of its batch
+    which have no prompt result yet, with the same prompt and parameters.
+
+    The functions of the prompt builder are not stored with the prompt run:
+    `retrieve_theme_func`, `response_format`, `validation_func` and
+    `examples_func` must be the ones the run was started with.
+
+    Parameters
+    ----------
+    run_id: str
+        The ID of the prompt run to resume.
+    retrieve_theme_func: Callable[..., str] | None = None
+        A function used to retrieve the original corresponding theme
+        in the database.
+    response_format: Optional[BaseModel], default=None
+        A custom schema used to validate the LLM output.
+    sleep_time: float, default=0.0
+        A sleep time between each prompt query sent to the LLM.
+    validation_func: Callable | None = None
+        A custom validation function in order to reject LLM answers
+        that do not follow the provided guardrails.
+    max_concurrency: int, default=1
+        Maximum number of requests in flight.
+    rate_limit: RateLimit | None, default=None
+        Custom provider limits, replacing the ones of `configs/rate_limits.py`.
+    use_cache: bool, default=True
+        If True, reuse the responses of identical previous requests.
+    max_attempts: int, default=MAX_ATTEMPTS
+        Maximum number of attempts of each question, previous failures
+        included.
+    max_tokens: int | None, default=None
+        Hard limit on the prompt and response tokens of the resumed part.
+    max_cost: float | None, default=None
+        Hard limit on the cost of the resumed part, in US dollars.
+    examples_func: Callable[[Question], List[PromptText]] | None, default=None
+        If provided, returns the few-shot examples of each question.
+
+    Returns
+    -------
+    PromptRunInfo
+        A set of metadata providing high-level informations on the prompt run.
+
+    Raises
+    ------
+    WrongRunIdProvided
+        If no prompt run matches the provided ID.
+    """
+    try:
+        prompt_run_data = connector.client.get_prompt_run({"_id": ObjectId(run_id)})
+    except InvalidId:
+        prompt_run_data = None
+    if prompt_run_data is None:
+        raise WrongRunIdProvided(run_id)
+
+    prompt_run = PromptRun(**prompt_run_data)
+    prompt = connector.client.get_prompt({"unique_identifier": prompt_run.prompt_id})
+
+    batch = _get_batch(prompt_run.batch_id)
+    # The results spooled by the interrupted run must be written first.
+    _flush_results()
+    answered_question_ids = connector.client.get_answered_question_ids(run_id)
+    missing_question_ids = [
+        question_id
+        for question_id in batch["question_ids"]
+        if question_id not in answered_question_ids
+    ]
+
+    logger.info(
+        f"Resuming #{run_id}: {len(answered_question_ids)} questions answered, "
+        f"{len(missing_question_ids)} remaining"
+    )
+
+    rate_limiter = None
+    if max_concurrency > 1:
+        rate_limiter = get_rate_limiter(
+            prompt_run.parameters.wrapper, prompt_run.parameters.model, rate_limit
+        )
+    token_budget = None
+    if max_tokens is not None or max_cost is not None:
+        token_budget = TokenBudget(
+            get_pricing(prompt_run.parameters.wrapper, prompt_run.parameters.model),
+            max_tokens,
+            max_cost,
+        )
+
+    _execute_prompts(
+        _get_questions(missing_question_ids),
+        max_concurrency=max_concurrency,
+        sleep_time=sleep_time,
+        prompt=prompt,
+        prompt_run=prompt_run,
+        prompt_run_id=run_id,
+        response_format=response_format,
+        retrieve_theme_func=retrieve_theme_func,
+        validation_func=validation_func,
+        ministry_mask=prompt_run.ministry_mask,
+        rate_limiter=rate_limiter,
+        response_cache=get_response_cache() if use_cache else None,
+        token_budget=token_budget,
+        max_attempts=max_attempts,
+        examples_func=examples_func,
+    )
+
+    return PromptRunInfo(
+        run_id=run_id,
+        prompts=prompt.prompts,
+        prompt_run=prompt_run,
+    )
+
+
+def plan_batch(
+    parameters: PromptRunParameters,
+    prompts: List[PromptText],
+    batch_id: str,
+    ministry_mask: bool = False,
+    **plan_kwargs,
+) -> RunPlan:
+    """
+    Estimate the tokens, the cost and the duration of a prompt run over a
+    batch, before launching it with `run_prompts`.
+
+    Parameters
+    ----------
+    parameters: PromptRunParameters
+        The parameters of the run.
+    prompts: List[PromptText]
+        The prompts of the run.
+    batch_id: str
+        The ID of the batch of questions.
+    ministry_mask: bool, default=False
+        If True, remove the ministry names in the question phrasing.
+    **plan_kwargs
+        The estimation settings of `plan_run`.
+
+    Returns
+    -------
+    RunPlan
+        The estimations.
+    """
+    batch = _get_batch(batch_id)
+    prompt = Prompt(
+        unique_identifier=hash_list([prompt.model_dump() for prompt in prompts]),
+        prompts=prompts,
+    )
+
+    return plan_run(
+        _get_questions(batch["question_ids"]),
+        prompt,
+        parameters,
+        ministry_mask=ministry_mask,
+        **plan_kwargs,
+    )
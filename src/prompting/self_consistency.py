@@ -0,0 +1,143 @@
+from collections import Counter
+from typing import Callable, List
+from configs.self_consistency import MIN_SAMPLES
+from models.LLMOutput import Sample, WrapperOutput
+
+
+def output_samples(output: WrapperOutput) -> List[Sample]:
+    """
+    The samples of a wrapper output, a single sample if the provider returned
+    only one completion.
+    """
+    if output.samples is not None:
+        return output.samples
+    return [
+        Sample(response=output.raw_response, predicted_label=output.predicted_label)
+    ]
+
+
+def majority_label(labels: List[str]) -> str:
+    """
+    The most predicted label, ties being broken by the first predicted one.
+    """
+    return Counter(labels).most_common(1)[0][0]
+
+
+def next_round_size(
+    labels: List[str],
+    samples: int,
+    agreement_threshold: float,
+    min_samples: int = MIN_SAMPLES,
+) -> int:
+    """
+    Number of samples to draw next for a question, 0 once its samples agree.
+
+    The first round draws `min_samples` samples. Sampling then stops as soon as
+    the share of the majority label reaches `agreement_threshold`, or when the
+    remaining samples could not change the majority. Otherwise the next round
+    draws the fewest samples which could stop it.
+
+    Parameters
+    ----------
+    labels : List[str]
+        The labels predicted by the samples drawn so far.
+    samples : int
+        Maximum number of samples of the question.
+    agreement_threshold : float
+        Share of the samples agreeing on the majority label above which
+        sampling stops.
+    min_samples : int, optional
+        Number of samples of the first round, by default MIN_SAMPLES.
+
+    Returns
+    -------
+    int
+        The number of samples of the next round.
+    """
+    if not len(labels):
+        return min(min_samples, samples)
+
+    remaining = samples - len(labels)
+    counts = [count for _, count in Counter(labels).most_common(2)] + [0]
+    top, second = counts[0], counts[1]
+
+    for size in range(remaining + 1):
+        agreement = (top + size) / (len(labels) + size)
+        if agreement >= agreement_threshold or top + size > second + remaining - size:
+            return size
+
+    return remaining
+
+
+def sample_until_consistent(
+    draw: Callable[[int], List[WrapperOutput]],
+    samples: int,
+    agreement_threshold: float,
+    min_samples: int = MIN_SAMPLES,
+) -> WrapperOutput:
+    """
+    Draw the samples of a question by rounds until they agree, and merge them
+    into a single output predicting their majority label.
+
+    Parameters
+    ----------
+    draw : Callable[[int], List[WrapperOutput]]
+        Sends the requests drawing the given number of samples.
+    samples : int
+        Maximum number of samples of the question.
+    agreement_threshold : float
+        Share of the samples agreeing on the majority label above which
+        sampling stops.
+    min_samples : int, optional
+        Number of samples of the first round, by default MIN_SAMPLES.
+
+    Returns
+    -------
+    WrapperOutput
+        The merged output, with the usage of every request and all the samples.
+    """
+    outputs: List[WrapperOutput] = []
+    labels: List[str] = []
+
+    while size := next_round_size(labels, samples, agreement_threshold, min_samples):
+        for output in draw(size):
+            outputs.append(output)
+            labels += [
+                sample.predicted_label.lower().strip()
+                for sample in output_samples(output)
+            ]
+
+    return merge_outputs(outputs)
+
+
+def merge_outputs(outputs: List[WrapperOutput]) -> WrapperOutput:
+    """
+    Merge the outputs of the requests of a question. The merged output predicts
+    the majority label of the samples and keeps the response and logprobs of
+    its first sample.
+    """
+    drawn = [
+        (output, index, sample)
+        for output in outputs
+        for index, sample in enumerate(output_samples(output))
+    ]
+    label = majority_label(
+        [sample.predicted_label.lower().strip() for _, _, sample in drawn]
+    )
+    majority_output, index, majority_sample = next(
+        (output, index, sample)
+        for output, index, sample in drawn
+        if sample.predicted_label.lower().strip() == label
+    )
+
+    return WrapperOutput(
+        raw_response=majority_sample.response,
+        prompt_tokens=sum(output.prompt_tokens for output in outputs),
+        cached_prompt_tokens=sum(output.cached_prompt_tokens for output in outputs),
+        response_tokens=sum(output.response_tokens for output in outputs),
+        predicted_label=label,
+        # The logprobs returned by the providers are the ones of the first sample.
+        logprobs=majority_output.logprobs if index == 0 else None,
+        label_distribution=majority_output.label_distribution if index == 0 else None,
+        samples=[sample for _, _, sample in drawn],
+    )
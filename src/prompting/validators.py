@@ -0,0 +1,139 @@
+import re
+from functools import lru_cache
+from typing import Callable, Iterable, Pattern, Tuple
+from configs.validators import USE_GUARDRAILS
+from errors.InvalidLLMOutputException import InvalidLLMOutputException
+
+A_TO_Z_SELECTORS = [chr(i) for i in range(ord("A"), ord("["))]
+
+
+def choices_validator(
+    choices: Iterable[str], use_guardrails: bool = USE_GUARDRAILS
+) -> Callable[[str], None]:
+    """
+    Build a validator accepting only the values of a label space. The choices
+    are compiled once into a set, so that each validation is a single lookup.
+
+    Parameters
+    ----------
+    choices: Iterable[str]
+        The accepted values.
+    use_guardrails: bool, default=USE_GUARDRAILS
+        If True, validate with a guardrails `ValidChoices` guard instead,
+        built once as well.
+
+    Returns
+    -------
+    Callable[[str], None]
+        The validator, raising InvalidLLMOutputException on invalid values.
+    """
+    choices = list(choices)
+
+    if use_guardrails:
+        from guardrails import Guard
+        from guardrails.hub import ValidChoices
+
+        guard = Guard().use(ValidChoices, choices=choices, on_fail="exception")
+
+        def validate_with_guard(value: str) -> None:
+            guard.validate(value)
+
+        return validate_with_guard
+
+    accepted_values = frozenset(choices)
+
+    def validate(value: str) -> None:
+        if value not in accepted_values:
+            raise InvalidLLMOutputException(
+                f"`{value}` is not one of the accepted values."
+            )
+
+    return validate
+
+
+def range_validator(
+    min_value: float, max_value: float, use_guardrails: bool = USE_GUARDRAILS
+) -> Callable[[str], None]:
+    """
+    Build a validator accepting only the numbers of a range.
+
+    Parameters
+    ----------
+    min_value: float
+        The minimum accepted value.
+    max_value: float
+        The maximum accepted value.
+    use_guardrails: bool, default=USE_GUARDRAILS
+        If True, validate with a guardrails `ValidRange` guard instead, built
+        once as well.
+
+    Returns
+    -------
+    Callable[[str], None]
+        The validator, raising InvalidLLMOutputException on invalid values.
+    """
+    if use_guardrails:
+        from guardrails import Guard
+        from guardrails.hub import ValidRange
+
+        guard = Guard().use(
+            ValidRange(min=min_value, max=max_value, on_fail="exception")  # type: ignore
+        )
+
+        def validate_with_guard(value: str) -> None:
+            guard.validate(value)
+
+        return validate_with_guard
+
+    def validate(value: str) -> None:
+        try:
+            number = float(value)
+        except ValueError:
+            raise InvalidLLMOutputException(f"`{value}` is not a number.")
+
+        if not min_value <= number <= max_value:
+            raise InvalidLLMOutputException(
+                f"`{value}` is not between {min_value} and {max_value}."
+            )
+
+    return validate
+
+
+def regex_capture(pattern: str | Pattern[str], group: int = 1) -> Callable[[str], str]:
+    """
+    Build a function extracting a group of a precompiled regex from a text.
+
+    Parameters
+    ----------
+    pattern: str | Pattern[str]
+        The regex, searched anywhere in the text.
+    group: int, default=1
+        The group to extract.
+
+    Returns
+    -------
+    Callable[[str], str]
+        The extraction function, returning the stripped group and raising
+        InvalidLLMOutputException if the text does not match.
+    """
+    regex = re.compile(pattern)
+
+    def capture(text: str) -> str:
+        match = regex.search(text)
+        if match is None:
+            raise InvalidLLMOutputException(
+                f"The output does not match the expected format `{regex.pattern}`."
+            )
+
+        return match.group(group).strip()
+
+    return capture
+
+
+@lru_cache(maxsize=32)
+def themes_validator(themes_list: Tuple[str, ...]) -> Callable[[str], None]:
+    """
+    Retrieve the validator of the label space of a prompt run, built once for
+    all its questions.
+    """
+    return choices_validator(themes_list)
@@ -0,0 +1,83 @@
+import os
+
+os.sys.path.append(os.path.join(os.getcwd(), "src"))
+
+import time
+import argparse
+import tempfile
+import numpy as np
+from typing import List, Tuple
+from utils.knn_index import KnnIndex
+
+COMMON_WORDS = (
+    "monsieur madame le la les de des du un une et à au aux sur pour par dans "
+    "ministre député attention question gouvernement mesures situation "
+    "souhaite connaître intentions envisage prendre afin"
+).split()
+
+
+def synthetic_corpus(
+    number_of_questions: int, number_of_themes: int, seed: int = 0
+) -> List[Tuple[str, str, str]]:
+    """
+    Questions mixing common words with the specific vocabulary of their theme.
+    """
+    rng = np.random.default_rng(seed)
+    vocabularies = [
+        [f"terme{theme}x{i}" for i in range(200)] for theme in range(number_of_themes)
+    ]
+    corpus = []
+    for i in range(number_of_questions):
+        theme = int(rng.integers(number_of_themes))
+        words = (
+            rng.choice(COMMON_WORDS, 120).tolist()
+            + rng.choice(vocabularies[theme], 40).tolist()
+        )
+        rng.shuffle(words)
+        corpus.append((f"15-{i}QE", " ".join(words), f"theme {theme}"))
+    return corpus
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure the build and query throughput of the nearest-neighbour "
+        "index on a synthetic corpus."
+    )
+    parser.add_argument("-n", "--questions", type=int, default=100_000)
+    parser.add_argument("-t", "--themes", type=int, default=30)
+    parser.add_argument("-q", "--queries", type=int, default=1_000)
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = synthetic_corpus(args.questions, args.themes)
+    queries = synthetic_corpus(args.queries, args.themes, seed=1)
+
+    start = time.perf_counter()
+    index = KnnIndex.build(corpus)
+    build_time = time.perf_counter() - start
+    print(
+        f"build: {build_time:.1f} s ({len(index) / build_time:,.0f} questions/s), "
+        f"{index.vectors.nbytes / 2**20:.1f} MiB of vectors, "
+        f"{len(index.centroids)} lists"
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        index.save(directory)
+        for name, queried_index in [
+            ("in memory", index),
+            ("memory-mapped", KnnIndex.load(directory)),
+        ]:
+            latencies, hits = [], 0
+            for _, text, theme in queries:
+                start = time.perf_counter()
+                matches = queried_index.query(text, args.k, max_per_label=args.k)
+                latencies.append(time.perf_counter() - start)
+                hits += sum(label == theme for _, label, _ in matches)
+
+            latencies = np.array(latencies) * 1e3
+            print(
+                f"query ({name}): p50 {np.percentile(latencies, 50):.3f} ms, "
+                f"p99 {np.percentile(latencies, 99):.3f} ms, "
+                f"{len(latencies) / latencies.sum() * 1e3:,.0f} queries/s, "
+                f"{hits / (len(queries) * args.k):.1%} of same-theme neighbours"
+            )
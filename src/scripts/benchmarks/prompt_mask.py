@@ -0,0 +1,99 @@
+import os
+
+os.sys.path.append(os.path.join(os.getcwd(), "src"))
+
+import re
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+from typing import List
+from configs.env import get_src_path
+from prompting.prompt_mask import get_ministry_mask
+
+BODY = (
+    " sur les conséquences de la hausse des prix de l'énergie pour les "
+    "collectivités territoriales. Il lui demande quelles mesures le Gouvernement "
+    "entend prendre pour accompagner les communes rurales dans ce contexte. "
+)
+
+
+def previous_question_processing(question: str, masks: List[str]) -> str:
+    """
+    The masking of a question as previously done, scanning every mask.
+    """
+    input_size = len(question)
+    output_size = 0
+    selected_mask = ""
+    for mask in masks:
+        if mask in question.lower():
+            question = re.sub(rf"(?<=ministre) (d[u|e]s?\s){mask}", "", question)
+            if len(question) < input_size:
+                selected_mask = mask
+                output_size = len(question)
+                break
+
+    if input_size - len(selected_mask) - 4 != output_size:
+        raise ValueError("Another part of the question was propably croped.")
+
+    return question
+
+
+def synthetic_questions(masks: List[str], n: int, seed: int = 0) -> List[str]:
+    """
+    Questions addressed to a random ministry of the masks, some of them
+    naming no known ministry.
+    """
+    rng = random.Random(seed)
+    questions = []
+    for _ in range(n):
+        ministry = rng.choice(masks) if rng.random() < 0.9 else "numérique"
+        article = rng.choice(["du", "de", "des"])
+        questions.append(
+            f"M. le député attire l'attention de M. le ministre {article} {ministry}"
+            + BODY * rng.randint(1, 6)
+        )
+
+    return questions
+
+
+def mask_or_error(func, question: str) -> str:
+    try:
+        return func(question)
+    except ValueError:
+        return "ValueError"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure the masking throughput of the ministries."
+    )
+    parser.add_argument(
+        "-n",
+        "--number",
+        type=int,
+        default=5_000,
+        help="Number of questions.",
+    )
+    args = parser.parse_args()
+
+    with open(f"{get_src_path(Path(__file__))}/data/positions.json", "r") as file:
+        masks = json.load(file)
+    questions = synthetic_questions(masks, args.number)
+    ministry_mask = get_ministry_mask()
+
+    start = time.perf_counter()
+    previous = [
+        mask_or_error(lambda q: previous_question_processing(q, masks), question)
+        for question in questions
+    ]
+    previous_duration = time.perf_counter() - start
+
+    start = time.perf_counter()
+    masked = [mask_or_error(ministry_mask.mask, question) for question in questions]
+    duration = time.perf_counter() - start
+
+    assert masked == previous
+    print(f"previous: {len(questions) / previous_duration:>10.0f} questions/s")
+    print(f"engine:   {len(questions) / duration:>10.0f} questions/s")
@@ -0,0 +1,102 @@
+import os
+
+os.sys.path.append(os.path.join(os.getcwd(), "src"))
+
+import argparse
+import timeit
+from typing import Dict, List
+from models.Prompt import Prompt, PromptText, RoleEnum
+from prompting.provider_requests import format_messages
+
+SYSTEM_PROMPT = (
+    "Vous êtes un assistant chargé de classer les questions écrites des "
+    "parlementaires dans l'un des thèmes suivants : agriculture, culture, "
+    "défense, économie, éducation, énergie, environnement, finances publiques, "
+    "justice, logement, santé, transports.\n"
+)
+EXAMPLE_QUESTION = (
+    "M. le député attire l'attention de M. le ministre sur la hausse des loyers "
+    "dans les zones tendues et sur les mesures envisagées pour y remédier. "
+)
+QUESTION_TEXT = (
+    "Mme la députée interroge M. le ministre sur le prix des engrais azotés et "
+    "ses conséquences pour les exploitations agricoles."
+)
+
+
+def few_shot_prompt(number_of_examples: int) -> Prompt:
+    """
+    A few-shot prompt with its examples given as conversation turns.
+    """
+    prompts = [PromptText(role=RoleEnum.System, content=SYSTEM_PROMPT)]
+    for _ in range(number_of_examples):
+        prompts.append(PromptText(role=RoleEnum.User, content=EXAMPLE_QUESTION * 4))
+        prompts.append(PromptText(role=RoleEnum.Assistant, content="logement"))
+    prompts.append(PromptText(role=RoleEnum.User, content="{0}"))
+
+    return Prompt(unique_identifier=f"few-shot-{number_of_examples}", prompts=prompts)
+
+
+def previous_format_messages(
+    prompt: Prompt, question_text: str, assoc: Dict[str, str] | None = None
+) -> List[Dict[str, str]]:
+    """
+    The messages of a question as previously rendered, formatting every message
+    for each question.
+    """
+    messages = [
+        {"role": pr.role.value, "content": pr.content.format(question_text)}
+        for pr in list(prompt.prompts)
+    ]
+
+    if assoc:
+        for i, msg in enumerate(messages):
+            for k, v in assoc.items():
+                messages[i]["content"] = msg["content"].replace(k, v)
+
+    return messages
+
+
+def time_per_call(func, number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure the rendering cost of a question against the few-shot size."
+    )
+    parser.add_argument(
+        "-n",
+        "--number",
+        type=int,
+        default=2_000,
+        help="Number of renderings per measure.",
+    )
+    parser.add_argument(
+        "-e",
+        "--examples",
+        type=int,
+        nargs="+",
+        default=[0, 5, 20, 50, 100],
+        help="Numbers of few-shot examples to measure.",
+    )
+    args = parser.parse_args()
+
+    assoc = {"#!result": "logement"}
+    print(f"{'examples':<10}{'previous':>14}{'render plan':>14}")
+    for number_of_examples in args.examples:
+        prompt = few_shot_prompt(number_of_examples)
+        assert format_messages(prompt, QUESTION_TEXT, assoc) == (
+            previous_format_messages(prompt, QUESTION_TEXT, assoc)
+        )
+
+        previous = time_per_call(
+            lambda: previous_format_messages(prompt, QUESTION_TEXT, assoc),
+            args.number,
+        )
+        planned = time_per_call(
+            lambda: format_messages(prompt, QUESTION_TEXT, assoc), args.number
+        )
+        print(
+            f"{number_of_examples:<10}{previous * 1e6:>11.2f} µs{planned * 1e6:>11.2f} µs"
+        )
@@ -0,0 +1,306 @@
+import os
+
+os.sys.path.append(os.path.join(os.getcwd(), "src"))
+
+import io
+import time
+import argparse
+import tempfile
+import statistics
+import contextlib
+from typing import Dict, List
+from bson import ObjectId
+from databases.sqlite_connector import SQLite
+from models.Prompt import PromptRunParameters, PromptText, PromptType, RoleEnum
+from models.RateLimit import RateLimit
+from utils.helpers import generate_theme_unique_identifier
+from utils.mock_llm_server import (
+    MockLLMServer,
+    constant_latency,
+    exponential_latency,
+    lognormal_latency,
+)
+
+THEMES = [
+    "retraites",
+    "handicapés",
+    "enseignement",
+    "politique extérieure",
+    "agriculture",
+    "logement",
+    "énergie et carburants",
+    "impôts et taxes",
+    "sécurité sociale",
+    "justice",
+    "entreprises",
+    "outre-mer",
+    "communes",
+    "commerce et artisanat",
+    "sports",
+    "consommation",
+    "famille",
+    "étrangers",
+]
+SUB_THEMES_PER_THEME = 3
+QUESTION_SENTENCE = (
+    "Il souhaite connaître les mesures que le Gouvernement entend prendre pour "
+    "répondre aux inquiétudes des acteurs concernés. "
+)
+DEFAULT_MODELS = {
+    "openai": "gpt-4o-mini",
+    "anthropic": "claude-3-5-haiku-20241022",
+    "mistral": "mistral-small-latest",
+    "google": "gemini-1.5-flash",
+}
+
+
+def seed_database(client: SQLite, number_of_questions: int) -> str:
+    """
+    Fill a database with a two-level themes hierarchy and synthetic questions,
+    and create the batch of the questions.
+
+    Returns
+    -------
+    str
+        The ID of the batch.
+    """
+    themes = []
+    for theme in THEMES:
+        themes.append(
+            {
+                "name": theme,
+                "level": 1,
+                "total": 0,
+                "parent_theme_identifier": None,
+                "unique_identifier": generate_theme_unique_identifier(theme, 1),
+            }
+        )
+        for i in range(SUB_THEMES_PER_THEME):
+            themes.append(
+                {
+                    "name": f"{theme} ({i})",
+                    "level": 0,
+                    "total": 0,
+                    "parent_theme_identifier": generate_theme_unique_identifier(
+                        theme, 1
+                    ),
+                    "unique_identifier": generate_theme_unique_identifier(
+                        f"{theme} ({i})", 0
+                    ),
+                }
+            )
+
+    questions = []
+    for i in range(number_of_questions):
+        theme = THEMES[i % len(THEMES)]
+        questions.append(
+            {
+                "id": f"16-{i + 1}QE",
+                "congressman": f"Député {i % 577}",
+                "questioned_ministry": "Ministère",
+                "responsible_ministry": "Ministère",
+                "question_date": None,
+                "response_date": None,
+                "theme": f"{theme} ({i % SUB_THEMES_PER_THEME})",
+                "sub_theme": "",
+                "analysis": None,
+                "question_text": f"Question n°{i + 1} sur le thème {theme}. "
+                + QUESTION_SENTENCE * (1 + i % 8),
+                "response_text": None,
+                "theme_ancestors": {
+                    "1": {
+                        "name": theme,
+                        "unique_identifier": generate_theme_unique_identifier(theme, 1),
+                    }
+                },
+            }
+        )
+
+    batch_id = ObjectId()
+    client.insert_documents("themes", themes)
+    client.insert_documents("questions", questions)
+    client.insert_documents(
+        "batches",
+        [
+            {
+                "_id": batch_id,
+                "question_ids": [question["id"] for question in questions],
+                "size": number_of_questions,
+            }
+        ],
+    )
+
+    return str(batch_id)
+
+
+def zero_shot_prompts() -> List[PromptText]:
+    themes = "\n".join(f"- {theme}" for theme in THEMES)
+    return [
+        PromptText(
+            role=RoleEnum.System,
+            content="Ton rôle est d'attribuer un thème à une question posée par "
+            "un député à l'Assemblée nationale française. La liste des thèmes est "
+            f"la suivante :\n{themes}\nTa réponse doit contenir une seule chose : "
+            "le thème correspondant.",
+        ),
+        PromptText(role=RoleEnum.User, content="Question: {0}"),
+    ]
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not len(values):
+        return float("nan")
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+def run_benchmark(
+    server: MockLLMServer,
+    parameters: PromptRunParameters,
+    batch_id: str,
+    concurrency: int,
+    samples: int,
+) -> Dict[str, float]:
+    """
+    Run the prompt on the batch and measure the run from the server.
+    """
+    # Imported once the clients are pointed at the server.
+    from prompting.run_prompt import run_prompts
+
+    server.reset()
+    start = time.perf_counter()
+    # Dry runs print their results instead of writing them.
+    with contextlib.redirect_stdout(io.StringIO()):
+        run_prompts(
+            parameters=parameters,
+            prompts=zero_shot_prompts(),
+            themes_list=THEMES,
+            description="Runner benchmark",
+            name="benchmark",
+            batch_id=batch_id,
+            dry_run=True,
+            use_cache=False,
+            max_concurrency=concurrency,
+            rate_limit=RateLimit(requests_per_minute=1_000_000),
+            samples=samples,
+        )
+    duration = time.perf_counter() - start
+
+    latencies = server.question_latencies()
+    return {
+        "answered": len(latencies),
+        "throughput": len(latencies) / duration,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "429": server.status_counts.get(429, 0),
+        "500": server.status_counts.get(500, 0),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure the throughput and the tail latency of `run_prompts` "
+        "against a local stand-in of the LLM provider, at several concurrency levels."
+    )
+    parser.add_argument(
+        "-w",
+        "--wrapper",
+        choices=list(DEFAULT_MODELS),
+        default="openai",
+        help="Provider whose API is simulated.",
+    )
+    parser.add_argument("-m", "--model", help="Model name sent to the provider.")
+    parser.add_argument(
+        "-n",
+        "--questions",
+        type=int,
+        default=200,
+        help="Number of questions of the run.",
+    )
+    parser.add_argument(
+        "-c",
+        "--concurrency",
+        type=int,
+        nargs="+",
+        default=[1, 4, 16, 64],
+        help="Concurrency levels to measure.",
+    )
+    parser.add_argument(
+        "--latency",
+        choices=["constant", "lognormal", "exponential"],
+        default="lognormal",
+        help="Distribution of the latency of the provider.",
+    )
+    parser.add_argument(
+        "--median",
+        type=float,
+        default=0.2,
+        help="Median latency of the provider in seconds (mean if exponential).",
+    )
+    parser.add_argument(
+        "--sigma",
+        type=float,
+        default=0.5,
+        help="Shape of the log-normal latency.",
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Share of the requests failing with a 500.",
+    )
+    parser.add_argument(
+        "--rate-limit-rate",
+        type=float,
+        default=0.0,
+        help="Share of the requests rejected with a 429.",
+    )
+    parser.add_argument(
+        "--samples",
+        type=int,
+        default=1,
+        help="Maximum number of samples per question (self-consistency).",
+    )
+    args = parser.parse_args()
+
+    latency = {
+        "constant": lambda: constant_latency(args.median),
+        "lognormal": lambda: lognormal_latency(args.median, args.sigma),
+        "exponential": lambda: exponential_latency(args.median),
+    }[args.latency]()
+    server = MockLLMServer(
+        latency=latency,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+    ).start()
+
+    database_directory = tempfile.TemporaryDirectory()
+    os.environ.update(server.environment())
+    os.environ["DATABASE_BACKEND"] = "sqlite"
+    os.environ["SQLITE_DATABASE_PATH"] = os.path.join(
+        database_directory.name, "benchmark.sqlite"
+    )
+    batch_id = seed_database(SQLite(os.environ["SQLITE_DATABASE_PATH"]), args.questions)
+
+    parameters = PromptRunParameters(
+        temperature=0.0 if args.samples == 1 else 0.7,
+        model=args.model or DEFAULT_MODELS[args.wrapper],
+        types=[PromptType.ZeroShot],
+        theme_hierarchy_level=1,
+        wrapper=args.wrapper,
+    )
+
+    print(
+        f"{'concurrency':<13}{'answered':>9}{'questions/s':>13}"
+        f"{'p50':>9}{'p95':>9}{'p99':>9}{'429':>6}{'500':>6}"
+    )
+    for concurrency in args.concurrency:
+        result = run_benchmark(server, parameters, batch_id, concurrency, args.samples)
+        print(
+            f"{concurrency:<13}{result['answered']:>9}{result['throughput']:>13.1f}"
+            f"{result['p50']:>8.3f}s{result['p95']:>8.3f}s{result['p99']:>8.3f}s"
+            f"{result['429']:>6}{result['500']:>6}"
+        )
+
+    server.stop()
+    database_directory.cleanup()
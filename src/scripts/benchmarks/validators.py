@@ -0,0 +1,118 @@
+import os
+
+os.sys.path.append(os.path.join(os.getcwd(), "src"))
+
+import argparse
+import timeit
+from typing import Callable, Dict
+from prompting.validators import (
+    A_TO_Z_SELECTORS,
+    choices_validator,
+    range_validator,
+    regex_capture,
+)
+
+THEMES_LIST = [
+    "agriculture",
+    "culture",
+    "défense",
+    "économie",
+    "éducation",
+    "énergie",
+    "environnement",
+    "finances publiques",
+    "justice",
+    "logement",
+    "santé",
+    "transports",
+]
+VERBALIZED_RESPONSE = "Thème: logement\nProbabilité: 0.85"
+
+
+def compiled_validations() -> Dict[str, Callable[[], None]]:
+    """
+    The validations of a question, with the validators compiled once per run.
+    """
+    validate_selector = choices_validator(A_TO_Z_SELECTORS, use_guardrails=False)
+    validate_theme = choices_validator(THEMES_LIST, use_guardrails=False)
+    validate_probability = range_validator(0.0, 1.0, use_guardrails=False)
+    capture_theme = regex_capture(r"^(Thème:) ([\w| |'|,|-]+)", group=2)
+    capture_probability = regex_capture(r"(Probabilité:) ([\d|\.]+)", group=2)
+
+    def verbalized_confidence() -> None:
+        validate_theme(capture_theme(VERBALIZED_RESPONSE))
+        validate_probability(capture_probability(VERBALIZED_RESPONSE))
+
+    return {
+        "themes": lambda: validate_theme("logement"),
+        "proxy selector": lambda: validate_selector("J"),
+        "verbalized confidence": verbalized_confidence,
+    }
+
+
+def guardrails_validations() -> Dict[str, Callable[[], None]]:
+    """
+    The validations of a question as previously done, building new guards for
+    each question.
+    """
+
+    def verbalized_confidence() -> None:
+        choices_validator(THEMES_LIST, use_guardrails=True)(
+            regex_capture(r"^(Thème:) ([\w| |'|,|-]+)", group=2)(VERBALIZED_RESPONSE)
+        )
+        range_validator(0.0, 1.0, use_guardrails=True)(
+            regex_capture(r"(Probabilité:) ([\d|\.]+)", group=2)(VERBALIZED_RESPONSE)
+        )
+
+    return {
+        "themes": lambda: choices_validator(THEMES_LIST, use_guardrails=True)(
+            "logement"
+        ),
+        "proxy selector": lambda: choices_validator(
+            A_TO_Z_SELECTORS, use_guardrails=True
+        )("J"),
+        "verbalized confidence": verbalized_confidence,
+    }
+
+
+def time_per_call(func: Callable[[], None], number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure the validation overhead of an LLM answer, per question."
+    )
+    parser.add_argument(
+        "-n",
+        "--number",
+        type=int,
+        default=10_000,
+        help="Number of validations per measure.",
+    )
+    args = parser.parse_args()
+
+    compiled = compiled_validations()
+    try:
+        guarded = guardrails_validations()
+        for validation in guarded.values():
+            validation()
+    except ImportError:
+        from guardrails import Guard
+
+        # Without the hub validators, the construction of the guards alone is a
+        # lower bound of the previous cost.
+        guarded = {name: Guard for name in compiled}
+        guarded["verbalized confidence"] = lambda: (Guard(), Guard())
+        print(
+            "guardrails hub validators are not installed, "
+            "only the construction of the guards is measured.\n"
+        )
+
+    print(f"{'validation':<24}{'compiled':>14}{'guardrails':>14}")
+    for name, validation in compiled.items():
+        compiled_time = time_per_call(validation, args.number)
+        guarded_time = time_per_call(guarded[name], max(1, args.number // 100))
+        print(
+            f"{name:<24}{compiled_time * 1e6:>11.2f} µs{guarded_time * 1e3:>11.2f} ms"
+        )
@@ -0,0 +1,31 @@
+import os
+
+os.sys.path.append(os.path.join(os.getcwd(), "src"))
+
+import argparse
+from dotenv import load_dotenv
+from databases.mongo_connector import Mongo
+
+load_dotenv()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Store the ancestors of the theme of each question at every "
+        "hierarchy level."
+    )
+    parser.add_argument(
+        "-t",
+        "--theme",
+        help="Unique identifier of a theme: only its questions and the ones of its "
+        "descendants are updated.",
+    )
+    args = parser.parse_args()
+
+    mongo = Mongo()
+    mongo.create_question_theme_indexes()
+
+    modified_count = mongo.refresh_question_theme_ancestors(args.theme)
+    print(f"{modified_count} questions updated")
+
+    mongo.client.close()
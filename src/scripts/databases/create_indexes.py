@@ -0,0 +1,17 @@
+import os
+
+os.sys.path.append(os.path.join(os.getcwd(), "src"))
+
+from dotenv import load_dotenv
+from databases.mongo_connector import Mongo
+
+load_dotenv()
+
+
+if __name__ == "__main__":
+    mongo = Mongo()
+    mongo.create_question_theme_indexes()
+    mongo.create_prompt_result_indexes()
+    print("Indexes created")
+
+    mongo.client.close()
@@ -0,0 +1,71 @@
+import os
+
+os.sys.path.append(os.path.join(os.getcwd(), "src"))
+
+import argparse
+from tqdm import tqdm
+from dotenv import load_dotenv
+from databases.mongo_connector import Mongo
+from databases.sqlite_connector import SQLite, COLLECTIONS
+
+load_dotenv()
+
+BATCH_SIZE = 5000
+
+
+def sync_collection(mongo: Mongo, sqlite: SQLite, collection: str) -> int:
+    """
+    Copy a whole Mongo collection into the embedded SQLite database.
+
+    Parameters
+    ----------
+    mongo: Mongo
+        The source MongoDB wrapper.
+    sqlite: SQLite
+        The destination SQLite wrapper.
+    collection: str
+        Name of the collection, as defined in `COLLECTIONS`.
+
+    Returns
+    -------
+    int
+        The number of synchronized documents.
+    """
+    source = getattr(mongo, f"{collection}_collection")
+    sqlite.clear_collection(collection)
+
+    total = 0
+    documents = []
+    for document in tqdm(source.find({}), desc=collection):
+        documents.append(document)
+        if len(documents) >= BATCH_SIZE:
+            total += sqlite.insert_documents(collection, documents)
+            documents = []
+    total += sqlite.insert_documents(collection, documents)
+
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Copy the MongoDB collections into the embedded SQLite database."
+    )
+    parser.add_argument("-p", "--path", help="Path to the SQLite database file.")
+    parser.add_argument(
+        "-c",
+        "--collections",
+        nargs="+",
+        choices=list(COLLECTIONS.keys()),
+        default=list(COLLECTIONS.keys()),
+        help="Collections to synchronize.",
+    )
+    args = parser.parse_args()
+
+    mongo = Mongo()
+    sqlite = SQLite(args.path)
+
+    for collection in args.collections:
+        count = sync_collection(mongo, sqlite, collection)
+        print(f"{collection}: {count} documents synchronized")
+
+    mongo.client.close()
@@ -0,0 +1,65 @@
+import os
+
+os.sys.path.append(os.path.join(os.getcwd(), "src"))
+
+import argparse
+import time
+from dotenv import load_dotenv
+from configs.knn_index import KNN_INDEX_DIMENSION, KNN_INDEX_DIRECTORY
+from databases.mongo_connector import Mongo
+from utils.knn_index import KnnIndex
+
+load_dotenv()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Build the nearest-neighbour index of the labeled questions, "
+        "used to select the few-shot examples most similar to a question."
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default=KNN_INDEX_DIRECTORY,
+        help="Directory of the index.",
+    )
+    parser.add_argument(
+        "-d",
+        "--dimension",
+        type=int,
+        default=KNN_INDEX_DIMENSION,
+        help="Dimension of the vectors.",
+    )
+    parser.add_argument(
+        "-l",
+        "--legislature",
+        type=int,
+        help="Only index the questions of this legislature.",
+    )
+    args = parser.parse_args()
+
+    filters = {
+        "theme": {"$ne": None},
+        "question_text": {"$ne": ""},
+        "congressman": {"$ne": None},
+    }
+    if args.legislature is not None:
+        filters["legislature"] = args.legislature
+
+    mongo = Mongo()
+    questions = (
+        (question["id"], question["question_text"], question["theme"])
+        for question in mongo.get_questions(
+            filters, {"_id": 0, "id": 1, "question_text": 1, "theme": 1}
+        )
+    )
+
+    start = time.perf_counter()
+    index = KnnIndex.build(questions, dimension=args.dimension)
+    index.save(args.output)
+    print(
+        f"{len(index)} questions indexed in {len(index.offsets) - 1} lists "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+
+    mongo.client.close()
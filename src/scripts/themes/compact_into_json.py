@@ -4,6 +4,11 @@ os.sys.path.append(os.path.join(os.getcwd(), "src"))
 
 import pandas as pd
 import json
+from typing import Any, Dict, List
+from errors.InvalidThemesHierarchyException import InvalidThemesHierarchyException
+
+ORPHAN_PARENT_NAME = "vide"
+TOP_LEVEL = 3
 
 
 def normalize(df):
@@ -15,83 +20,121 @@ def normalize(df):
     return df
 
 
-level_0_df = normalize(
-    pd.read_csv("src/data/themes_step_0.csv", sep=",", header=None, skiprows=1)
-)
-level_1_df = normalize(
-    pd.read_csv("src/data/themes_step_1.csv", sep=",", header=None, skiprows=1)
-)
-level_2_df = normalize(
-    pd.read_csv("src/data/themes_step_2.csv", sep=",", header=None, skiprows=1)
-)
-level_3_df = normalize(
-    pd.read_csv("src/data/themes_step_3.csv", sep=",", header=None, skiprows=1)
-)
+def read_level(level: int, data_path: str = "src/data") -> pd.DataFrame:
+    return normalize(
+        pd.read_csv(
+            f"{data_path}/themes_step_{level}.csv", sep=",", header=None, skiprows=1
+        )
+    )
+
+
+def group_by_parent(df: pd.DataFrame, level: int) -> Dict[str, List[str]]:
+    """
+    Group the themes of a level by parent theme name, in a single pass and in
+    file order.
+
+    Raises
+    ------
+    InvalidThemesHierarchyException
+        If a theme is listed several times, i.e. under several parents.
+    """
+    children_by_parent = {}
+    seen_names = set()
+    for name, parent_name in zip(df[0], df[1]):
+        if name in seen_names:
+            raise InvalidThemesHierarchyException(
+                f"The theme '{name}' (level {level}) is listed under several parents."
+            )
+        seen_names.add(name)
+        children_by_parent.setdefault(parent_name, []).append(name)
+
+    return children_by_parent
+
+
+def check_orphans(
+    children_by_parent: Dict[str, List[str]], parent_names: List[str], level: int
+) -> None:
+    """
+    Verify that every parent referenced by the themes of a level exists at the
+    level above.
+
+    Raises
+    ------
+    InvalidThemesHierarchyException
+        If a theme refers to an unknown parent.
+    """
+    known_parent_names = set(parent_names)
+    if level == 1:
+        known_parent_names.add(ORPHAN_PARENT_NAME)
+
+    for parent_name, children in children_by_parent.items():
+        if parent_name not in known_parent_names:
+            raise InvalidThemesHierarchyException(
+                f"The themes {children} (level {level}) refer to an unknown parent "
+                f"'{parent_name}'."
+            )
 
 
-def build_hierarchy(parent_theme, current_level, df_list):
-    current_df = df_list[current_level]
+def build_hierarchy(
+    parent_theme: str, current_level: int, groups: List[Dict[str, List[str]]]
+) -> List[Dict[str, Any]]:
     children = []
 
-    for _, row in current_df[current_df[1] == parent_theme].iterrows():
-        child_name = row[0]
-        child_total = 0
-
+    for child_name in groups[current_level].get(parent_theme, []):
+        child = {"name": child_name, "total": 0, "level": current_level}
         if current_level > 0:
-            child_children = build_hierarchy(child_name, current_level - 1, df_list)
-            children.append(
-                {
-                    "name": child_name,
-                    "total": child_total,
-                    "level": current_level,
-                    "children": child_children,
-                }
-            )
-        else:
-            children.append(
-                {
-                    "name": child_name,
-                    "total": child_total,
-                    "level": current_level,
-                }
-            )
+            child["children"] = build_hierarchy(child_name, current_level - 1, groups)
+        children.append(child)
 
     return children
 
 
-if __name__ == "__main__":
-    df_list = [level_0_df, level_1_df, level_2_df, level_3_df]
+def compact(df_list: List[pd.DataFrame]) -> List[Dict[str, Any]]:
+    """
+    Assemble the nested themes hierarchy from the themes of each level.
 
-    hierarchy = []
-    for _, row in level_3_df.iterrows():
-        top_parent_name = row[0]
-        top_parent_total = 0
+    Parameters
+    ----------
+    df_list: List[pd.DataFrame]
+        The content of `themes_step_0.csv` to `themes_step_3.csv`.
 
-        top_parent_children = build_hierarchy(top_parent_name, 2, df_list)
+    Returns
+    -------
+    List[Dict[str, Any]]
+        The hierarchy, as written in `hierarchy.json`.
+    """
+    groups = [group_by_parent(df, level) for level, df in enumerate(df_list[:-1])]
+    for level in range(TOP_LEVEL):
+        check_orphans(groups[level], list(df_list[level + 1][0]), level)
 
+    hierarchy = []
+    for top_parent_name in df_list[TOP_LEVEL][0]:
         hierarchy.append(
             {
                 "name": top_parent_name,
-                "total": top_parent_total,
-                "level": 3,
-                "children": top_parent_children,
+                "total": 0,
+                "level": TOP_LEVEL,
+                "children": build_hierarchy(top_parent_name, TOP_LEVEL - 1, groups),
             }
         )
 
-    for _, row in level_1_df[level_1_df[1] == "vide"].iterrows():
-        orphan_name = row[0]
-        orphan_total = 0
-
-        orphan_children = build_hierarchy(orphan_name, 0, df_list)
-
+    for orphan_name in groups[1].get(ORPHAN_PARENT_NAME, []):
         hierarchy.append(
             {
                 "name": orphan_name,
-                "total": orphan_total,
+                "total": 0,
                 "level": 1,
-                "children": orphan_children,
+                "children": build_hierarchy(orphan_name, 0, groups),
             }
         )
 
+    return hierarchy
+
+
+if __name__ == "__main__":
+    df_list = [read_level(level) for level in range(TOP_LEVEL + 1)]
+
+    hierarchy = compact(df_list)
+
     with open("src/data/hierarchy.json", "w") as file:
         json.dump(hierarchy, file)
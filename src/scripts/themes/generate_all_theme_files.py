@@ -2,23 +2,24 @@ import os
 
 os.sys.path.append(os.path.join(os.getcwd(), "src"))
 
-import re
 import json
 import requests
+from typing import Dict, List
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
 from models.Colors import BColors
 from databases.connector import Connector
 from models.ExportFormat import ExportFormat
-from utils.normalize_themes import remove_special_chars
+from utils.normalize_themes import (
+    build_canonical_index,
+    canonicalize_themes,
+    save_canonical_index,
+)
 
 load_dotenv()
 
-
-def read_json_file(file_path):
-    with open(file_path, "r") as file:
-        data = json.load(file)
-    return data
+LEGISLATURES = range(8, 17)
 
 
 def write_json_file(file_path, data):
@@ -26,14 +27,11 @@ def write_json_file(file_path, data):
         json.dump(data, file, indent=4, ensure_ascii=False)
 
 
-def make_one_list():
+def make_one_list() -> List[str]:
     themes = set()
-    for legislature_number in range(8, 17):
-        get_themes_by_legislature(legislature_number)
-        with open(
-            f"src/themes/legislatures/{legislature_number}/themes.json"
-        ) as json_file:
-            themes.update(json.load(json_file))
+    with ThreadPoolExecutor(max_workers=len(LEGISLATURES)) as executor:
+        for legislature_themes in executor.map(get_themes_by_legislature, LEGISLATURES):
+            themes.update(legislature_themes)
 
     all_themes = sorted(list(themes), key=str.casefold)
 
@@ -43,16 +41,17 @@ def make_one_list():
     with open("src/themes/all_themes.json", "w") as file:
         json.dump(all_themes, file)
 
+    return all_themes
+
 
-def get_theme_question_count():
-    all_theme_file_path = "src/themes/all_themes.json"
-    themes = read_json_file(all_theme_file_path)
+def get_theme_question_count(themes: List[str]) -> Dict[str, int]:
     connector = Connector(ExportFormat.JSON)
+    counts_by_theme = connector.client.count_questions_by_theme()
     all_themes_questions = {}
     total_question = 0
 
     for theme in themes:
-        theme_questions = connector.client.count_documents_by_theme(theme)
+        theme_questions = counts_by_theme.get(theme, 0)
         if theme_questions > 0:
             total_question += theme_questions
             print(
@@ -61,7 +60,6 @@ def get_theme_question_count():
                 + f" '{theme}' : {theme_questions}"
                 + BColors.ENDC.value
             )
-            all_themes_questions[theme] = theme_questions
         else:
             print(
                 "no question found for"
@@ -69,20 +67,24 @@ def get_theme_question_count():
                 + f" '{theme}'"
                 + BColors.ENDC.value
             )
-            all_themes_questions[theme] = 0
+        all_themes_questions[theme] = theme_questions
 
     print(f"number of questions with theme : {total_question}")
-    write_json_file(
-        "src/themes/all_themes_question_count.json",
-        dict(sorted(all_themes_questions.items(), key=lambda item: item[1])),
+    all_themes_questions = dict(
+        sorted(all_themes_questions.items(), key=lambda item: item[1])
     )
+    write_json_file("src/themes/all_themes_question_count.json", all_themes_questions)
+
+    return all_themes_questions
 
 
-def get_themes_by_legislature(legislature):
+def get_themes_by_legislature(legislature: int) -> List[str]:
     print(f"getting themes for the {legislature}th legislature")
     url = f"https://www2.assemblee-nationale.fr/recherche/questions/{legislature}"
 
-    response = requests.get(url)
+    # One session per worker: a requests.Session is not thread-safe.
+    with requests.Session() as session:
+        response = session.get(url)
 
     soup = BeautifulSoup(response.text, "html.parser")
 
@@ -103,37 +105,33 @@ def get_themes_by_legislature(legislature):
     with open(f"src/themes/legislatures/{legislature}/themes.json", "w") as file:
         json.dump(themes, file)
 
+    return themes
 
-def normalize():
-    theme_questions = read_json_file("src/themes/all_themes_question_count.json")
-    new_theme_questions = dict()
 
-    for nb_question, theme in enumerate(theme_questions):
-        new_theme_name = remove_special_chars(theme)
-        new_theme_name = new_theme_name.lower()
-        new_theme_name = re.sub(r"((?<=\w)\:)", " :", new_theme_name)
-        if new_theme_name in new_theme_questions:
-            new_theme_questions[new_theme_name] += theme_questions[theme]
-        else:
-            new_theme_questions[new_theme_name] = theme_questions[theme]
+def normalize(theme_questions: Dict[str, int]) -> Dict[str, int]:
+    new_theme_questions = canonicalize_themes(theme_questions)
 
     print(f"removed {len(theme_questions) - len(new_theme_questions)} themes")
     all_themes_normalized = dict(
         sorted(new_theme_questions.items(), key=lambda item: item[1])
     )
     write_json_file("src/themes/all_themes_normalized.json", all_themes_normalized)
+    save_canonical_index(build_canonical_index(theme_questions))
+
+    return all_themes_normalized
 
 
 if __name__ == "__main__":
     print("generating" + BColors.BOLD.value + " 'all_themes.json'" + BColors.ENDC.value)
-    make_one_list()  # Generates all_themes.json
+    all_themes = make_one_list()  # Generates all_themes.json
     print(
         "generating"
         + BColors.BOLD.value
         + " 'all_themes_question_count.json'"
         + BColors.ENDC.value
     )
-    get_theme_question_count()  # Generates all_themes_question_count.json
+    # Generates all_themes_question_count.json
+    theme_questions = get_theme_question_count(all_themes)
     # Normalize
     print(
         "generating"
@@ -141,4 +139,4 @@ if __name__ == "__main__":
         + " 'all_themes_normalized.json'"
         + BColors.ENDC.value
     )
-    normalize()
+    normalize(theme_questions)
@@ -2,44 +2,40 @@ import os
 
 os.sys.path.append(os.path.join(os.getcwd(), "src"))
 
+import json
+import argparse
 from dotenv import load_dotenv
 from databases.connector import Connector
 from models.ExportFormat import ExportFormat
-import json
-from models.Theme import Theme
-from utils.helpers import generate_theme_unique_identifier
+from utils.theme_tree import flatten_hierarchy
 
 load_dotenv()
 
 
-def insert_themes(themes, parent_identifier=None):
-    connector = Connector(ExportFormat.JSON)
-    for theme in themes:
-        processed.append(theme["name"])
-        unique_identifier = generate_theme_unique_identifier(
-            theme["name"], theme["level"]
-        )
-
-        theme_doc = Theme(
-            name=theme["name"],
-            parent_theme_identifier=parent_identifier,
-            unique_identifier=unique_identifier,
-            level=theme["level"],
-            total=theme["total"],
-        )
-
-        connector.client.upsert_theme(theme_doc)
-
-        if "children" in theme:
-            insert_themes(theme["children"], unique_identifier)
-
-
 if __name__ == "__main__":
-    with open("src/data/hierarchy.json") as f:
+    parser = argparse.ArgumentParser(
+        description="Import the themes hierarchy into the Themes collection."
+    )
+    parser.add_argument(
+        "-p",
+        "--path",
+        default="src/data/hierarchy.json",
+        help="Path to the hierarchy JSON file.",
+    )
+    parser.add_argument(
+        "-d",
+        "--diff",
+        action="store_true",
+        help="Only write new themes and themes whose name, level or parent changed.",
+    )
+    args = parser.parse_args()
+
+    with open(args.path) as f:
         hierarchy = json.load(f)
 
-    processed = []
+    themes = flatten_hierarchy(hierarchy)
 
-    insert_themes(hierarchy)
+    connector = Connector(ExportFormat.JSON)
+    written_count = connector.client.bulk_upsert_themes(themes, diff=args.diff)
 
-    print(len(processed))
+    print(f"{len(themes)} themes processed, {written_count} written")
@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+from databases.mongo_connector import Mongo
+from models.Theme import Theme
+
+
+class FakeThemesCollection:
+    def __init__(self, modified_count: int) -> None:
+        self.modified_count = modified_count
+
+    def bulk_write(self, operations, ordered=True):
+        return SimpleNamespace(upserted_count=0, modified_count=self.modified_count)
+
+
+def fake_mongo(modified_count: int) -> Mongo:
+    mongo = Mongo.__new__(Mongo)
+    mongo.themes_collection = FakeThemesCollection(modified_count)
+    mongo.refreshed = 0
+
+    def refresh_question_theme_ancestors(theme_identifier=None):
+        mongo.refreshed += 1
+        return 0
+
+    mongo.refresh_question_theme_ancestors = refresh_question_theme_ancestors
+    return mongo
+
+
+THEMES = [
+    Theme(
+        name="agriculture",
+        parent_theme_identifier=None,
+        unique_identifier="agriculture-1",
+        level=1,
+        total=0,
+    )
+]
+
+
+def test_bulk_upsert_themes_refreshes_ancestors_of_modified_themes():
+    mongo = fake_mongo(modified_count=1)
+
+    assert mongo.bulk_upsert_themes(THEMES) == 1
+    assert mongo.refreshed == 1
+
+
+def test_bulk_upsert_themes_without_modification_keeps_ancestors():
+    mongo = fake_mongo(modified_count=0)
+
+    mongo.bulk_upsert_themes(THEMES)
+    assert mongo.refreshed == 0
@@ -0,0 +1,85 @@
+from bson import ObjectId
+from databases.sqlite_connector import build_where_clause
+
+
+def test_build_where_clause_nested_fields():
+    where, parameters = build_where_clause(
+        {"parameters.model": "gpt-4o-mini", "run_id": {"$in": ["a", "b"]}}
+    )
+    assert where == (
+        'json_extract(document, \'$."parameters"."model"\') = ? AND '
+        "json_extract(document, '$.\"run_id\"') IN (?, ?)"
+    )
+    assert parameters == ["gpt-4o-mini", "a", "b"]
+
+
+def test_get_prompt_results_with_in_filter(sqlite_client):
+    results = sqlite_client.get_prompt_results({"run_id": {"$in": ["run_a"]}})
+    assert [result["final_answer"] for result in results] == ["agriculture"]
+
+
+def test_get_batch_from_object_id(sqlite_client):
+    batch = sqlite_client.get_batch({"_id": ObjectId("66f1d0c3a1b2c3d4e5f60718")})
+    assert batch["question_ids"] == ["15-1QE"]
+    assert batch["_id"] == "66f1d0c3a1b2c3d4e5f60718"
+
+
+def test_get_parent_theme_from_child_theme_name(sqlite_client):
+    parent_theme = sqlite_client.get_parent_theme_from_child_theme_name(
+        "Engrais", stop_at_level=1
+    )
+    assert parent_theme.name == "agriculture"
+
+
+def test_get_sub_themes_list_from_theme(sqlite_client):
+    theme = sqlite_client.get_theme({"name": "agriculture", "level": 1})
+    sub_themes = sqlite_client.get_sub_themes_list_from_theme(
+        theme.unique_identifier, flatten=True
+    )
+    assert sorted(sub_theme["name"] for sub_theme in sub_themes) == [
+        "Agriculture",
+        "Engrais",
+    ]
+
+
+def test_get_random_questions_filters(sqlite_client):
+    questions = sqlite_client.get_random_questions(
+        number_of_questions=10, accepted_themes=["Agriculture", "Engrais"]
+    )
+    assert [question["id"] for question in questions] == ["15-1QE"]
+
+
+def test_group_by_query(sqlite_client):
+    rows = sqlite_client.query(
+        "SELECT json_extract(document, '$.theme') AS theme, COUNT(*) AS total "
+        "FROM questions GROUP BY theme ORDER BY theme"
+    )
+    assert rows == [
+        {"theme": "Agriculture", "total": 2},
+        {"theme": "Engrais", "total": 1},
+    ]
+
+
+def test_count_questions_by_theme(sqlite_client):
+    counts = sqlite_client.count_questions_by_theme()
+    assert counts == {"Agriculture": 2, "Engrais": 1}
+
+
+def test_get_question_ids_by_theme(sqlite_client):
+    # Empty questions and questions without congressman are left out.
+    assert sqlite_client.get_question_ids_by_theme(["Agriculture", "Engrais"]) == {
+        "Agriculture": ["15-1QE"]
+    }
+
+
+def test_get_answered_question_ids(sqlite_client):
+    assert sqlite_client.get_answered_question_ids("run_a") == {"15-1QE"}
+    assert sqlite_client.get_answered_question_ids("run_c") == set()
+
+
+def test_get_failed_generations(sqlite_client):
+    failures = sqlite_client.get_failed_generations("run_a")
+    assert [failure.question_id for failure in failures] == ["15-2QE", "16-3QE"]
+
+    failures = sqlite_client.get_failed_generations("run_a", max_attempts=3)
+    assert [failure.error_class for failure in failures] == ["RateLimitError"]
@@ -0,0 +1,218 @@
+import json
+import threading
+import pytest
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BATCH_ANSWER = "agriculture"
+
+
+def _openai_completion(body):
+    return {
+        "id": "chatcmpl-batch",
+        "object": "chat.completion",
+        "created": 0,
+        "model": body["model"],
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": BATCH_ANSWER},
+                "logprobs": {"content": []},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 1, "total_tokens": 11},
+    }
+
+
+def _anthropic_message(params):
+    return {
+        "id": "msg_batch",
+        "type": "message",
+        "role": "assistant",
+        "model": params["model"],
+        "content": [{"type": "text", "text": BATCH_ANSWER}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": 10, "output_tokens": 1},
+    }
+
+
+class BatchAPIHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for the OpenAI Batch API and the Anthropic Message Batches API.
+    Batches end immediately, and requests whose custom ID ends with "error"
+    fail.
+    """
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _send_json(self, payload, status=200) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_text(self, text) -> None:
+        data = text.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _openai_batch(self, batch_id):
+        return {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": "/v1/chat/completions",
+            "input_file_id": f"{batch_id}-input",
+            "completion_window": "24h",
+            "created_at": 0,
+            "status": "completed",
+            "output_file_id": f"{batch_id}-output",
+        }
+
+    def _anthropic_batch(self, batch_id, status):
+        return {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": status,
+            "request_counts": {
+                "processing": 0,
+                "succeeded": 0,
+                "errored": 0,
+                "canceled": 0,
+                "expired": 0,
+            },
+            "created_at": "2024-01-01T00:00:00Z",
+            "expires_at": "2024-01-02T00:00:00Z",
+            "ended_at": None,
+            "archived_at": None,
+            "cancel_initiated_at": None,
+            "results_url": f"{self.server.url}/v1/messages/batches/{batch_id}/results",
+        }
+
+    def do_POST(self) -> None:
+        state = self.server.state
+        body = self._read_body()
+
+        if self.path == "/v1/files":
+            message = BytesParser().parsebytes(
+                f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body
+            )
+            content = next(
+                part.get_payload(decode=True)
+                for part in message.get_payload()
+                if part.get_param("name", header="content-disposition") == "file"
+            )
+            file_id = f"file-{len(state['files'])}"
+            state["files"][file_id] = content.decode("utf-8")
+            self._send_json(
+                {
+                    "id": file_id,
+                    "object": "file",
+                    "bytes": len(content),
+                    "created_at": 0,
+                    "filename": "batch_input.jsonl",
+                    "purpose": "batch",
+                    "status": "uploaded",
+                }
+            )
+        elif self.path == "/v1/batches":
+            payload = json.loads(body)
+            batch_id = f"batch-{len(state['batches'])}"
+            lines = []
+            for line in state["files"][payload["input_file_id"]].splitlines():
+                request = json.loads(line)
+                if request["custom_id"].endswith("error"):
+                    response = {"status_code": 500, "body": {}}
+                else:
+                    response = {
+                        "status_code": 200,
+                        "body": _openai_completion(request["body"]),
+                    }
+                lines.append(
+                    json.dumps(
+                        {
+                            "id": request["custom_id"],
+                            "custom_id": request["custom_id"],
+                            "response": response,
+                            "error": None,
+                        }
+                    )
+                )
+            state["files"][f"{batch_id}-output"] = "\n".join(lines)
+            state["batches"][batch_id] = payload
+            self._send_json(self._openai_batch(batch_id))
+        elif self.path == "/v1/messages/batches":
+            payload = json.loads(body)
+            batch_id = f"msgbatch-{len(state['batches'])}"
+            state["batches"][batch_id] = payload
+            self._send_json(self._anthropic_batch(batch_id, "in_progress"))
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_GET(self) -> None:
+        state = self.server.state
+        path = self.path.split("?")[0]
+
+        if path.startswith("/v1/batches/"):
+            self._send_json(self._openai_batch(path.split("/")[-1]))
+        elif path.startswith("/v1/files/") and path.endswith("/content"):
+            self._send_text(state["files"][path.split("/")[-2]])
+        elif path.startswith("/v1/messages/batches/") and path.endswith("/results"):
+            batch_id = path.split("/")[-2]
+            lines = []
+            for request in state["batches"][batch_id]["requests"]:
+                if request["custom_id"].endswith("error"):
+                    result = {
+                        "type": "errored",
+                        "error": {
+                            "type": "error",
+                            "error": {"type": "api_error", "message": "error"},
+                        },
+                    }
+                else:
+                    result = {
+                        "type": "succeeded",
+                        "message": _anthropic_message(request["params"]),
+                    }
+                lines.append(
+                    json.dumps({"custom_id": request["custom_id"], "result": result})
+                )
+            self._send_text("\n".join(lines))
+        elif path.startswith("/v1/messages/batches/"):
+            self._send_json(self._anthropic_batch(path.split("/")[-1], "ended"))
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+
+@pytest.fixture
+def batch_api_server():
+    """
+    A local stand-in server implementing the OpenAI and Anthropic batch
+    endpoints.
+
+    Returns
+    -------
+    ThreadingHTTPServer
+        The running server. Its `url` attribute is the base URL and its `state`
+        attribute holds the uploaded files and submitted batches.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), BatchAPIHandler)
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    server.state = {"files": {}, "batches": {}}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
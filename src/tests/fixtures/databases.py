@@ -0,0 +1,113 @@
+import pytest
+from bson import ObjectId
+from databases.sqlite_connector import SQLite
+from utils.helpers import generate_theme_unique_identifier
+
+
+@pytest.fixture
+def sqlite_client(tmp_path) -> SQLite:
+    """
+    An embedded SQLite database filled with a small themes hierarchy,
+    questions and prompt results.
+
+    Returns
+    -------
+    SQLite
+        The SQLite database wrapper.
+    """
+    client = SQLite(str(tmp_path / "database.sqlite"))
+
+    level_1_identifier = generate_theme_unique_identifier("agriculture", 1)
+    client.insert_documents(
+        "themes",
+        [
+            {
+                "name": "agriculture",
+                "level": 1,
+                "total": 3,
+                "parent_theme_identifier": None,
+                "unique_identifier": level_1_identifier,
+            },
+            {
+                "name": "Agriculture",
+                "level": 0,
+                "total": 2,
+                "parent_theme_identifier": level_1_identifier,
+                "unique_identifier": generate_theme_unique_identifier("Agriculture", 0),
+            },
+            {
+                "name": "Engrais",
+                "level": 0,
+                "total": 1,
+                "parent_theme_identifier": level_1_identifier,
+                "unique_identifier": generate_theme_unique_identifier("Engrais", 0),
+            },
+        ],
+    )
+    client.insert_documents(
+        "questions",
+        [
+            {
+                "id": "15-1QE",
+                "theme": "Agriculture",
+                "question_text": "Q1",
+                "congressman": "A",
+            },
+            {
+                "id": "15-2QE",
+                "theme": "Agriculture",
+                "question_text": "",
+                "congressman": "B",
+            },
+            {
+                "id": "16-3QE",
+                "theme": "Engrais",
+                "question_text": "Q3",
+                "congressman": None,
+            },
+        ],
+    )
+    client.insert_documents(
+        "prompt_results",
+        [
+            {"run_id": "run_a", "question_id": "15-1QE", "final_answer": "agriculture"},
+            {"run_id": "run_b", "question_id": "15-1QE", "final_answer": "logement"},
+        ],
+    )
+    client.insert_documents(
+        "failed_generations",
+        [
+            {
+                "run_id": "run_a",
+                "question_id": "15-2QE",
+                "error_class": "RateLimitError",
+                "error_message": "Error code: 429",
+                "attempts": 1,
+                "first_failed_at": 1700000000,
+                "last_failed_at": 1700000000,
+                "duration": 0.4,
+            },
+            {
+                "run_id": "run_a",
+                "question_id": "16-3QE",
+                "error_class": "InvalidLLMOutputException",
+                "error_message": "`culture` is not one of the accepted values.",
+                "attempts": 3,
+                "first_failed_at": 1700000000,
+                "last_failed_at": 1700000100,
+                "duration": 1.2,
+            },
+        ],
+    )
+    client.insert_documents(
+        "batches",
+        [
+            {
+                "_id": ObjectId("66f1d0c3a1b2c3d4e5f60718"),
+                "question_ids": ["15-1QE"],
+                "size": 1,
+            }
+        ],
+    )
+
+    return client
@@ -0,0 +1,51 @@
+import pytest
+from typing import Callable, Tuple
+from models.Prompt import (
+    Prompt,
+    PromptRun,
+    PromptRunParameters,
+    PromptText,
+    PromptType,
+    RoleEnum,
+    WrapperEnum,
+)
+
+
+@pytest.fixture
+def prompt_and_run() -> Callable[..., Tuple[Prompt, PromptRun]]:
+    """
+    Build a prompt classifying a question between two themes and its run.
+    The few-shot prompt adds one example before the question.
+    """
+
+    def build(wrapper: WrapperEnum, few_shot: bool = False) -> Tuple[Prompt, PromptRun]:
+        if few_shot:
+            prompts = [
+                PromptText(role=RoleEnum.System, content="Classify the question."),
+                PromptText(role=RoleEnum.User, content="Les engrais ?"),
+                PromptText(role=RoleEnum.Assistant, content="agriculture"),
+                PromptText(role=RoleEnum.User, content="{0}"),
+            ]
+        else:
+            prompts = [
+                PromptText(role=RoleEnum.System, content="Classify the question."),
+                PromptText(role=RoleEnum.User, content="Question: {0}"),
+            ]
+        prompt = Prompt(unique_identifier="prompt", prompts=prompts)
+        prompt_run = PromptRun(
+            parameters=PromptRunParameters(
+                temperature=0,
+                model="model",
+                types=[PromptType.FewShot if few_shot else PromptType.ZeroShot],
+                theme_hierarchy_level=1,
+                wrapper=wrapper,
+            ),
+            prompt_id="prompt",
+            batch_id="batch",
+            timestamp=0,
+            themes_list=["agriculture", "logement"],
+            name="run",
+        )
+        return prompt, prompt_run
+
+    return build
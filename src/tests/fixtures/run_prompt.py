@@ -0,0 +1,157 @@
+import os
+import pytest
+import importlib
+from types import SimpleNamespace
+from typing import Any, Dict, List
+from bson import ObjectId
+from pymongo.results import InsertOneResult
+from models.Prompt import FailedGenerations, Prompt, PromptRun
+
+RUN_QUESTION_IDS = ["15-1QE", "15-2QE", "15-3QE"]
+
+
+class FakeDatabase:
+    """
+    In-memory stand-in for the database wrapper, with the methods used by the
+    runner to start, resume and retry a prompt run.
+    """
+
+    def __init__(self, questions: List[Dict[str, Any]], batch_id: ObjectId) -> None:
+        self.questions = {question["id"]: question for question in questions}
+        self.batches = {
+            batch_id: {"_id": batch_id, "question_ids": list(self.questions)}
+        }
+        self.prompts: Dict[str, Prompt] = {}
+        self.prompt_runs: Dict[ObjectId, Dict[str, Any]] = {}
+        self.prompt_results: List[Dict[str, Any]] = []
+        self.failed_generations: Dict[tuple, FailedGenerations] = {}
+
+    def get_batch(self, filters: Dict[str, Any]) -> Dict[str, Any] | None:
+        return self.batches.get(filters["_id"])
+
+    def aggregate_questions(self, pipeline: List[Dict]) -> List[Dict[str, Any]]:
+        question_ids = pipeline[0]["$match"]["id"]["$in"]
+        return [dict(self.questions[question_id]) for question_id in question_ids]
+
+    def upsert_prompt(self, prompt: Prompt) -> Prompt:
+        self.prompts[prompt.unique_identifier] = prompt
+        return prompt
+
+    def get_prompt(self, filters: Dict[str, Any]) -> Prompt:
+        return self.prompts[filters["unique_identifier"]]
+
+    def add_prompt_run(self, prompt_run: PromptRun) -> InsertOneResult:
+        prompt_run_id = ObjectId()
+        self.prompt_runs[prompt_run_id] = prompt_run.model_dump()
+        return InsertOneResult(prompt_run_id, acknowledged=True)
+
+    def get_prompt_run(self, filters: Dict[str, Any]) -> Dict[str, Any] | None:
+        return self.prompt_runs.get(filters["_id"])
+
+    def add_prompt_results(self, documents: List[Dict[str, Any]]) -> int:
+        self.prompt_results += documents
+        return len(documents)
+
+    def get_answered_question_ids(self, run_id: str) -> set:
+        return {
+            result["question_id"]
+            for result in self.prompt_results
+            if result["run_id"] == run_id
+        }
+
+    def record_failed_generation(self, failed_generation: FailedGenerations) -> None:
+        key = (failed_generation.run_id, failed_generation.question_id)
+        previous = self.failed_generations.get(key)
+        if previous is not None:
+            failed_generation = failed_generation.model_copy(
+                update={
+                    "attempts": previous.attempts + failed_generation.attempts,
+                    "first_failed_at": previous.first_failed_at,
+                }
+            )
+        self.failed_generations[key] = failed_generation
+
+    def get_failed_generations(
+        self, run_id: str, max_attempts: int | None = None
+    ) -> List[FailedGenerations]:
+        return [
+            failure
+            for (failure_run_id, _), failure in self.failed_generations.items()
+            if failure_run_id == run_id
+            and (max_attempts is None or failure.attempts < max_attempts)
+        ]
+
+    def delete_failed_generations(self, run_id: str, question_ids: List[str]) -> int:
+        keys = [(run_id, question_id) for question_id in question_ids]
+        deleted = [key for key in keys if key in self.failed_generations]
+        for key in deleted:
+            del self.failed_generations[key]
+        return len(deleted)
+
+
+class FakeResultSink:
+    """
+    Result sink writing each result at once.
+    """
+
+    def __init__(self, database: FakeDatabase) -> None:
+        self.database = database
+
+    def put(self, document: Dict[str, Any]) -> None:
+        self.database.add_prompt_results([document])
+
+    def flush(self, timeout: float | None = None) -> bool:
+        return True
+
+
+@pytest.fixture
+def prompt_runner(monkeypatch, tmp_path) -> SimpleNamespace:
+    """
+    The runner module, connected to an in-memory database holding a batch of
+    three questions of the "agriculture" theme. The LLM clients are created
+    with placeholder keys: tests must replace `_call_wrapper`.
+
+    Returns
+    -------
+    SimpleNamespace
+        The `prompting.run_prompt` module as `module`, its database as
+        `database` and the ID of the batch as `batch_id`.
+    """
+    for name in [
+        "OPENAI_API_KEY",
+        "ANTHROPIC_API_KEY",
+        "MISTRAL_API_KEY",
+        "GEMINI_API_KEY",
+    ]:
+        monkeypatch.setenv(name, os.getenv(name) or "test")
+    monkeypatch.setenv("DATABASE_BACKEND", "sqlite")
+    monkeypatch.setenv("SQLITE_DATABASE_PATH", str(tmp_path / "database.sqlite"))
+    module = importlib.import_module("prompting.run_prompt")
+
+    batch_id = ObjectId()
+    database = FakeDatabase(
+        [
+            {
+                "id": question_id,
+                "congressman": "A",
+                "questioned_ministry": "Agriculture",
+                "responsible_ministry": "Agriculture",
+                "question_date": None,
+                "response_date": None,
+                "theme": "Engrais",
+                "sub_theme": "",
+                "analysis": None,
+                "question_text": f"Question {question_id}",
+                "response_text": None,
+                "theme_ancestors": {
+                    "1": {"name": "agriculture", "unique_identifier": "agriculture"}
+                },
+            }
+            for question_id in RUN_QUESTION_IDS
+        ],
+        batch_id,
+    )
+    monkeypatch.setattr(module, "connector", SimpleNamespace(client=database))
+    monkeypatch.setattr(module, "_get_result_sink", lambda: FakeResultSink(database))
+
+    return SimpleNamespace(module=module, database=database, batch_id=str(batch_id))
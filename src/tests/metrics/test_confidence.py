@@ -3,7 +3,8 @@ from metrics.llm.confidence import (
     _samples_in_bin,
     _accuracy_in_bin,
     _confidence_in_bin,
-    _compute_ece_from_data
+    _compute_ece_from_data,
+    _compute_logprobs_confidence,
 )
 
 
@@ -61,3 +62,17 @@ def test_compute_ece(confidence_data):
     result = _compute_ece_from_data(confidence_data, 5)
     expected = 0.1044
     assert round(result, 4) == expected
+
+
+def test_logprobs_confidence_ignores_the_label_distribution_alternatives():
+    top_logprobs = [{"token": "a", "logprob": -0.1}]
+    top_logprobs += [{"token": "b", "logprob": -3.0}] * 3
+    # Label distribution runs request an alternative for each label.
+    all_labels = top_logprobs + [{"token": "c", "logprob": -1.0}] * 16
+
+    confidence = _compute_logprobs_confidence(
+        [{"token": "a", "logprob": -0.1, "top_logprobs": top_logprobs}]
+    )
+    assert confidence == _compute_logprobs_confidence(
+        [{"token": "a", "logprob": -0.1, "top_logprobs": all_labels}]
+    )
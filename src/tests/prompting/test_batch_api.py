@@ -0,0 +1,60 @@
+import json
+from anthropic import Anthropic
+from openai import OpenAI
+from models.Prompt import WrapperEnum
+from prompting.batch_api import render_openai_batch, submit_batch, wait_for_batch
+from prompting.provider_requests import (
+    build_anthropic_request,
+    build_openai_request,
+    parse_anthropic_response,
+    parse_openai_response,
+)
+
+
+def test_render_openai_batch(prompt_and_run):
+    prompt, prompt_run = prompt_and_run(WrapperEnum.OpenAI)
+    jsonl = render_openai_batch(
+        {"15-1QE": build_openai_request(prompt, prompt_run, "Les engrais ?")}
+    )
+    line = json.loads(jsonl)
+    assert line["custom_id"] == "15-1QE"
+    assert line["url"] == "/v1/chat/completions"
+    assert line["body"]["messages"][1]["content"] == "Question: Les engrais ?"
+    assert line["body"]["prompt_cache_key"] == "prompt"
+    assert "extra_body" not in line["body"]
+
+
+def test_openai_batch_round_trip(batch_api_server, prompt_and_run):
+    prompt, prompt_run = prompt_and_run(WrapperEnum.OpenAI)
+    client = OpenAI(api_key="test", base_url=f"{batch_api_server.url}/v1")
+    requests = {
+        question_id: build_openai_request(prompt, prompt_run, "Les engrais ?")
+        for question_id in ["15-1QE", "15-2QE-error"]
+    }
+
+    batch_id = submit_batch(WrapperEnum.OpenAI, client, requests)
+    responses = wait_for_batch(WrapperEnum.OpenAI, client, batch_id, poll_interval=0)
+
+    assert list(responses.keys()) == ["15-1QE"]
+    output = parse_openai_response(responses["15-1QE"], prompt_run)
+    assert output.predicted_label == "agriculture"
+    assert output.prompt_tokens == 10
+
+
+def test_anthropic_batch_round_trip(batch_api_server, prompt_and_run):
+    prompt, prompt_run = prompt_and_run(WrapperEnum.Anthropic)
+    client = Anthropic(api_key="test", base_url=batch_api_server.url)
+    requests = {
+        question_id: build_anthropic_request(prompt, prompt_run, "Les engrais ?")
+        for question_id in ["15-1QE", "15-2QE-error"]
+    }
+
+    batch_id = submit_batch(WrapperEnum.Anthropic, client, requests)
+    submitted = batch_api_server.state["batches"][batch_id]["requests"]
+    assert submitted[0]["params"]["system"][0]["text"] == "Classify the question."
+
+    responses = wait_for_batch(WrapperEnum.Anthropic, client, batch_id, poll_interval=0)
+
+    assert list(responses.keys()) == ["15-1QE"]
+    output = parse_anthropic_response(responses["15-1QE"], prompt_run)
+    assert output.predicted_label == "agriculture"
@@ -0,0 +1,130 @@
+import pytest
+from models.Prompt import CotExplanation
+from models.Question import QuestionType
+from prompting.example_store import ExampleStore
+from utils.helpers import generate_theme_unique_identifier
+from utils.theme_tree import ThemeTree
+
+PARENT_THEMES = {
+    "agriculture": ["Agriculture", "Engrais"],
+    "logement": ["Logement", "Loyers"],
+    "santé": ["Santé"],
+}
+QUESTION_IDS_BY_THEME = {
+    "Agriculture": ["14-1QE", "15-2QE"],
+    "Engrais": ["15-3QG"],
+    "Logement": ["14-4QE", "15-5QOSD"],
+    "Loyers": ["15-6QE"],
+    "Santé": ["14-7QE"],
+}
+
+
+def _theme_tree() -> ThemeTree:
+    themes = []
+    for parent, children in PARENT_THEMES.items():
+        parent_identifier = generate_theme_unique_identifier(parent, 1)
+        themes.append(
+            {
+                "name": parent,
+                "level": 1,
+                "total": 0,
+                "parent_theme_identifier": None,
+                "unique_identifier": parent_identifier,
+            }
+        )
+        for child in children:
+            themes.append(
+                {
+                    "name": child,
+                    "level": 0,
+                    "total": 0,
+                    "parent_theme_identifier": parent_identifier,
+                    "unique_identifier": generate_theme_unique_identifier(child, 0),
+                }
+            )
+    return ThemeTree(themes)
+
+
+def _example_store(loaded_themes: list, get_theme_tree=None) -> ExampleStore:
+    def get_question_ids_by_theme(themes):
+        loaded_themes.append(themes)
+        return {theme: QUESTION_IDS_BY_THEME[theme] for theme in themes}
+
+    explanations = [
+        CotExplanation(
+            question_id=question_id,
+            legislature=int(question_id.split("-")[0]),
+            label=parent,
+            question_text="",
+            explanation="",
+        )
+        for parent, children in PARENT_THEMES.items()
+        for child in children
+        for question_id in QUESTION_IDS_BY_THEME[child]
+    ]
+    if get_theme_tree is None:
+        theme_tree = _theme_tree()
+
+        def get_theme_tree():
+            return theme_tree
+
+    return ExampleStore(explanations, get_theme_tree, get_question_ids_by_theme)
+
+
+ACCEPTED_THEMES = [theme for children in PARENT_THEMES.values() for theme in children]
+
+
+def test_sample_question_ids_is_stratified_and_seeded():
+    loaded_themes = []
+    store = _example_store(loaded_themes)
+
+    first = store.sample_question_ids(3, ACCEPTED_THEMES, 1, seed=7)
+    assert first == store.sample_question_ids(3, ACCEPTED_THEMES, 1, seed=7)
+    assert len(loaded_themes) == 1
+
+    parents = {
+        parent
+        for parent, children in PARENT_THEMES.items()
+        for child in children
+        for question_id in QUESTION_IDS_BY_THEME[child]
+        if question_id in first
+    }
+    assert parents == set(PARENT_THEMES)
+
+
+def test_sample_filters_on_legislature_and_question_type():
+    store = _example_store([])
+
+    assert store.question_strata(ACCEPTED_THEMES, 1, legislature=15) == {
+        "agriculture": ["15-2QE", "15-3QG"],
+        "logement": ["15-5QOSD", "15-6QE"],
+        "santé": [],
+    }
+    assert store.sample_question_ids(
+        1, ACCEPTED_THEMES, 1, question_type=QuestionType.QUESTION_AU_GOUVERNEMENT
+    ) == ["15-3QG"]
+
+    explanations = store.sample_explanations(2, ACCEPTED_THEMES, 1, legislature=14)
+    assert {explanation.legislature for explanation in explanations} == {14}
+    with pytest.raises(ValueError):
+        store.sample_explanations(3, ACCEPTED_THEMES, 1, legislature=15)
+
+
+def test_strata_are_built_again_with_a_new_theme_tree():
+    loaded_themes = []
+    theme_trees = [_theme_tree()]
+    store = _example_store(loaded_themes, lambda: theme_trees[-1])
+
+    store.question_strata(ACCEPTED_THEMES, 1)
+    store.question_strata(ACCEPTED_THEMES, 1)
+    assert len(loaded_themes) == 1
+
+    # The themes tree is rebuilt after a theme update.
+    theme_trees.append(_theme_tree())
+    store.question_strata(ACCEPTED_THEMES, 1)
+    assert len(loaded_themes) == 2
+
+    # New questions were added.
+    store.clear()
+    store.question_strata(ACCEPTED_THEMES, 1)
+    assert len(loaded_themes) == 3
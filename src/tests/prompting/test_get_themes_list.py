@@ -0,0 +1,28 @@
+import importlib
+from types import SimpleNamespace
+
+
+def test_accepted_themes_list_from_names_and_theme_documents(
+    monkeypatch, tmp_path, sqlite_client
+):
+    monkeypatch.setenv("DATABASE_BACKEND", "sqlite")
+    monkeypatch.setenv("SQLITE_DATABASE_PATH", str(tmp_path / "database.sqlite"))
+    module = importlib.import_module("prompting.get_themes_list")
+    monkeypatch.setattr(module, "connector", SimpleNamespace(client=sqlite_client))
+
+    themes = list(sqlite_client.get_themes({}))
+    level_1_themes = [theme for theme in themes if theme["level"] == 1]
+
+    assert module.get_accepted_themes_list_from_themes_list(["agriculture"]) == [
+        "Agriculture",
+        "Engrais",
+    ]
+    assert module.get_accepted_themes_list_from_themes_list(level_1_themes) == [
+        "Agriculture",
+        "Engrais",
+    ]
+    # Theme documents are retrieved at their own level.
+    assert module.get_accepted_themes_list_from_themes_list(
+        level_1_themes, theme_level=0
+    ) == ["Agriculture", "Engrais"]
+    assert module.get_accepted_themes_list_from_themes_list(["Engrais"]) == []
@@ -1,4 +1,5 @@
-from prompting.prompt_mask import question_processing
+import pytest
+from prompting.prompt_mask import MinistryMask, question_processing
 
 
 def test_prompt_mask(real_prompt_environnement):
@@ -97,3 +98,29 @@ Label: enseignement
 """
     result = question_processing(real_prompt_enseignement)
     assert expected == result
+
+
+MASKS = ["l'agriculture et de l'alimentation", "l'agriculture", "Travail", "travail"]
+
+
+def test_ministry_mask_removes_first_matching_mask():
+    ministry_mask = MinistryMask(MASKS)
+
+    assert ministry_mask.mask_questions(
+        [
+            "M. le ministre de l'agriculture et de l'alimentation sur les engrais.",
+            "M. le ministre de l'agriculture sur les engrais.",
+            "M. le ministre du travail sur les retraites.",
+        ]
+    ) == [
+        "M. le ministre sur les engrais.",
+        "M. le ministre sur les engrais.",
+        "M. le ministre sur les retraites.",
+    ]
+
+
+def test_ministry_mask_only_after_ministry_introduction():
+    ministry_mask = MinistryMask(MASKS)
+
+    with pytest.raises(ValueError):
+        ministry_mask.mask("M. le député du travail interroge M. le ministre.")
@@ -0,0 +1,174 @@
+import math
+import pytest
+from models.Prompt import Prompt, PromptText, PromptType, RoleEnum, WrapperEnum
+from prompting.provider_requests import (
+    ANTHROPIC_CACHE_CONTROL,
+    build_anthropic_request,
+    build_openai_request,
+    format_messages,
+    get_render_plan,
+    parse_anthropic_response,
+    parse_openai_response,
+)
+
+
+def test_openai_request_keeps_the_shared_prefix_stable(prompt_and_run):
+    prompt, prompt_run = prompt_and_run(WrapperEnum.OpenAI, few_shot=True)
+    first = build_openai_request(prompt, prompt_run, "Les loyers ?")
+    second = build_openai_request(prompt, prompt_run, "Les semences ?")
+
+    assert first["messages"][:-1] == second["messages"][:-1]
+    assert first["messages"][-1]["content"] == "Les loyers ?"
+    assert first["extra_body"] == {"prompt_cache_key": "prompt"}
+    assert "n" not in first
+    assert build_openai_request(prompt, prompt_run, "Les loyers ?", samples=5)["n"] == 5
+
+
+def test_anthropic_request_marks_the_shared_prefix_as_cacheable(prompt_and_run):
+    prompt, prompt_run = prompt_and_run(WrapperEnum.Anthropic, few_shot=True)
+    request = build_anthropic_request(prompt, prompt_run, "Les loyers ?")
+
+    assert request["system"][0]["cache_control"] == ANTHROPIC_CACHE_CONTROL
+    assert request["messages"][-2]["content"][0] == {
+        "type": "text",
+        "text": "agriculture",
+        "cache_control": ANTHROPIC_CACHE_CONTROL,
+    }
+    assert request["messages"][-1] == {"role": "user", "content": "Les loyers ?"}
+
+
+def test_render_plan_reuses_the_static_messages(prompt_and_run):
+    prompt, _ = prompt_and_run(WrapperEnum.OpenAI, few_shot=True)
+    first = format_messages(prompt, "Les loyers ?")
+    second = format_messages(prompt, "Les semences ?")
+
+    assert get_render_plan(prompt) is get_render_plan(prompt)
+    assert all(a is b for a, b in zip(first[:-1], second[:-1]))
+    assert first[-1] is not second[-1]
+    assert format_messages(prompt, "{1}", with_system_prompt=False) == [
+        {"role": "user", "content": "Les engrais ?"},
+        {"role": "assistant", "content": "agriculture"},
+        {"role": "user", "content": "{1}"},
+    ]
+
+
+def test_render_plan_applies_the_association_table_per_question():
+    prompt = Prompt(
+        unique_identifier="calibration",
+        prompts=[
+            PromptText(role=RoleEnum.System, content="Classify {{the}} question."),
+            PromptText(role=RoleEnum.User, content="{0}"),
+            PromptText(role=RoleEnum.Assistant, content="Réponse: #!result"),
+            PromptText(role=RoleEnum.User, content="Êtes-vous sûr ?"),
+        ],
+    )
+
+    for result in ("agriculture", "logement"):
+        messages = format_messages(prompt, "Les loyers ?", {"#!result": result})
+        assert [message["content"] for message in messages] == [
+            "Classify {the} question.",
+            "Les loyers ?",
+            f"Réponse: {result}",
+            "Êtes-vous sûr ?",
+        ]
+
+
+def test_parse_openai_response_cached_tokens(prompt_and_run):
+    _, prompt_run = prompt_and_run(WrapperEnum.OpenAI, few_shot=True)
+    response = {
+        "choices": [
+            {"message": {"content": "Agriculture"}, "logprobs": {"content": None}}
+        ],
+        "usage": {
+            "prompt_tokens": 1500,
+            "completion_tokens": 2,
+            "prompt_tokens_details": {"cached_tokens": 1280},
+        },
+    }
+
+    output = parse_openai_response(response, prompt_run)
+    assert output.predicted_label == "agriculture"
+    assert output.prompt_tokens == 1500
+    assert output.cached_prompt_tokens == 1280
+
+
+def test_parse_anthropic_response_cached_tokens(prompt_and_run):
+    _, prompt_run = prompt_and_run(WrapperEnum.Anthropic, few_shot=True)
+    response = {
+        "content": [{"type": "text", "text": "agriculture"}],
+        "usage": {
+            "input_tokens": 20,
+            "output_tokens": 2,
+            "cache_read_input_tokens": 1480,
+            "cache_creation_input_tokens": 0,
+        },
+    }
+
+    output = parse_anthropic_response(response, prompt_run)
+    assert output.prompt_tokens == 1500
+    assert output.cached_prompt_tokens == 1480
+
+
+def test_parse_openai_response_samples(prompt_and_run):
+    _, prompt_run = prompt_and_run(WrapperEnum.OpenAI, few_shot=True)
+    response = {
+        "choices": [
+            {"message": {"content": content}, "logprobs": {"content": None}}
+            for content in ["Logement", "agriculture", "logement"]
+        ],
+        "usage": {"prompt_tokens": 1500, "completion_tokens": 6},
+    }
+
+    output = parse_openai_response(response, prompt_run)
+    assert output.predicted_label == "logement"
+    assert [sample.predicted_label for sample in output.samples] == [
+        "logement",
+        "agriculture",
+        "logement",
+    ]
+
+
+def test_label_distribution_from_the_first_answer_token(prompt_and_run):
+    prompt, prompt_run = prompt_and_run(WrapperEnum.OpenAI, few_shot=True)
+    prompt_run.parameters.types.append(PromptType.LabelDistribution)
+    prompt_run.themes_list = ["Agriculture", "Logement", "Santé"]
+    selectors = {"A": "Agriculture", "B": "Logement", "C": "Santé"}
+
+    def retrieve_theme_func(themes_list, theme_level, llm_response):
+        return selectors.get(llm_response.strip().upper())
+
+    assert build_openai_request(prompt, prompt_run, "Les loyers ?")["top_logprobs"] == 4
+    prompt_run.themes_list = [f"theme {i}" for i in range(26)]
+    assert (
+        build_openai_request(prompt, prompt_run, "Les loyers ?")["top_logprobs"] == 20
+    )
+    prompt_run.themes_list = ["Agriculture", "Logement", "Santé"]
+
+    response = {
+        "choices": [
+            {
+                "message": {"content": "B"},
+                "logprobs": {
+                    "content": [
+                        {
+                            "token": "B",
+                            "logprob": math.log(0.6),
+                            "top_logprobs": [
+                                {"token": "B", "logprob": math.log(0.6)},
+                                {"token": "A", "logprob": math.log(0.2)},
+                                {"token": " B", "logprob": math.log(0.1)},
+                                {"token": "Le", "logprob": math.log(0.1)},
+                            ],
+                        }
+                    ]
+                },
+            }
+        ],
+        "usage": {"prompt_tokens": 100, "completion_tokens": 1},
+    }
+
+    output = parse_openai_response(response, prompt_run, retrieve_theme_func)
+    assert output.predicted_label == "logement"
+    assert output.label_distribution == pytest.approx(
+        {"agriculture": 0.2 / 0.9, "logement": 0.7 / 0.9, "santé": 0.0}, abs=1e-6
+    )
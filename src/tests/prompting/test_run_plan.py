@@ -0,0 +1,115 @@
+import pytest
+from models.Pricing import Pricing
+from models.Question import Question, QuestionType
+from models.RateLimit import RateLimit
+from models.Prompt import (
+    Prompt,
+    PromptRunParameters,
+    PromptText,
+    PromptType,
+    RoleEnum,
+    WrapperEnum,
+)
+from configs.pricing import PRICING, get_pricing
+from errors.BudgetExceededException import BudgetExceededException
+from prompting.run_plan import plan_run
+from utils.token_budget import TokenBudget
+from utils.tokens import TokenCounter
+
+
+def _question(question_id: str, question_text: str) -> Question:
+    return Question(
+        id=question_id,
+        congressman="A",
+        questioned_ministry="Ministère de l'agriculture",
+        responsible_ministry="Ministère de l'agriculture",
+        question_date=None,
+        response_date=None,
+        theme="Agriculture",
+        sub_theme="",
+        analysis=None,
+        question_text=question_text,
+        response_text=None,
+        question_type=QuestionType.QUESTION_ECRITE,
+    )
+
+
+def _parameters(wrapper: WrapperEnum, model: str) -> PromptRunParameters:
+    return PromptRunParameters(
+        temperature=0,
+        model=model,
+        types=[PromptType.ZeroShot],
+        theme_hierarchy_level=1,
+        wrapper=wrapper,
+    )
+
+
+def test_get_pricing_matches_model_prefix():
+    assert get_pricing(WrapperEnum.OpenAI, "gpt-4o-mini-2024-07-18") == (
+        PRICING[WrapperEnum.OpenAI]["gpt-4o-mini"]
+    )
+
+
+def test_pricing_cost_with_cached_tokens():
+    pricing = Pricing(input=2.0, cached_input=1.0, output=10.0)
+    assert pricing.cost(1_000_000, 100_000, cached_prompt_tokens=500_000) == 2.5
+    assert Pricing(input=2.0, output=10.0).cost(1_000_000, 0, 500_000) == 2.0
+
+
+def test_token_counter_approximation():
+    counter = TokenCounter(WrapperEnum.Anthropic, "claude-3-haiku")
+    assert not counter.is_exact
+    assert counter.count("a" * 35) == 10
+    assert counter.count_messages([{"role": "user", "content": "a" * 35}]) == 14
+
+
+def test_plan_run():
+    prompt = Prompt(
+        unique_identifier="prompt",
+        prompts=[
+            PromptText(role=RoleEnum.System, content="a" * 3570),
+            PromptText(role=RoleEnum.User, content="{0}"),
+        ],
+    )
+    questions = [_question(f"15-{i}QE", "b" * 350) for i in range(3)]
+
+    plan = plan_run(
+        questions,
+        prompt,
+        _parameters(WrapperEnum.Anthropic, "claude-3-haiku"),
+        response_tokens_per_question=10,
+        rate_limit=RateLimit(requests_per_minute=1, tokens_per_minute=None),
+    )
+
+    assert plan.number_of_questions == 3
+    assert plan.prompt_tokens == 3 * (1024 + 104)
+    assert plan.max_prompt_tokens_per_question == 1128
+    # The 1024 tokens system prompt is cached after the first question.
+    assert plan.cached_prompt_tokens == 2 * 1024
+    assert plan.response_tokens == 30
+    assert plan.estimated_duration == 180
+    assert plan.estimated_cost == pytest.approx(
+        PRICING[WrapperEnum.Anthropic]["claude-3-haiku"].cost(3384, 30, 2048)
+    )
+
+
+def test_token_budget():
+    budget = TokenBudget(Pricing(input=1.0, output=1.0), max_tokens=1000)
+    budget.reserve(400, 100)
+    budget.record(400, 100, 300, 10)
+    assert budget.used_tokens == 310
+
+    budget.reserve(500, 100)
+    with pytest.raises(BudgetExceededException):
+        budget.reserve(100, 100)
+
+
+def test_token_budget_cost():
+    budget = TokenBudget(Pricing(input=1.0, output=1.0), max_cost=0.001)
+    budget.reserve(500, 500)
+    with pytest.raises(BudgetExceededException):
+        budget.reserve(1, 0)
+
+    # The reservation of a failed request is released.
+    budget.record(500, 500, 0, 0)
+    budget.reserve(500, 0)
@@ -0,0 +1,194 @@
+from typing import Callable, Dict, List
+from models.LLMOutput import WrapperOutput
+from utils.response_cache import ResponseCache
+from models.Prompt import (
+    PromptRunParameters,
+    PromptText,
+    PromptType,
+    RoleEnum,
+    WrapperEnum,
+)
+
+PARAMETERS = PromptRunParameters(
+    temperature=0,
+    model="model",
+    types=[PromptType.ZeroShot],
+    theme_hierarchy_level=1,
+    wrapper=WrapperEnum.OpenAI,
+)
+PROMPTS = [
+    PromptText(role=RoleEnum.System, content="Classify the question."),
+    PromptText(role=RoleEnum.User, content="Question: {0}"),
+]
+
+
+def stub_wrapper(
+    monkeypatch, module, answer: Callable[[str, int], str]
+) -> Dict[str, List[int]]:
+    """
+    Replace the provider call by `answer(question_text, attempt)`, which raises
+    to fail the attempt. Returns the attempts sent for each question text.
+    """
+    calls: Dict[str, List[int]] = {}
+
+    def call_wrapper(prompt, prompt_run, question_text, *args, **kwargs):
+        attempts = calls.setdefault(question_text, [])
+        attempts.append(len(attempts) + 1)
+        label = answer(question_text, len(attempts))
+        return WrapperOutput(
+            raw_response=label,
+            predicted_label=label,
+            prompt_tokens=10,
+            response_tokens=1,
+        )
+
+    monkeypatch.setattr(module, "_call_wrapper", call_wrapper)
+    return calls
+
+
+def start_run(runner, **kwargs):
+    return runner.module.run_prompts(
+        parameters=PARAMETERS,
+        prompts=PROMPTS,
+        themes_list=["agriculture", "logement"],
+        description="",
+        name="run",
+        batch_id=runner.batch_id,
+        **{"use_cache": False, **kwargs},
+    )
+
+
+def fail_on(question_text: str) -> Callable[[str, int], str]:
+    def answer(text: str, attempt: int) -> str:
+        if text == question_text:
+            raise TimeoutError(text)
+        return "agriculture"
+
+    return answer
+
+
+def test_resume_run_prompts_only_the_unanswered_questions(monkeypatch, prompt_runner):
+    stub_wrapper(monkeypatch, prompt_runner.module, fail_on("Question 15-2QE"))
+    run_info = start_run(prompt_runner, max_attempts=1)
+
+    database = prompt_runner.database
+    assert database.get_answered_question_ids(run_info.run_id) == {"15-1QE", "15-3QE"}
+    assert [
+        failure.question_id
+        for failure in database.get_failed_generations(run_info.run_id)
+    ] == ["15-2QE"]
+
+    calls = stub_wrapper(monkeypatch, prompt_runner.module, lambda *_: "agriculture")
+    prompt_runner.module.resume_run(run_info.run_id, use_cache=False)
+
+    assert list(calls) == ["Question 15-2QE"]
+    assert database.get_answered_question_ids(run_info.run_id) == {
+        "15-1QE",
+        "15-2QE",
+        "15-3QE",
+    }
+    # Recovered by the resume, so removed from the dead-letter collection.
+    assert database.get_failed_generations(run_info.run_id) == []
+
+
+def test_failed_generations_are_retried_with_backoff_until_the_attempt_cap(
+    monkeypatch, prompt_runner
+):
+    def answer(text: str, attempt: int) -> str:
+        # The first question always fails, the second only at its first attempt.
+        if text == "Question 15-1QE" or (text == "Question 15-2QE" and attempt == 1):
+            raise TimeoutError(text)
+        return "agriculture"
+
+    calls = stub_wrapper(monkeypatch, prompt_runner.module, answer)
+    run_info = start_run(prompt_runner, max_attempts=1)
+
+    delays = []
+    recovered_count = prompt_runner.module._retry_failed_generations(
+        max_attempts=3,
+        max_concurrency=1,
+        sleep_time=0.0,
+        retry_base_delay=1.0,
+        sleep=delays.append,
+        prompt=prompt_runner.database.get_prompt(
+            {"unique_identifier": run_info.prompt_run.prompt_id}
+        ),
+        prompt_run=run_info.prompt_run,
+        prompt_run_id=run_info.run_id,
+    )
+
+    assert recovered_count == 1
+    assert delays == [1.0, 2.0]
+    assert calls == {
+        "Question 15-1QE": [1, 2, 3],
+        "Question 15-2QE": [1, 2],
+        "Question 15-3QE": [1],
+    }
+    failures = prompt_runner.database.get_failed_generations(run_info.run_id)
+    assert [(failure.question_id, failure.attempts) for failure in failures] == [
+        ("15-1QE", 3)
+    ]
+
+
+def test_invalid_answers_are_not_replayed_from_the_cache(
+    monkeypatch, prompt_runner, tmp_path
+):
+    response_cache = ResponseCache(str(tmp_path / "cache"), 10_000_000, 3600)
+    monkeypatch.setattr(
+        prompt_runner.module, "get_response_cache", lambda: response_cache
+    )
+    # The first answer to each question is out of the label space of the run.
+    calls = stub_wrapper(
+        monkeypatch,
+        prompt_runner.module,
+        lambda text, attempt: "pas un thème" if attempt == 1 else "agriculture",
+    )
+    run_info = start_run(prompt_runner, max_attempts=1, use_cache=True)
+
+    database = prompt_runner.database
+    assert database.get_answered_question_ids(run_info.run_id) == set()
+    assert len(database.get_failed_generations(run_info.run_id)) == 3
+
+    prompt_runner.module.resume_run(run_info.run_id, max_attempts=1, use_cache=True)
+
+    assert all(attempts == [1, 2] for attempts in calls.values())
+    assert len(database.get_answered_question_ids(run_info.run_id)) == 3
+    assert database.get_failed_generations(run_info.run_id) == []
+
+
+def test_examples_are_selected_for_each_question(monkeypatch, prompt_runner):
+    prompts_sent = {}
+
+    def call_wrapper(prompt, prompt_run, question_text, *args, **kwargs):
+        prompts_sent[question_text] = [text.content for text in prompt.prompts]
+        return WrapperOutput(
+            raw_response="agriculture",
+            predicted_label="agriculture",
+            prompt_tokens=10,
+            response_tokens=1,
+        )
+
+    monkeypatch.setattr(prompt_runner.module, "_call_wrapper", call_wrapper)
+
+    def examples_func(question) -> List[PromptText]:
+        return [
+            PromptText(role=RoleEnum.User, content=f"Example of {question.id}"),
+            PromptText(role=RoleEnum.Assistant, content="agriculture"),
+        ]
+
+    run_info = start_run(prompt_runner, examples_func=examples_func)
+
+    assert prompts_sent == {
+        f"Question {question_id}": [
+            "Classify the question.",
+            f"Example of {question_id}",
+            "agriculture",
+            "Question: {0}",
+        ]
+        for question_id in ["15-1QE", "15-2QE", "15-3QE"]
+    }
+    # The stored prompt does not hold the examples of any question.
+    stored_prompt = prompt_runner.database.get_prompt(
+        {"unique_identifier": run_info.prompt_run.prompt_id}
+    )
+    assert len(stored_prompt.prompts) == 2
@@ -0,0 +1,65 @@
+from typing import List
+from models.LLMOutput import Sample, WrapperOutput
+from prompting.self_consistency import (
+    merge_outputs,
+    next_round_size,
+    sample_until_consistent,
+)
+
+
+def _output(*labels: str) -> WrapperOutput:
+    return WrapperOutput(
+        raw_response=f"Thème: {labels[0]}",
+        prompt_tokens=100,
+        response_tokens=5 * len(labels),
+        predicted_label=labels[0],
+        samples=(
+            [
+                Sample(response=f"Thème: {label}", predicted_label=label)
+                for label in labels
+            ]
+            if len(labels) > 1
+            else None
+        ),
+    )
+
+
+def test_next_round_size():
+    assert next_round_size([], 10, 0.8, min_samples=3) == 3
+    assert next_round_size([], 2, 0.8, min_samples=3) == 2
+    # 3 / 3 agree.
+    assert next_round_size(["a", "a", "a"], 10, 0.8) == 0
+    # 2 / 3 agree, 2 more agreeing samples would reach 4 / 5.
+    assert next_round_size(["a", "a", "b"], 10, 0.8) == 2
+    # The remaining sample can not change the majority.
+    assert next_round_size(["a", "a", "a", "b"], 5, 1.0) == 0
+    assert next_round_size(["a", "b", "c", "d"], 4, 0.8) == 0
+
+
+def test_sample_until_consistent_stops_once_the_samples_agree():
+    rounds: List[int] = []
+    labels = iter(["logement", "logement", "santé", "logement", "logement"])
+
+    def draw(size: int) -> List[WrapperOutput]:
+        rounds.append(size)
+        return [_output(*[next(labels) for _ in range(size)])]
+
+    output = sample_until_consistent(draw, samples=10, agreement_threshold=0.8)
+
+    assert rounds == [3, 2]
+    assert output.predicted_label == "logement"
+    assert output.prompt_tokens == 200
+    assert output.response_tokens == 25
+    assert len(output.samples) == 5
+
+
+def test_merge_outputs_keeps_the_first_majority_sample():
+    output = merge_outputs([_output("santé"), _output("logement"), _output("Logement")])
+
+    assert output.predicted_label == "logement"
+    assert output.raw_response == "Thème: logement"
+    assert [sample.predicted_label for sample in output.samples] == [
+        "santé",
+        "logement",
+        "Logement",
+    ]
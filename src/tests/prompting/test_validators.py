@@ -0,0 +1,47 @@
+import pytest
+from errors.InvalidLLMOutputException import InvalidLLMOutputException
+from prompting.validators import (
+    A_TO_Z_SELECTORS,
+    choices_validator,
+    range_validator,
+    regex_capture,
+    themes_validator,
+)
+
+
+def test_choices_validator():
+    validate = choices_validator(A_TO_Z_SELECTORS)
+    validate("A")
+
+    with pytest.raises(InvalidLLMOutputException):
+        validate("a")
+    with pytest.raises(InvalidLLMOutputException):
+        validate("AB")
+
+
+def test_range_validator():
+    validate = range_validator(0.0, 1.0)
+    validate("0.85")
+    validate("1")
+
+    with pytest.raises(InvalidLLMOutputException):
+        validate("1.2")
+    with pytest.raises(InvalidLLMOutputException):
+        validate("0.8.5")
+
+
+def test_regex_capture():
+    capture = regex_capture(r"^(Thème:) ([\w| |'|,|-]+)", group=2)
+    assert capture("Thème: logement \nProbabilité: 0.85") == "logement"
+
+    with pytest.raises(InvalidLLMOutputException):
+        capture("logement")
+
+
+def test_themes_validator_is_built_once_per_label_space():
+    themes_list = ("agriculture", "logement")
+    assert themes_validator(themes_list) is themes_validator(themes_list)
+
+    themes_validator(themes_list)("logement")
+    with pytest.raises(InvalidLLMOutputException):
+        themes_validator(themes_list)("santé")
@@ -0,0 +1,73 @@
+import numpy as np
+from utils.knn_index import KnnIndex
+
+QUESTIONS = [
+    (
+        "16-1QE",
+        "Le prix des engrais azotés pour les exploitations agricoles",
+        "engrais",
+    ),
+    (
+        "16-2QE",
+        "Les aides aux exploitations agricoles touchées par la grêle",
+        "calamités",
+    ),
+    ("16-3QE", "La hausse des loyers dans les zones tendues", "loyers"),
+    (
+        "16-4QE",
+        "Les logements sociaux vacants dans les zones tendues",
+        "logement social",
+    ),
+    ("16-5QE", "Le prix des engrais et des semences pour les agriculteurs", "engrais"),
+    ("16-6QE", "La fermeture des lignes ferroviaires régionales", "ferroviaire"),
+]
+LABELS = {
+    "engrais": "agriculture",
+    "calamités": "agriculture",
+    "loyers": "logement",
+    "logement social": "logement",
+}
+
+
+def build_index() -> KnnIndex:
+    return KnnIndex.build(QUESTIONS, dimension=64, n_lists=3)
+
+
+def test_query_returns_nearest_neighbours_first():
+    matches = build_index().query(
+        "Le prix des engrais azotés", k=2, max_per_label=2, probed_lists=1
+    )
+
+    assert [question_id for question_id, _, _ in matches] == ["16-1QE", "16-5QE"]
+    assert [label for _, label, _ in matches] == ["engrais", "engrais"]
+    assert matches[0][2] >= matches[1][2] > 0
+
+
+def test_query_keeps_one_question_per_label():
+    matches = build_index().query("Le prix des engrais", k=3, labels=LABELS)
+
+    assert [label for _, label, _ in matches] == ["agriculture", "logement"]
+    assert matches[0][0] in ("16-1QE", "16-5QE")
+
+
+def test_query_excludes_questions():
+    matches = build_index().query(
+        "Le prix des engrais azotés",
+        k=1,
+        labels=LABELS,
+        exclude_ids={"16-1QE"},
+    )
+
+    assert matches[0][0] == "16-5QE"
+
+
+def test_save_and_load_memory_mapped(tmp_path):
+    index = build_index()
+    index.save(str(tmp_path))
+    loaded = KnnIndex.load(str(tmp_path))
+
+    assert isinstance(loaded.vectors, np.memmap)
+    assert loaded.question_ids == index.question_ids
+    assert loaded.query("La hausse des loyers", k=3) == index.query(
+        "La hausse des loyers", k=3
+    )
@@ -0,0 +1,87 @@
+import pytest
+from openai import OpenAI, RateLimitError
+from utils.mock_llm_server import (
+    MockLLMServer,
+    mock_label,
+    prompt_labels,
+    prompt_texts,
+)
+
+SYSTEM_PROMPT = (
+    "La liste des thèmes est la suivante :\n- logement\n- agriculture\nRéponds."
+)
+
+
+def test_prompt_labels_names_and_letters():
+    assert prompt_labels([SYSTEM_PROMPT]) == ["logement", "agriculture"]
+    assert prompt_labels(["Thèmes :\n- A. retraites\n- B. logement\n\n- C"]) == [
+        "A",
+        "B",
+    ]
+
+
+def test_prompt_texts_of_the_providers():
+    anthropic_body = {
+        "system": [{"type": "text", "text": SYSTEM_PROMPT}],
+        "messages": [{"role": "user", "content": "Question: engrais"}],
+    }
+    gemini_body = {
+        "systemInstruction": {"parts": [{"text": SYSTEM_PROMPT}]},
+        "contents": [{"role": "user", "parts": [{"text": "Question: engrais"}]}],
+    }
+
+    assert prompt_texts("/v1/messages", anthropic_body) == (
+        [SYSTEM_PROMPT, "Question: engrais"],
+        "Question: engrais",
+    )
+    assert prompt_texts(
+        "/v1beta/models/gemini:generateContent", gemini_body
+    ) == prompt_texts("/v1/messages", anthropic_body)
+
+
+def test_mock_label_is_deterministic():
+    labels = ["logement", "agriculture", "santé"]
+
+    assert mock_label(labels, "Question: engrais") == mock_label(
+        labels, "Question: engrais"
+    )
+    assert mock_label([], "Question: engrais") == "?"
+
+
+def test_openai_completion_round_trip():
+    with MockLLMServer() as server:
+        client = OpenAI(api_key="test", base_url=f"{server.url}/v1")
+        response = client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": "Question: engrais"},
+            ],
+            logprobs=True,
+            top_logprobs=2,
+            n=3,
+        ).to_dict()
+
+        assert len(server.question_latencies()) == 1
+
+    label = mock_label(["logement", "agriculture"], "Question: engrais")
+    assert response["choices"][0]["message"]["content"] == label
+    assert len(response["choices"]) == 3
+    top_logprobs = response["choices"][0]["logprobs"]["content"][0]["top_logprobs"]
+    assert {alternative["token"] for alternative in top_logprobs} == {
+        "logement",
+        "agriculture",
+    }
+
+
+def test_rate_limit_injection():
+    with MockLLMServer(rate_limit_rate=1.0) as server:
+        client = OpenAI(api_key="test", base_url=f"{server.url}/v1", max_retries=0)
+        with pytest.raises(RateLimitError):
+            client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[{"role": "user", "content": "Question: engrais"}],
+            )
+
+        assert server.status_counts == {429: 1}
+        assert server.question_latencies() == []
@@ -0,0 +1,34 @@
+from utils.normalize_themes import (
+    build_canonical_index,
+    canonicalize_theme,
+    canonicalize_themes,
+    remove_special_chars_list,
+    to_lower_list,
+    uniformize_space_before,
+)
+
+
+def test_canonicalize_theme():
+    assert canonicalize_theme("Chômage:indemnisation") == "chomage :indemnisation"
+    assert canonicalize_theme("Impôts locaux") == "impots locaux"
+
+
+def test_canonicalize_themes_matches_chained_normalizations():
+    themes = {
+        "Écoles": 1,
+        "ecoles": 2,
+        "Retraites:généralités": 3,
+        "retraites : généralités": 4,
+        "Logement": 5,
+    }
+    chained = uniformize_space_before(to_lower_list(remove_special_chars_list(themes)))
+    assert canonicalize_themes(themes) == chained
+    assert canonicalize_themes(themes)["ecoles"] == 3
+
+
+def test_canonical_index():
+    index = build_canonical_index(["Lait et produits laitiers", "Écoles"])
+    assert index == {
+        "Lait et produits laitiers": "lait et produits laitiers",
+        "Écoles": "ecoles",
+    }
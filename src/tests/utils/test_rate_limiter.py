@@ -0,0 +1,55 @@
+from models.Prompt import WrapperEnum
+from models.RateLimit import RateLimit
+from configs.rate_limits import RATE_LIMITS, get_rate_limit
+from utils.rate_limiter import RateLimiter
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps = []
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_get_rate_limit_matches_model_prefix():
+    openai_limits = RATE_LIMITS[WrapperEnum.OpenAI]
+    assert get_rate_limit(WrapperEnum.OpenAI, "gpt-4o-mini-2024-07-18") == (
+        openai_limits["gpt-4o-mini"]
+    )
+    assert get_rate_limit(WrapperEnum.OpenAI, "gpt-4o") == openai_limits["default"]
+
+
+def test_rate_limiter_requests_per_minute():
+    clock = FakeClock()
+    limiter = RateLimiter(
+        RateLimit(requests_per_minute=60), clock=clock.time, sleep=clock.sleep
+    )
+
+    for _ in range(15):
+        limiter.acquire()
+
+    # 5 requests of burst, then one request per second.
+    assert clock.now == 10
+
+
+def test_rate_limiter_tokens_per_minute():
+    clock = FakeClock()
+    limiter = RateLimiter(
+        RateLimit(requests_per_minute=6000, tokens_per_minute=600),
+        clock=clock.time,
+        sleep=clock.sleep,
+    )
+
+    limiter.acquire(50)
+    limiter.record(50, 100)
+    limiter.acquire(10)
+
+    # The 50 tokens used above the estimate and the 10 new tokens are refilled
+    # at 10 tokens per second.
+    assert clock.now == 6
@@ -0,0 +1,151 @@
+import threading
+import time
+import pytest
+from utils.response_cache import ResponseCache, response_cache_key
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+def test_response_cache_key_is_content_addressed():
+    messages = [{"role": "user", "content": "Question : les engrais ?"}]
+    key = response_cache_key(model="gpt-4o-mini", temperature=0, messages=messages)
+
+    assert key == response_cache_key(
+        temperature=0, messages=messages, model="gpt-4o-mini"
+    )
+    assert key != response_cache_key(
+        model="gpt-4o-mini", temperature=0.5, messages=messages
+    )
+
+
+def test_response_cache_hit_and_miss(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=10_000, max_age=60)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"raw_response": "agriculture"}
+
+    assert cache.get_or_compute("a" * 64, compute) == (
+        {"raw_response": "agriculture"},
+        False,
+    )
+    assert cache.get_or_compute("a" * 64, compute) == (
+        {"raw_response": "agriculture"},
+        True,
+    )
+    assert len(calls) == 1
+
+    # Persisted on disk, so a new process reuses it.
+    assert ResponseCache(str(tmp_path), 10_000, 60).get("a" * 64) is not None
+
+
+def test_response_cache_does_not_store_invalid_responses(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=10_000, max_age=60)
+    answers = iter(["pas un thème", "agriculture"])
+
+    def compute():
+        return {"raw_response": next(answers)}
+
+    def validate(value):
+        if value["raw_response"] != "agriculture":
+            raise ValueError(value["raw_response"])
+
+    with pytest.raises(ValueError):
+        cache.get_or_compute("a" * 64, compute, validate)
+    assert cache.get("a" * 64) is None
+
+    # The retry sends the request again instead of replaying the invalid answer.
+    assert cache.get_or_compute("a" * 64, compute, validate) == (
+        {"raw_response": "agriculture"},
+        False,
+    )
+    assert cache.get("a" * 64) == {"raw_response": "agriculture"}
+
+
+def test_response_cache_temperature_opt_out(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=10_000, max_age=60)
+    assert cache.accepts(0)
+    assert not cache.accepts(0.7)
+
+    sampled_cache = ResponseCache(
+        str(tmp_path), max_bytes=10_000, max_age=60, cache_sampled=True
+    )
+    assert sampled_cache.accepts(0.7)
+
+
+def test_response_cache_age_eviction(tmp_path):
+    clock = FakeClock()
+    cache = ResponseCache(str(tmp_path), max_bytes=10_000, max_age=60, clock=clock.time)
+    cache.put("a" * 64, {"raw_response": "agriculture"})
+
+    clock.now += 30
+    assert cache.get("a" * 64) is not None
+
+    clock.now += 61
+    assert cache.get("a" * 64) is None
+    assert cache.size == 0
+
+
+def test_response_cache_age_counts_from_the_first_write(tmp_path):
+    clock = FakeClock()
+    cache = ResponseCache(str(tmp_path), max_bytes=10_000, max_age=60, clock=clock.time)
+    cache.put("a" * 64, {"raw_response": "agriculture"})
+
+    # Reusing a response does not extend its lifetime.
+    for _ in range(3):
+        clock.now += 20
+        assert cache.get("a" * 64) is not None
+
+    clock.now += 20
+    assert cache.get("a" * 64) is None
+    assert cache.size == 0
+
+
+def test_response_cache_size_eviction_is_least_recently_used(tmp_path):
+    clock = FakeClock()
+    value = {"raw_response": "x" * 100}
+    cache = ResponseCache(str(tmp_path), max_bytes=400, max_age=60, clock=clock.time)
+
+    for key in ["a", "b"]:
+        cache.put(key * 64, value)
+        clock.now += 1
+    cache.get("a" * 64)
+    clock.now += 1
+    cache.put("c" * 64, value)
+
+    assert cache.get("a" * 64) is not None
+    assert cache.get("b" * 64) is None
+    assert cache.get("c" * 64) is not None
+    assert cache.size <= 400
+
+
+def test_response_cache_single_flight(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=10_000, max_age=60)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"raw_response": "agriculture"}
+
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(cache.get_or_compute("a" * 64, compute))
+        )
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(cache_hit for _, cache_hit in results) == [False] + [True] * 4
@@ -0,0 +1,120 @@
+import os
+import json
+import time
+import threading
+from utils.result_sink import ResultSink
+
+
+class FlakyDatabase:
+    def __init__(self, failures: int = 0) -> None:
+        self.failures = failures
+        self.batches = []
+
+    def insert_many(self, documents):
+        if self.failures > 0:
+            self.failures -= 1
+            raise ConnectionError("database unreachable")
+        self.batches.append(documents)
+
+
+def _spool_files(directory):
+    return sorted(
+        file_name for file_name in os.listdir(directory) if file_name.endswith(".jsonl")
+    )
+
+
+def test_result_sink_batches_inserts(tmp_path):
+    database = FlakyDatabase()
+    sink = ResultSink(
+        str(tmp_path), database.insert_many, batch_size=2, flush_interval=0.5
+    )
+    for i in range(5):
+        sink.put({"_id": str(i), "question_id": f"15-{i}QE"})
+
+    assert sink.flush(timeout=5)
+    assert [len(batch) for batch in database.batches] == [2, 2, 1]
+    assert os.path.getsize(sink.spool.path) == 0
+
+    assert sink.close(timeout=5)
+    assert _spool_files(tmp_path) == []
+
+
+def test_result_sink_retries_until_the_database_is_back(tmp_path):
+    database = FlakyDatabase(failures=2)
+    sink = ResultSink(
+        str(tmp_path), database.insert_many, flush_interval=0.01, retry_delay=0.01
+    )
+    sink.put({"_id": "0", "question_id": "15-1QE"})
+
+    assert sink.flush(timeout=5)
+    assert database.batches == [[{"_id": "0", "question_id": "15-1QE"}]]
+    sink.close()
+
+
+def test_result_sink_recovers_the_spool_of_a_crashed_process(tmp_path):
+    unreachable_database = FlakyDatabase(failures=1_000)
+    crashed_sink = ResultSink(
+        str(tmp_path),
+        unreachable_database.insert_many,
+        flush_interval=0.01,
+        retry_delay=0.01,
+    )
+    for i in range(3):
+        crashed_sink.put({"_id": str(i), "question_id": f"15-{i}QE"})
+    assert not crashed_sink.flush(timeout=0.1)
+    # Simulate a crash: the writer stops without acknowledging anything.
+    crashed_sink.stop_event.set()
+
+    database = FlakyDatabase()
+    sink = ResultSink(str(tmp_path), database.insert_many, flush_interval=0.01)
+
+    assert sink.flush(timeout=5)
+    assert [document["_id"] for batch in database.batches for document in batch] == [
+        "0",
+        "1",
+        "2",
+    ]
+    assert not os.path.exists(crashed_sink.spool.path)
+    sink.close()
+
+
+def test_result_sink_queues_documents_in_spool_order(tmp_path):
+    release = threading.Event()
+    inserted = []
+
+    def insert_many(documents):
+        release.wait()
+        inserted.extend(document["_id"] for document in documents)
+
+    sink = ResultSink(str(tmp_path), insert_many, batch_size=16, flush_interval=0.01)
+    enqueue = sink._enqueue
+
+    def slow_enqueue(document, spool, end):
+        # The thread putting the first document is preempted after writing it.
+        if document["_id"] == "0-0":
+            time.sleep(0.1)
+        enqueue(document, spool, end)
+
+    sink._enqueue = slow_enqueue
+
+    def put_documents(worker):
+        for i in range(50):
+            sink.put({"_id": f"{worker}-{i}", "question_id": f"15-{i}QE"})
+
+    threads = [threading.Thread(target=put_documents, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Nothing is acknowledged yet, so the spool holds every line.
+    with open(sink.spool.path, "rb") as f:
+        spooled = [json.loads(line)["_id"] for line in f]
+
+    release.set()
+    assert sink.flush(timeout=10)
+    # A batch acknowledges the spool up to its last line: the lines before it
+    # must have been inserted first.
+    assert inserted == spooled
+    assert os.path.getsize(sink.spool.path) == 0
+    assert sink.close(timeout=5)
@@ -0,0 +1,110 @@
+import pytest
+from utils.theme_tree import (
+    ThemeTree,
+    cached_theme_tree,
+    changed_themes,
+    invalidate_theme_tree,
+)
+
+
+@pytest.fixture
+def theme_tree() -> ThemeTree:
+    return ThemeTree.from_hierarchy_file()
+
+
+def test_theme_tree_lookups(theme_tree):
+    theme = theme_tree.get("Agriculture", 0)
+    assert theme_tree.get_by_identifier(theme.unique_identifier) == theme
+
+
+def test_theme_tree_unknown_theme(theme_tree):
+    with pytest.raises(ValueError):
+        theme_tree.get("Agriculture", 2)
+
+
+def test_theme_tree_ancestor_at(theme_tree):
+    theme = theme_tree.get("Agriculture", 0)
+    assert theme_tree.ancestor_at(theme, 1).name == "agriculture"
+    assert theme_tree.ancestor_at(theme, 2).name == "agriculture et agroalimentaire"
+    assert (
+        theme_tree.ancestor_at(theme, 3).name
+        == "animaux, agriculture et agroalimentaire"
+    )
+
+
+def test_theme_tree_ancestor_at_stops_at_top_level_theme(theme_tree):
+    theme = theme_tree.get("budget", 1)
+    assert theme_tree.ancestor_at(theme, 3) == theme
+
+
+def test_theme_tree_descendants(theme_tree):
+    theme = theme_tree.get("agriculture", 1)
+    descendants = theme_tree.descendants(theme)
+    assert {descendant.name for descendant in descendants} >= {
+        "Agriculture",
+        "agriculture",
+    }
+    assert all(descendant.level == 0 for descendant in descendants)
+
+
+def test_cached_theme_tree_is_rebuilt_after_invalidation():
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return []
+
+    invalidate_theme_tree()
+    first_tree = cached_theme_tree(loader)
+    assert cached_theme_tree(loader) is first_tree
+    invalidate_theme_tree()
+    assert cached_theme_tree(loader) is not first_tree
+    assert len(calls) == 2
+    invalidate_theme_tree()
+
+
+def test_theme_tree_expand(theme_tree):
+    theme = theme_tree.get("agriculture et agroalimentaire", 2)
+    expansion = theme_tree.expand([theme.unique_identifier])[theme.unique_identifier]
+    assert all("children" in sub_theme for sub_theme in expansion.nested)
+    assert [sub_theme["name"] for sub_theme in expansion.flattened] == [
+        descendant.name for descendant in theme_tree.descendants(theme)
+    ]
+    assert all("children" not in sub_theme for sub_theme in expansion.flattened)
+
+
+def test_theme_tree_accepted_theme_names_are_unique(theme_tree):
+    themes = theme_tree.get_many(["agriculture", "agriculture", "unknown"], 1)
+    accepted_theme_names = theme_tree.accepted_theme_names(themes)
+    assert len(themes) == 2
+    assert len(accepted_theme_names) == len(set(accepted_theme_names))
+    assert "Agriculture" in accepted_theme_names
+
+
+def test_theme_tree_question_theme_ancestors(theme_tree):
+    theme_ancestors = theme_tree.question_theme_ancestors("Agriculture")
+    assert theme_ancestors["0"].name == "Agriculture"
+    assert theme_ancestors["1"].name == "agriculture"
+    assert theme_ancestors["3"].name == "animaux, agriculture et agroalimentaire"
+    assert theme_tree.question_theme_ancestors("unknown theme") == {}
+
+
+def test_theme_tree_rollup_totals(theme_tree):
+    agriculture = theme_tree.get("Agriculture", 0)
+    totals = theme_tree.rollup_totals({"Agriculture": 3, "unknown theme": 10})
+    assert totals[agriculture.unique_identifier] == 3
+    for ancestor in theme_tree.ancestors(agriculture):
+        assert totals[ancestor.unique_identifier] == 3
+    assert (
+        sum(totals[theme.unique_identifier] for theme in theme_tree.get_level(0)) == 3
+    )
+
+
+def test_changed_themes(theme_tree):
+    themes = list(theme_tree.themes_by_identifier.values())
+    existing_themes = [theme.model_dump() for theme in themes]
+    existing_themes[0]["total"] += 1
+    existing_themes[1]["parent_theme_identifier"] = "moved"
+    del existing_themes[2]
+
+    assert changed_themes(themes, existing_themes) == [themes[1], themes[2]]
@@ -4,6 +4,7 @@ from pymongo.results import InsertOneResult
 from tqdm import tqdm
 from models.Batch import Batch
 from models.Theme import Theme
+from utils.theme_tree import ThemeTree
 from models.Question import Question
 from databases.connector import Connector
 from models.ExportFormat import ExportFormat
@@ -116,6 +117,10 @@ def prompt_from_unique_identifier(unique_identifier: str) -> Prompt:
     return prompt
 
 
+def theme_tree() -> ThemeTree:
+    return connector.client.get_theme_tree()
+
+
 def parent_theme_from_child_theme_name(
     child_theme_name: str, stop_at_level: int = 3, base_theme_level: int = 0
 ) -> Theme:
@@ -164,21 +169,11 @@ def stratified_sample(
 
     stratified_samples_size = n // len(themes_list)
 
-    for theme_name in tqdm(themes_list):
-        theme = connector.client.get_theme(
-            {"name": theme_name, "level": level}
-        )
-        theme = dict(theme)  # type: ignore
+    tree = theme_tree()
 
-        accepted_themes_for_questions = []
-        sub_themes = connector.client.get_sub_themes_list_from_theme(
-            theme["unique_identifier"],  # type: ignore
-            flatten=True
-        )
-
-        for sub_theme in sub_themes:
-            if sub_theme["name"] not in accepted_themes_for_questions:
-                accepted_themes_for_questions.append(sub_theme["name"])
+    for theme_name in tqdm(themes_list):
+        theme = tree.get(theme_name, level)
+        accepted_themes_for_questions = tree.accepted_theme_names([theme])
 
         all_accepted_themes += accepted_themes_for_questions
 
@@ -8,6 +8,9 @@ from collections import OrderedDict
 from models.Prompt import PromptText
 from typing import List, Dict, Any, Generator
 
+# Everything after the last colon of a Chain-of-Thought answer.
+COT_LABEL_REGEX = re.compile(r"(?s).*:\s*(.*)$", re.IGNORECASE)
+
 
 def rgb_to_hex(rgb: List[float]) -> str:
     return "#{:02x}{:02x}{:02x}".format(
@@ -231,9 +234,7 @@ def retrieve_theme_from_cot_response(llm_response: str) -> str:
     'theme 1'
     """
 
-    pattern = r"(?s).*:\s*(.*)$"
-
-    match = re.search(pattern, llm_response, re.IGNORECASE)
+    match = COT_LABEL_REGEX.search(llm_response)
 
     if match:
         return match.group(1).strip().lower().replace("**", "").replace(".", "")
@@ -0,0 +1,368 @@
+import os
+import re
+import json
+import zlib
+import threading
+import numpy as np
+from configs.knn_index import (
+    KNN_INDEX_DIMENSION,
+    KNN_INDEX_DIRECTORY,
+    KNN_INDEX_PROBED_LISTS,
+)
+from typing import Collection, Dict, Iterable, List, Tuple
+
+TOKEN_REGEX = re.compile(r"\w\w+")
+# Number of buckets of the document frequencies, independent of the dimension
+# of the vectors.
+IDF_BUCKETS = 2**20
+
+
+def _features(text: str) -> List[str]:
+    """
+    The words of a text. Bigrams are left out: on a few hundred dimensions,
+    their hash collisions cost more than they bring.
+    """
+    return TOKEN_REGEX.findall(text.lower())
+
+
+def _hashes(text: str, memo: Dict[str, int] | None = None) -> np.ndarray:
+    if memo is None:
+        return np.array(
+            [zlib.crc32(feature.encode()) for feature in _features(text)],
+            dtype=np.uint32,
+        )
+
+    hashes = []
+    for feature in _features(text):
+        h = memo.get(feature)
+        if h is None:
+            h = memo[feature] = zlib.crc32(feature.encode())
+        hashes.append(h)
+
+    return np.array(hashes, dtype=np.uint32)
+
+
+def _vectorize(hashes: np.ndarray, idf: np.ndarray, dimension: int) -> np.ndarray:
+    """
+    Project the sublinear TF-IDF weights of the hashed features on `dimension`
+    signed buckets, then normalise the vector.
+    """
+    vector = np.zeros(dimension, dtype=np.float32)
+    if not len(hashes):
+        return vector
+
+    features, counts = np.unique(hashes, return_counts=True)
+    weights = (1 + np.log(counts)) * idf[features % IDF_BUCKETS]
+    signs = np.where((features >> 31) & 1, -1.0, 1.0)
+    np.add.at(vector, features % dimension, (signs * weights).astype(np.float32))
+
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def _spherical_kmeans(
+    vectors: np.ndarray, n_lists: int, iterations: int, rng: np.random.Generator
+) -> np.ndarray:
+    sample = vectors[
+        rng.choice(len(vectors), min(len(vectors), n_lists * 64), replace=False)
+    ]
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        # Empty lists keep their centroid.
+        centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+
+    return centroids.astype(np.float32)
+
+
+class KnnIndex:
+    """
+    Nearest-neighbour index of the labeled questions, on hashed TF-IDF vectors
+    of their words.
+
+    The vectors are a compact float32 matrix split into inverted lists by a
+    spherical k-means. A query only scores the questions of the lists closest
+    to it, so that it does not depend on the size of the corpus. Saved indexes
+    are memory-mapped when loaded.
+
+    Attributes
+    ----------
+    vectors: np.ndarray
+        The normalised vectors of the questions, ordered by inverted list.
+    offsets: np.ndarray
+        The start of each inverted list in `vectors`, and their end.
+    centroids: np.ndarray
+        The centroid of each inverted list.
+    idf: np.ndarray
+        The inverse document frequency of each feature bucket.
+    question_ids: List[str]
+        The question IDs, in the order of `vectors`.
+    themes: List[str]
+        The themes of the corpus.
+    theme_codes: np.ndarray
+        The index in `themes` of the theme of each question.
+    """
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        offsets: np.ndarray,
+        centroids: np.ndarray,
+        idf: np.ndarray,
+        question_ids: List[str],
+        themes: List[str],
+        theme_codes: np.ndarray,
+    ) -> None:
+        self.vectors = vectors
+        self.offsets = offsets
+        self.centroids = centroids
+        self.idf = idf
+        self.question_ids = question_ids
+        self.themes = themes
+        self.theme_codes = theme_codes
+        self.dimension = vectors.shape[1]
+
+    def __len__(self) -> int:
+        return len(self.question_ids)
+
+    @classmethod
+    def build(
+        cls,
+        questions: Iterable[Tuple[str, str, str]],
+        dimension: int = KNN_INDEX_DIMENSION,
+        n_lists: int | None = None,
+        iterations: int = 10,
+        seed: int = 0,
+    ) -> "KnnIndex":
+        """
+        Build the index of a corpus.
+
+        Parameters
+        ----------
+        questions: Iterable[Tuple[str, str, str]]
+            The ID, text and theme of each question.
+        dimension: int, default=KNN_INDEX_DIMENSION
+            The dimension of the vectors.
+        n_lists: int | None, default=None
+            The number of inverted lists, by default 4 * sqrt(number of questions).
+        iterations: int, default=10
+            The number of iterations of the k-means.
+        seed: int, default=0
+            The seed of the k-means initialisation.
+
+        Returns
+        -------
+        KnnIndex
+            The index.
+        """
+        memo: Dict[str, int] = {}
+        question_ids, all_hashes, themes_by_name, codes = [], [], {}, []
+        document_frequencies = np.zeros(IDF_BUCKETS, dtype=np.int32)
+
+        for question_id, text, theme in questions:
+            hashes = _hashes(text, memo)
+            question_ids.append(question_id)
+            all_hashes.append(hashes)
+            codes.append(themes_by_name.setdefault(theme, len(themes_by_name)))
+            document_frequencies[np.unique(hashes % IDF_BUCKETS)] += 1
+
+        idf = np.log((1 + len(question_ids)) / (1 + document_frequencies)) + 1
+        idf = idf.astype(np.float32)
+        vectors = np.stack(
+            [_vectorize(hashes, idf, dimension) for hashes in all_hashes]
+        ).astype(np.float32)
+
+        if n_lists is None:
+            n_lists = max(1, int(4 * np.sqrt(len(vectors))))
+        n_lists = min(n_lists, len(vectors))
+        rng = np.random.default_rng(seed)
+        centroids = _spherical_kmeans(vectors, n_lists, iterations, rng)
+
+        assignments = np.concatenate(
+            [
+                np.argmax(vectors[start : start + 10_000] @ centroids.T, axis=1)
+                for start in range(0, len(vectors), 10_000)
+            ]
+        )
+        order = np.argsort(assignments, kind="stable")
+        offsets = np.searchsorted(assignments[order], np.arange(n_lists + 1))
+
+        return cls(
+            vectors=np.ascontiguousarray(vectors[order]),
+            offsets=offsets.astype(np.int64),
+            centroids=centroids,
+            idf=idf,
+            question_ids=[question_ids[i] for i in order],
+            themes=list(themes_by_name),
+            theme_codes=np.array(codes, dtype=np.int32)[order],
+        )
+
+    def save(self, directory: str = KNN_INDEX_DIRECTORY) -> None:
+        """
+        Write the index to a directory.
+        """
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "vectors.npy"), self.vectors)
+        np.save(os.path.join(directory, "offsets.npy"), self.offsets)
+        np.save(os.path.join(directory, "centroids.npy"), self.centroids)
+        np.save(os.path.join(directory, "idf.npy"), self.idf)
+        np.save(os.path.join(directory, "theme_codes.npy"), self.theme_codes)
+        with open(os.path.join(directory, "metadata.json"), "w") as f:
+            json.dump({"question_ids": self.question_ids, "themes": self.themes}, f)
+
+    @classmethod
+    def load(
+        cls, directory: str = KNN_INDEX_DIRECTORY, mmap: bool = True
+    ) -> "KnnIndex":
+        """
+        Read an index written by `save`, memory-mapping its vectors by default.
+
+        Raises
+        ------
+        FileNotFoundError
+            If no index was built in the directory.
+        """
+        mmap_mode = "r" if mmap else None
+        with open(os.path.join(directory, "metadata.json"), "r") as f:
+            metadata = json.load(f)
+
+        return cls(
+            vectors=np.load(
+                os.path.join(directory, "vectors.npy"), mmap_mode=mmap_mode
+            ),
+            offsets=np.load(os.path.join(directory, "offsets.npy")),
+            centroids=np.load(os.path.join(directory, "centroids.npy")),
+            idf=np.load(os.path.join(directory, "idf.npy")),
+            question_ids=metadata["question_ids"],
+            themes=metadata["themes"],
+            theme_codes=np.load(os.path.join(directory, "theme_codes.npy")),
+        )
+
+    def vectorize(self, text: str) -> np.ndarray:
+        """
+        The normalised vector of a text.
+        """
+        return _vectorize(_hashes(text), self.idf, self.dimension)
+
+    def query(
+        self,
+        text: str,
+        k: int,
+        labels: Dict[str, str] | None = None,
+        max_per_label: int = 1,
+        exclude_ids: Collection[str] = (),
+        probed_lists: int = KNN_INDEX_PROBED_LISTS,
+    ) -> List[Tuple[str, str, float]]:
+        """
+        Find the questions most similar to a text, with at most `max_per_label`
+        questions of each label.
+
+        Parameters
+        ----------
+        text: str
+            The text of the incoming question.
+        k: int
+            The number of questions to find.
+        labels: Dict[str, str] | None, default=None
+            The label of each accepted theme, e.g. its parent theme. Questions
+            of other themes are left out. By default, the label of a question
+            is its theme.
+        max_per_label: int, default=1
+            The maximum number of questions of a same label.
+        exclude_ids: Collection[str], default=()
+            IDs of questions which must not be returned, e.g. the incoming one.
+        probed_lists: int, default=KNN_INDEX_PROBED_LISTS
+            The number of inverted lists probed first, doubled until `k`
+            questions are found.
+
+        Returns
+        -------
+        List[Tuple[str, str, float]]
+            The ID, label and cosine similarity of each question found, most
+            similar first. Fewer than `k` questions are returned if the
+            accepted labels do not allow more.
+        """
+        query_vector = self.vectorize(text)
+        lists = np.argsort(-(self.centroids @ query_vector))
+        n_lists = len(lists)
+        probed_lists = min(max(1, probed_lists), n_lists)
+        probed = 0
+        candidates: List[np.ndarray] = []
+        scores: List[np.ndarray] = []
+
+        while True:
+            for list_index in lists[probed:probed_lists]:
+                start, end = self.offsets[list_index], self.offsets[list_index + 1]
+                if start == end:
+                    continue
+                candidates.append(np.arange(start, end))
+                scores.append(np.asarray(self.vectors[start:end]) @ query_vector)
+            probed = probed_lists
+
+            matches = self._select(
+                candidates, scores, k, labels, max_per_label, exclude_ids
+            )
+            if len(matches) == k or probed == n_lists:
+                return matches
+            probed_lists = min(probed_lists * 2, n_lists)
+
+    def _select(
+        self,
+        candidates: List[np.ndarray],
+        scores: List[np.ndarray],
+        k: int,
+        labels: Dict[str, str] | None,
+        max_per_label: int,
+        exclude_ids: Collection[str],
+    ) -> List[Tuple[str, str, float]]:
+        if not len(candidates):
+            return []
+
+        all_candidates = np.concatenate(candidates)
+        all_scores = np.concatenate(scores)
+        matches: List[Tuple[str, str, float]] = []
+        counts_by_label: Dict[str, int] = {}
+
+        for i in np.argsort(-all_scores, kind="stable"):
+            position = all_candidates[i]
+            theme = self.themes[self.theme_codes[position]]
+            label = theme if labels is None else labels.get(theme)
+            if label is None or counts_by_label.get(label, 0) >= max_per_label:
+                continue
+            question_id = self.question_ids[position]
+            if question_id in exclude_ids:
+                continue
+
+            counts_by_label[label] = counts_by_label.get(label, 0) + 1
+            matches.append((question_id, label, float(all_scores[i])))
+            if len(matches) == k:
+                break
+
+        return matches
+
+
+_knn_index: KnnIndex | None = None
+_knn_index_lock = threading.Lock()
+
+
+def get_knn_index() -> KnnIndex:
+    """
+    Retrieve the process-wide index of `configs/knn_index.py`, memory-mapped on
+    the first call.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the index has not been built.
+    """
+    global _knn_index
+
+    with _knn_index_lock:
+        if _knn_index is None:
+            _knn_index = KnnIndex.load(KNN_INDEX_DIRECTORY)
+
+        return _knn_index
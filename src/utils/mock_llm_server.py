@@ -0,0 +1,421 @@
+import re
+import json
+import math
+import time
+import zlib
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utils.tokens import estimate_tokens
+from typing import Any, Callable, Dict, List, Tuple
+
+# A themes list item of a prompt, e.g. "- logement" or "- G. logement".
+THEME_LINE_REGEX = re.compile(r"^- (?:([A-Z])\. )?(.+)$")
+
+Latency = Callable[[random.Random], float]
+
+
+def constant_latency(seconds: float) -> Latency:
+    """
+    The same latency for every request.
+    """
+    return lambda rng: seconds
+
+
+def lognormal_latency(median: float, sigma: float) -> Latency:
+    """
+    Log-normal latencies, the usual shape of LLM APIs latencies: the p99 is
+    `median * exp(2.33 * sigma)`.
+    """
+    return lambda rng: median * math.exp(sigma * rng.gauss(0, 1))
+
+
+def exponential_latency(mean: float) -> Latency:
+    """
+    Exponential latencies, with a long tail of slow requests.
+    """
+    return lambda rng: rng.expovariate(1 / mean) if mean > 0 else 0.0
+
+
+def _block_texts(content: Any) -> List[str]:
+    """
+    The texts of a message content, a string or a list of content blocks.
+    """
+    if isinstance(content, str):
+        return [content]
+    return [block.get("text", "") for block in content or [] if isinstance(block, dict)]
+
+
+def prompt_texts(path: str, body: Dict[str, Any]) -> Tuple[List[str], str]:
+    """
+    The texts of a chat request and its question, the last user message.
+
+    Parameters
+    ----------
+    path: str
+        The path of the request, which tells the provider.
+    body: Dict[str, Any]
+        The JSON body of the request.
+
+    Returns
+    -------
+    Tuple[List[str], str]
+        All the texts of the request, and the one of its question.
+    """
+    texts: List[str] = []
+    question = ""
+
+    if ":generateContent" in path:
+        system = body.get("systemInstruction") or body.get("system_instruction") or {}
+        texts += _block_texts(system.get("parts"))
+        for content in body.get("contents", []):
+            content_texts = _block_texts(content.get("parts"))
+            texts += content_texts
+            if content.get("role", "user") == "user":
+                question = "\n".join(content_texts)
+    else:
+        texts += _block_texts(body.get("system"))
+        for message in body.get("messages", []):
+            message_texts = _block_texts(message.get("content"))
+            texts += message_texts
+            if message.get("role") == "user":
+                question = "\n".join(message_texts)
+
+    return texts, question
+
+
+def prompt_labels(texts: List[str]) -> List[str]:
+    """
+    The labels of the first themes list of a prompt: the letters of the themes
+    if the list associates them with letters, their names otherwise.
+    """
+    labels: List[str] = []
+    for text in texts:
+        for line in text.splitlines():
+            match = THEME_LINE_REGEX.match(line.strip())
+            if match is not None:
+                labels.append(match.group(1) or match.group(2).strip())
+            elif len(labels):
+                return labels
+
+    return labels
+
+
+def mock_label(labels: List[str], question: str, sample: int = 0) -> str:
+    """
+    The deterministic answer to a question. The samples of a question agree
+    with its first one three times out of four.
+    """
+    if not len(labels):
+        return "?"
+
+    index = zlib.crc32(question.encode("utf-8")) % len(labels)
+    if sample and not zlib.crc32(f"{sample}:{question}".encode("utf-8")) % 4:
+        index = (index + 1 + sample) % len(labels)
+
+    return labels[index]
+
+
+def _openai_logprobs(labels: List[str], label: str, top_logprobs: int) -> Dict:
+    alternatives = [label] + [other for other in labels if other != label]
+    return {
+        "content": [
+            {
+                "token": label,
+                "logprob": -0.05,
+                "bytes": list(label.encode("utf-8")),
+                "top_logprobs": [
+                    {
+                        "token": alternative,
+                        "logprob": -0.05 if i == 0 else -3.0 - i,
+                        "bytes": list(alternative.encode("utf-8")),
+                    }
+                    for i, alternative in enumerate(alternatives[:top_logprobs])
+                ],
+            }
+        ]
+    }
+
+
+def openai_completion(
+    body: Dict[str, Any], labels: List[str], question: str, prompt_tokens: int
+) -> Dict[str, Any]:
+    """
+    A chat completion of the OpenAI and Mistral APIs, with the logprobs of the
+    answers when requested.
+    """
+    choices = []
+    for index in range(body.get("n") or 1):
+        label = mock_label(labels, question, index)
+        choice = {
+            "index": index,
+            "message": {"role": "assistant", "content": label},
+            "finish_reason": "stop",
+        }
+        if body.get("logprobs"):
+            choice["logprobs"] = _openai_logprobs(
+                labels, label, body.get("top_logprobs") or 0
+            )
+        else:
+            choice["logprobs"] = None
+        choices.append(choice)
+
+    completion_tokens = sum(
+        estimate_tokens([choice["message"]["content"]]) for choice in choices
+    )
+    return {
+        "id": "chatcmpl-mock",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "mock"),
+        "choices": choices,
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def anthropic_message(
+    body: Dict[str, Any], labels: List[str], question: str, prompt_tokens: int
+) -> Dict[str, Any]:
+    """
+    A message of the Anthropic Messages API.
+    """
+    label = mock_label(labels, question)
+    return {
+        "id": "msg_mock",
+        "type": "message",
+        "role": "assistant",
+        "model": body.get("model", "mock"),
+        "content": [{"type": "text", "text": label}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {
+            "input_tokens": prompt_tokens,
+            "output_tokens": estimate_tokens([label]),
+        },
+    }
+
+
+def gemini_response(
+    body: Dict[str, Any], labels: List[str], question: str, prompt_tokens: int
+) -> Dict[str, Any]:
+    """
+    A response of the Gemini `generateContent` method.
+    """
+    label = mock_label(labels, question)
+    response_tokens = estimate_tokens([label])
+    return {
+        "candidates": [
+            {
+                "content": {"role": "model", "parts": [{"text": label}]},
+                "finishReason": "STOP",
+                "index": 0,
+            }
+        ],
+        "usageMetadata": {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": response_tokens,
+            "totalTokenCount": prompt_tokens + response_tokens,
+        },
+    }
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    """
+    Chat endpoints of the providers used by `prompting/llm_wrappers.py`: OpenAI
+    and Mistral chat completions, Anthropic messages and Gemini
+    `generateContent`.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _send_json(
+        self, payload: Dict[str, Any], status: int = 200, headers: Dict = {}
+    ) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self) -> None:
+        server: MockLLMServer = self.server.mock  # type: ignore
+        arrival = time.perf_counter()
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        path = self.path.split("?")[0]
+
+        if path.endswith("/chat/completions"):
+            build_response = openai_completion
+        elif path.endswith("/messages"):
+            build_response = anthropic_message
+        elif path.endswith(":generateContent"):
+            build_response = gemini_response
+        else:
+            self._send_json({"error": {"message": "not found"}}, status=404)
+            return
+
+        texts, question = prompt_texts(path, body)
+        status = server.draw_status()
+        if status == 429:
+            server.record(question, arrival, status)
+            self._send_json(
+                {"error": {"type": "rate_limit_error", "message": "Rate limited"}},
+                status=429,
+                headers={"Retry-After": f"{server.retry_after:g}"},
+            )
+            return
+
+        time.sleep(server.draw_latency())
+        if status != 200:
+            server.record(question, arrival, status)
+            self._send_json(
+                {"error": {"type": "api_error", "message": "Injected error"}},
+                status=status,
+            )
+            return
+
+        labels = server.labels or prompt_labels(texts)
+        response = build_response(body, labels, question, estimate_tokens(texts))
+        server.record(question, arrival, status)
+        self._send_json(response)
+
+
+class MockLLMServer:
+    """
+    Local stand-in for the LLM providers, to test and benchmark the runner
+    end to end without API calls.
+
+    Each request waits for a latency drawn from a distribution, then fails
+    with a 429 or a 500 at the given rates, or answers a label of the themes
+    list of its prompt. The label is drawn from a hash of the question, so a
+    question always gets the same answer.
+
+    Parameters
+    ----------
+    latency: Latency, default=constant_latency(0)
+        Draws the latency of a request, in seconds, from a random generator.
+    error_rate: float, default=0.0
+        Share of the requests failing with a 500, after their latency.
+    rate_limit_rate: float, default=0.0
+        Share of the requests rejected at once with a 429.
+    retry_after: float, default=0.1
+        The `Retry-After` header of the 429 responses, in seconds.
+    labels: List[str] | None, default=None
+        The answers, by default the themes list of each prompt.
+    seed: int, default=0
+        Seed of the latencies and the injected failures.
+
+    Attributes
+    ----------
+    url: str
+        The base URL of the server, once started.
+    """
+
+    def __init__(
+        self,
+        latency: Latency = constant_latency(0),
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after: float = 0.1,
+        labels: List[str] | None = None,
+        seed: int = 0,
+    ) -> None:
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.labels = labels
+        self.url = ""
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server: ThreadingHTTPServer | None = None
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Forget the requests received so far.
+        """
+        with self._lock:
+            self.status_counts: Dict[int, int] = {}
+            self._first_arrivals: Dict[str, float] = {}
+            self._answered_at: Dict[str, float] = {}
+
+    def draw_status(self) -> int:
+        with self._lock:
+            draw = self._rng.random()
+        if draw < self.rate_limit_rate:
+            return 429
+        if draw < self.rate_limit_rate + self.error_rate:
+            return 500
+        return 200
+
+    def draw_latency(self) -> float:
+        with self._lock:
+            return max(0.0, self.latency(self._rng))
+
+    def record(self, question: str, arrival: float, status: int) -> None:
+        with self._lock:
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+            self._first_arrivals.setdefault(question, arrival)
+            if status == 200:
+                self._answered_at[question] = time.perf_counter()
+
+    def question_latencies(self) -> List[float]:
+        """
+        The latency of each answered question, from its first request to its
+        last answer: retries after failures and self-consistency rounds are
+        included.
+        """
+        with self._lock:
+            return [
+                answered_at - self._first_arrivals[question]
+                for question, answered_at in self._answered_at.items()
+            ]
+
+    def start(self) -> "MockLLMServer":
+        server = ThreadingHTTPServer(("127.0.0.1", 0), MockLLMHandler)
+        server.daemon_threads = True
+        server.request_queue_size = 256
+        server.mock = self  # type: ignore
+        self._server = server
+        self.url = f"http://127.0.0.1:{server.server_address[1]}"
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def environment(self) -> Dict[str, str]:
+        """
+        The environment variables pointing the clients of
+        `prompting/llm_wrappers.py` at the server. They must be set before it
+        is imported.
+        """
+        return {
+            "OPENAI_BASE_URL": f"{self.url}/v1",
+            "OPENAI_API_KEY": "mock",
+            "ANTHROPIC_BASE_URL": self.url,
+            "ANTHROPIC_API_KEY": "mock",
+            "MISTRAL_SERVER_URL": self.url,
+            "MISTRAL_API_KEY": "mock",
+            "GEMINI_API_ENDPOINT": self.url,
+            "GEMINI_API_KEY": "mock",
+        }
+
+    def __enter__(self) -> "MockLLMServer":
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
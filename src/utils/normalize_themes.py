@@ -3,7 +3,9 @@ import re
 import json
 import argparse
 import unicodedata
-from typing import Dict
+from typing import Callable, Dict, Iterable
+
+SPACE_BEFORE_COLON_REGEX = re.compile(r"((?<=\w)\:)")
 
 
 def remove_special_chars(theme: str) -> str:
@@ -19,28 +21,65 @@ def remove_special_chars(theme: str) -> str:
     return "".join([c for c in nfkd_form if not unicodedata.combining(c)])
 
 
-def remove_special_chars_list(themes: object) -> Dict[str, int]:
+def canonicalize_theme(theme: str) -> str:
     """
-    Remove special char to all key of themes.
+    Apply all the theme normalizations at once: remove special chars, lower the
+    case and add a space before colons.
+
+    Parameters
+    ----------
+    theme: str
+            A raw theme (rubrique) name
+    """
+    clean_theme = remove_special_chars(theme).lower()
+    return SPACE_BEFORE_COLON_REGEX.sub(" :", clean_theme)
+
+
+def accumulate_themes(
+    themes: Dict[str, int], normalize: Callable[[str], str]
+) -> Dict[str, int]:
+    """
+    Normalize all the keys of themes, summing the occurences of the themes which
+    end up with the same name.
 
     Parameters
     ----------
     themes: Dict[str, int]
             Dict of all themes and their occurence in the db
+    normalize: Callable[[str], str]
+            The normalization applied to each theme
     """
-
     unique_themes_dict = {}
-    unique_list = []
-    for _, (theme, value) in enumerate(themes.items()):
-        clean_theme = remove_special_chars(theme)
-        if clean_theme in unique_list:
-            unique_themes_dict[clean_theme] += value
-        else:
-            unique_list.append(clean_theme)
-            unique_themes_dict[clean_theme] = value
+    for theme, value in themes.items():
+        clean_theme = normalize(theme)
+        unique_themes_dict[clean_theme] = unique_themes_dict.get(clean_theme, 0) + value
     return unique_themes_dict
 
 
+def canonicalize_themes(themes: Dict[str, int]) -> Dict[str, int]:
+    """
+    Canonicalize all key of themes in a single pass.
+
+    Parameters
+    ----------
+    themes: Dict[str, int]
+            Dict of all themes and their occurence in the db
+    """
+    return accumulate_themes(themes, canonicalize_theme)
+
+
+def remove_special_chars_list(themes: object) -> Dict[str, int]:
+    """
+    Remove special char to all key of themes.
+
+    Parameters
+    ----------
+    themes: Dict[str, int]
+            Dict of all themes and their occurence in the db
+    """
+    return accumulate_themes(themes, remove_special_chars)
+
+
 def to_lower_list(themes: Dict[str, int]) -> Dict[str, int]:
     """
         Apply lower to all key of themes.
@@ -50,16 +89,7 @@ def to_lower_list(themes: Dict[str, int]) -> Dict[str, int]:
     themes: Dict[str, int]
             Dict of all themes and their occurence in the db
     """
-    unique_themes_dict = {}
-    unique_list = []
-    for _, (theme, value) in enumerate(themes.items()):
-        clean_theme = theme.lower()
-        if clean_theme in unique_list:
-            unique_themes_dict[clean_theme] += value
-        else:
-            unique_list.append(clean_theme)
-            unique_themes_dict[clean_theme] = value
-    return unique_themes_dict
+    return accumulate_themes(themes, str.lower)
 
 
 def uniformize_space_before(themes: Dict[str, int]) -> Dict[str, int]:
@@ -71,16 +101,9 @@ def uniformize_space_before(themes: Dict[str, int]) -> Dict[str, int]:
     themes: Dict[str, int]
             Dict of all themes and their occurence in the db
     """
-    unique_themes_dict = {}
-    unique_list = []
-    for _, (theme, value) in enumerate(themes.items()):
-        clean_theme = re.sub(r"((?<=\w)\:)", " :", theme)
-        if clean_theme in unique_list:
-            unique_themes_dict[clean_theme] += value
-        else:
-            unique_list.append(clean_theme)
-            unique_themes_dict[clean_theme] = value
-    return unique_themes_dict
+    return accumulate_themes(
+        themes, lambda theme: SPACE_BEFORE_COLON_REGEX.sub(" :", theme)
+    )
 
 
 def open_normalize_and_save(path: str, action: str) -> str:
@@ -132,12 +155,13 @@ def normalize_function(data: Dict[str, int], action: str) -> Dict[str, int]:
         return to_lower_list(data)
     elif action == "uniformize_space_colon":
         return uniformize_space_before(data)
+    elif action == "canonicalize":
+        return canonicalize_themes(data)
 
 
 def normalize_all_themes(path: str) -> None:
     """
-    Executes a chain of function to standardize themes
-    and accumulate duplicate values
+    Standardize themes and accumulate duplicate values, in a single pass
 
     Parameters
     ----------
@@ -145,9 +169,33 @@ def normalize_all_themes(path: str) -> None:
             Path of the original file containing the themes
     """
 
-    clean_special_chars_path = open_normalize_and_save(path, "clean_special_chars")
-    to_lower_path = open_normalize_and_save(clean_special_chars_path, "to_lower")
-    open_normalize_and_save(to_lower_path, "uniformize_space_colon")
+    open_normalize_and_save(path, "canonicalize")
+
+
+def build_canonical_index(raw_themes: Iterable[str]) -> Dict[str, str]:
+    """
+    Build the index associating each raw theme (rubrique) with its canonical name
+
+    Parameters
+    ----------
+    raw_themes: Iterable[str]
+            All the raw themes, e.g. from "all_themes.json"
+    """
+    return {raw_theme: canonicalize_theme(raw_theme) for raw_theme in raw_themes}
+
+
+def canonical_index_path() -> str:
+    src_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(src_path, "data", "themes_canonical_index.json")
+
+
+def save_canonical_index(index: Dict[str, str], path: str | None = None) -> None:
+    """
+    Save the canonical themes index to disk ("data/themes_canonical_index.json"
+    by default)
+    """
+    with open(path or canonical_index_path(), "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=4, sort_keys=True)
 
 
 if __name__ == "__main__":
@@ -155,5 +203,14 @@ if __name__ == "__main__":
     parser.add_argument(
         "-file", help="path to the file .json containing the list to normalize"
     )
+    parser.add_argument(
+        "-index",
+        action="store_true",
+        help="build the canonical themes index from a .json list of raw themes",
+    )
     args = parser.parse_args()
-    normalize_all_themes(args.file)
+    if args.index:
+        with open(args.file, "r", encoding="utf-8") as f:
+            save_canonical_index(build_canonical_index(json.load(f)))
+    else:
+        normalize_all_themes(args.file)
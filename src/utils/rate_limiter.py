@@ -0,0 +1,145 @@
+import time
+import threading
+from typing import Callable, Dict, Tuple
+from models.Prompt import WrapperEnum
+from models.RateLimit import RateLimit
+from configs.rate_limits import get_rate_limit
+
+# Number of seconds of traffic which can be sent at once after an idle period.
+BURST_SECONDS = 5
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket limiting both the requests and the tokens sent per
+    minute to a provider model.
+
+    Parameters
+    ----------
+    rate_limit: RateLimit
+        The limits to enforce.
+    clock: Callable[[], float], default=time.monotonic
+        Function returning the current time in seconds.
+    sleep: Callable[[float], None], default=time.sleep
+        Function used to wait for the buckets to refill.
+    """
+
+    def __init__(
+        self,
+        rate_limit: RateLimit,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.rate_limit = rate_limit
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+
+        self.requests_per_second = rate_limit.requests_per_minute / 60
+        self.requests_capacity = max(1.0, self.requests_per_second * BURST_SECONDS)
+        self.available_requests = self.requests_capacity
+
+        if rate_limit.tokens_per_minute is not None:
+            self.tokens_per_second = rate_limit.tokens_per_minute / 60
+            self.tokens_capacity = max(1.0, self.tokens_per_second * BURST_SECONDS)
+        else:
+            self.tokens_per_second = None
+            self.tokens_capacity = None
+        self.available_tokens = self.tokens_capacity
+
+        self.last_refill = clock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        elapsed = now - self.last_refill
+        self.last_refill = now
+
+        self.available_requests = min(
+            self.requests_capacity,
+            self.available_requests + elapsed * self.requests_per_second,
+        )
+        if self.tokens_per_second is not None:
+            self.available_tokens = min(
+                self.tokens_capacity,
+                self.available_tokens + elapsed * self.tokens_per_second,
+            )
+
+    def acquire(self, tokens: int = 0) -> None:
+        """
+        Block until one request of `tokens` estimated tokens can be sent.
+
+        Parameters
+        ----------
+        tokens: int, default=0
+            The estimated number of tokens of the request. Requests larger than
+            the bucket only wait for a full bucket.
+        """
+        while True:
+            with self.lock:
+                self._refill()
+
+                wait_time = 0.0
+                if self.available_requests < 1:
+                    wait_time = (1 - self.available_requests) / self.requests_per_second
+
+                if self.tokens_per_second is not None:
+                    needed_tokens = min(tokens, self.tokens_capacity)
+                    if self.available_tokens < needed_tokens:
+                        wait_time = max(
+                            wait_time,
+                            (needed_tokens - self.available_tokens)
+                            / self.tokens_per_second,
+                        )
+
+                if wait_time == 0:
+                    self.available_requests -= 1
+                    if self.tokens_per_second is not None:
+                        self.available_tokens -= tokens
+                    return
+
+            self.sleep(wait_time)
+
+    def record(self, estimated_tokens: int, used_tokens: int) -> None:
+        """
+        Correct the token bucket once the actual usage of a request is known.
+        """
+        if self.tokens_per_second is None:
+            return
+
+        with self.lock:
+            self.available_tokens -= used_tokens - estimated_tokens
+
+
+_rate_limiters: Dict[Tuple[WrapperEnum, str], RateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(
+    wrapper: WrapperEnum, model: str, rate_limit: RateLimit | None = None
+) -> RateLimiter:
+    """
+    Retrieve the process-wide rate limiter of a provider model, so that
+    concurrent runs on the same model share the same limits.
+
+    Parameters
+    ----------
+    wrapper: WrapperEnum
+        The provider.
+    model: str
+        The model name.
+    rate_limit: RateLimit | None, default=None
+        Custom limits replacing the ones of `configs/rate_limits.py`.
+
+    Returns
+    -------
+    RateLimiter
+        The rate limiter.
+    """
+    with _rate_limiters_lock:
+        key = (wrapper, model)
+        if rate_limit is not None or key not in _rate_limiters:
+            _rate_limiters[key] = RateLimiter(
+                rate_limit or get_rate_limit(wrapper, model)
+            )
+
+        return _rate_limiters[key]
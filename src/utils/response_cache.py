@@ -0,0 +1,256 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Tuple
+from configs.response_cache import (
+    RESPONSE_CACHE_DIRECTORY,
+    RESPONSE_CACHE_MAX_AGE,
+    RESPONSE_CACHE_MAX_BYTES,
+    RESPONSE_CACHE_SAMPLED,
+)
+
+# Share of the maximum size kept after an eviction, so that evictions do not
+# happen on every write once the cache is full.
+EVICTION_RATIO = 0.9
+
+
+def response_cache_key(**request: Any) -> str:
+    """
+    Compute the content address of an LLM request.
+
+    Parameters
+    ----------
+    **request: Any
+        Every JSON-serializable value defining the response, e.g. the wrapper,
+        the model, the temperature and the rendered messages.
+
+    Returns
+    -------
+    str
+        The SHA-256 hex digest of the canonical JSON form of the request.
+    """
+    canonical = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Thread-safe on-disk cache of LLM responses, with size and age based
+    eviction. Concurrent lookups of the same key share a single computation.
+
+    Parameters
+    ----------
+    directory: str
+        The directory storing one JSON file per response.
+    max_bytes: int
+        Above this size, the least recently used responses are evicted.
+    max_age: float
+        Number of seconds after which a response is not reused, from the time
+        it was stored.
+    cache_sampled: bool, default=False
+        If True, also cache the responses sampled with a temperature above 0.
+    clock: Callable[[], float], default=time.time
+        Function returning the current time in seconds.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int,
+        max_age: float,
+        cache_sampled: bool = False,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.cache_sampled = cache_sampled
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.in_flight: Dict[str, Future] = {}
+
+        os.makedirs(directory, exist_ok=True)
+        self.size = sum(os.path.getsize(path) for path, _ in self._entries())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for file in files:
+                if file.endswith(".json"):
+                    path = os.path.join(root, file)
+                    try:
+                        yield path, os.path.getmtime(path)
+                    except FileNotFoundError:
+                        continue
+
+    def _remove(self, path: str) -> None:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        with self.lock:
+            self.size -= size
+
+    def accepts(self, temperature: float) -> bool:
+        """
+        Check if the responses sampled at a given temperature are cached.
+        """
+        return temperature == 0 or self.cache_sampled
+
+    def get(self, key: str) -> Dict[str, Any] | None:
+        """
+        Retrieve a response, marking it as recently used.
+
+        Returns
+        -------
+        Dict[str, Any] | None
+            The response, or None if it is missing or expired.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            # Entries without their creation time were stored by a previous
+            # version, whose age is unknown.
+            if (
+                "created_at" not in entry
+                or self.clock() - entry["created_at"] > self.max_age
+            ):
+                self._remove(path)
+                return None
+            # The modification time only tracks the last use, for eviction.
+            os.utime(path, (self.clock(), self.clock()))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        return entry["response"]
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        """
+        Store a response, evicting the least recently used ones if the cache
+        grows above its maximum size.
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps(
+            {"created_at": self.clock(), "response": value}, ensure_ascii=False
+        ).encode("utf-8")
+
+        # Written then renamed, so that readers never see a partial response.
+        fd, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        previous_size = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(temporary_path, path)
+        os.utime(path, (self.clock(), self.clock()))
+
+        with self.lock:
+            self.size += len(data) - previous_size
+            over_limit = self.size > self.max_bytes
+
+        if over_limit:
+            self.evict()
+
+    def evict(self) -> None:
+        """
+        Remove the expired responses, then the least recently used ones until
+        the cache fits in its maximum size.
+        """
+        now = self.clock()
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+
+        remaining = []
+        for path, last_used in entries:
+            # Unused for longer than the maximum age, so stored even before.
+            if now - last_used > self.max_age:
+                self._remove(path)
+            else:
+                remaining.append(path)
+
+        for path in remaining:
+            if self.size <= self.max_bytes * EVICTION_RATIO:
+                break
+            self._remove(path)
+
+    def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Dict[str, Any]],
+        validate: Callable[[Dict[str, Any]], None] | None = None,
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        Retrieve a response, or compute and store it. If the same key is
+        already being computed by another thread, wait for its result instead
+        of computing it twice.
+
+        Parameters
+        ----------
+        key: str
+            The content address of the request.
+        compute: Callable[[], Dict[str, Any]]
+            Function sending the request and returning the response.
+        validate: Callable[[Dict[str, Any]], None] | None, default=None
+            Function raising if a computed response is invalid. Invalid
+            responses are not stored, so that a retry sends the request again.
+
+        Returns
+        -------
+        Tuple[Dict[str, Any], bool]
+            The response, and True if it was not computed by this call.
+        """
+        with self.lock:
+            future = self.in_flight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self.in_flight[key] = future
+
+        if not is_leader:
+            return future.result(), True
+
+        try:
+            value = self.get(key)
+            cache_hit = value is not None
+            if not cache_hit:
+                value = compute()
+                if validate is not None:
+                    validate(value)
+                self.put(key, value)
+            future.set_result(value)
+            return value, cache_hit
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+
+
+_response_cache: ResponseCache | None = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """
+    Retrieve the process-wide response cache configured in
+    `configs/response_cache.py`.
+    """
+    global _response_cache
+
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache(
+                RESPONSE_CACHE_DIRECTORY,
+                max_bytes=RESPONSE_CACHE_MAX_BYTES,
+                max_age=RESPONSE_CACHE_MAX_AGE,
+                cache_sampled=RESPONSE_CACHE_SAMPLED,
+            )
+
+        return _response_cache
@@ -0,0 +1,292 @@
+import os
+import json
+import time
+import queue
+import atexit
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+from utils.logger import get_logger
+from configs.result_sink import (
+    RESULT_SINK_BATCH_SIZE,
+    RESULT_SINK_FLUSH_INTERVAL,
+    RESULT_SINK_RETRY_DELAY,
+    RESULT_SPOOL_DIRECTORY,
+)
+
+logger = get_logger()
+
+
+class SpoolFile:
+    """
+    Append-only JSON lines file, with the offset up to which its documents have
+    been written to the database stored next to it.
+
+    Parameters
+    ----------
+    path: str
+        The path of the spool file.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.offset_path = f"{path}.offset"
+
+    def read_offset(self) -> int:
+        try:
+            with open(self.offset_path, "r") as f:
+                return int(f.read() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def write_offset(self, offset: int) -> None:
+        temporary_path = f"{self.offset_path}.tmp"
+        with open(temporary_path, "w") as f:
+            f.write(str(offset))
+        os.replace(temporary_path, self.offset_path)
+
+    def pending(self) -> Iterator[Tuple[Dict[str, Any], int]]:
+        """
+        Iterate over the documents not written to the database yet, with the
+        offset of the end of their line.
+        """
+        with open(self.path, "rb") as f:
+            f.seek(self.read_offset())
+            for line in iter(f.readline, b""):
+                # A partial last line was never acknowledged to the caller.
+                if not line.endswith(b"\n"):
+                    break
+                yield json.loads(line), f.tell()
+
+    def remove(self) -> None:
+        for path in [self.path, self.offset_path]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def _is_process_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ResultSink:
+    """
+    Background writer batching documents into bulk inserts. Documents are first
+    appended to a local spool file, so that they are not lost if the database
+    is unreachable or if the process crashes: the writer retries until the
+    database is back, and the spool files left by dead processes are drained
+    by the next sink.
+
+    Parameters
+    ----------
+    directory: str
+        The directory of the spool files.
+    insert_many: Callable[[List[Dict[str, Any]]], Any]
+        Function writing a batch of documents to the database. It must be
+        idempotent, since a batch is written again if the process crashes
+        before acknowledging it.
+    batch_size: int, default=RESULT_SINK_BATCH_SIZE
+        Maximum number of documents per insert.
+    flush_interval: float, default=RESULT_SINK_FLUSH_INTERVAL
+        Maximum number of seconds a document waits for its batch to fill.
+    retry_delay: float, default=RESULT_SINK_RETRY_DELAY
+        Number of seconds between two attempts of a failed insert.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        insert_many: Callable[[List[Dict[str, Any]]], Any],
+        batch_size: int = RESULT_SINK_BATCH_SIZE,
+        flush_interval: float = RESULT_SINK_FLUSH_INTERVAL,
+        retry_delay: float = RESULT_SINK_RETRY_DELAY,
+    ) -> None:
+        self.insert_many = insert_many
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_delay = retry_delay
+
+        self.queue: queue.Queue = queue.Queue()
+        self.write_lock = threading.Lock()
+        self.pending_condition = threading.Condition()
+        self.pending_count = 0
+        self.stop_event = threading.Event()
+
+        os.makedirs(directory, exist_ok=True)
+        self.spool = SpoolFile(
+            os.path.join(directory, f"{time.time_ns()}-{os.getpid()}.jsonl")
+        )
+        self.file = open(self.spool.path, "ab")
+
+        self._adopt_orphan_spools(directory)
+
+        self.thread = threading.Thread(target=self._drain, daemon=True)
+        self.thread.start()
+
+    def _adopt_orphan_spools(self, directory: str) -> None:
+        """
+        Queue the documents left in the spool files of dead processes.
+        """
+        for file_name in sorted(os.listdir(directory)):
+            if not file_name.endswith(".jsonl"):
+                continue
+            path = os.path.join(directory, file_name)
+            pid = int(file_name[: -len(".jsonl")].split("-")[-1])
+            if path == self.spool.path or _is_process_alive(pid):
+                continue
+
+            spool = SpoolFile(path)
+            documents = list(spool.pending())
+            if not len(documents):
+                spool.remove()
+                continue
+
+            logger.info(f"Recovering {len(documents)} spooled documents from {path}")
+            for document, end_offset in documents:
+                self._enqueue(document, spool, end_offset)
+
+    def _enqueue(self, document: Dict[str, Any], spool: SpoolFile, end: int) -> None:
+        with self.pending_condition:
+            self.pending_count += 1
+        self.queue.put((document, spool, end))
+
+    def put(self, document: Dict[str, Any]) -> None:
+        """
+        Append a document to the spool and queue it for insertion.
+
+        Parameters
+        ----------
+        document: Dict[str, Any]
+            A JSON-serializable document.
+        """
+        line = (json.dumps(document, ensure_ascii=False) + "\n").encode("utf-8")
+        with self.write_lock:
+            self.file.write(line)
+            self.file.flush()
+            # Queued in the order of the spool, since acknowledging a batch
+            # acknowledges every line before its last one.
+            self._enqueue(document, self.spool, self.file.tell())
+
+    def _next_batch(self) -> List[Tuple[Dict[str, Any], SpoolFile, int]]:
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _insert(self, documents: List[Dict[str, Any]]) -> bool:
+        """
+        Insert a batch, retrying until it succeeds or the sink is closed.
+        """
+        while True:
+            try:
+                self.insert_many(documents)
+                return True
+            except Exception as e:
+                logger.error(
+                    f"Could not write {len(documents)} documents ({e}), "
+                    f"retrying in {self.retry_delay} seconds"
+                )
+                if self.stop_event.wait(self.retry_delay):
+                    return False
+
+    def _acknowledge(self, batch: List[Tuple[Dict[str, Any], SpoolFile, int]]) -> None:
+        end_offsets: Dict[str, Tuple[SpoolFile, int]] = {}
+        for _, spool, end_offset in batch:
+            end_offsets[spool.path] = (spool, end_offset)
+
+        for spool, end_offset in end_offsets.values():
+            if spool is not self.spool:
+                spool.write_offset(end_offset)
+                if end_offset >= os.path.getsize(spool.path):
+                    spool.remove()
+                continue
+
+            with self.write_lock:
+                # Every line of the spool is written: start it over.
+                if not self.file.closed and end_offset == self.file.tell():
+                    self.file.truncate(0)
+                    self.file.seek(0)
+                    end_offset = 0
+                self.spool.write_offset(end_offset)
+
+        with self.pending_condition:
+            self.pending_count -= len(batch)
+            self.pending_condition.notify_all()
+
+    def _drain(self) -> None:
+        while not self.stop_event.is_set():
+            batch = self._next_batch()
+            if self._insert([document for document, _, _ in batch]):
+                self._acknowledge(batch)
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """
+        Wait until every queued document is written to the database.
+
+        Parameters
+        ----------
+        timeout: float | None, default=None
+            Maximum number of seconds to wait.
+
+        Returns
+        -------
+        bool
+            True if every document is written, False if some are still only in
+            the spool.
+        """
+        with self.pending_condition:
+            return self.pending_condition.wait_for(
+                lambda: self.pending_count == 0, timeout
+            )
+
+    def close(self, timeout: float | None = None) -> bool:
+        """
+        Flush the sink and stop its writer. Documents which could not be
+        written stay in the spool for the next sink.
+        """
+        flushed = self.flush(timeout)
+        self.stop_event.set()
+        with self.write_lock:
+            self.file.close()
+        if flushed:
+            self.spool.remove()
+
+        return flushed
+
+
+_result_sink: ResultSink | None = None
+_result_sink_lock = threading.Lock()
+
+
+def get_result_sink(
+    insert_many: Callable[[List[Dict[str, Any]]], Any],
+) -> ResultSink:
+    """
+    Retrieve the process-wide result sink configured in
+    `configs/result_sink.py`, creating it with `insert_many` on first use. It is
+    flushed for a few seconds when the process exits.
+    """
+    global _result_sink
+
+    with _result_sink_lock:
+        if _result_sink is None:
+            _result_sink = ResultSink(RESULT_SPOOL_DIRECTORY, insert_many)
+            atexit.register(_result_sink.close, RESULT_SINK_FLUSH_INTERVAL * 5)
+
+        return _result_sink
@@ -0,0 +1,461 @@
+import json
+import threading
+from pathlib import Path
+from models.Theme import SubThemes, Theme
+from models.Question import ThemeAncestor
+from configs.env import get_src_path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from utils.helpers import flatten_list, generate_theme_unique_identifier
+
+
+class ThemeTree:
+    """
+    In-memory index of the themes hierarchy.
+
+    Themes can be looked up by name and level or by unique identifier, and the
+    hierarchy can be walked up (`ancestor_at`) or down (`descendants`) without
+    any database round trip.
+
+    Attributes
+    ----------
+    themes_by_identifier: Dict[str, Theme]
+        Themes indexed by their unique identifier.
+    themes_by_name: Dict[Tuple[str, int], Theme]
+        Themes indexed by their name and level.
+    children_by_identifier: Dict[str, List[Theme]]
+        Children themes indexed by the unique identifier of their parent.
+    """
+
+    def __init__(self, themes: Iterable[Theme | Dict[str, Any]]) -> None:
+        self.themes_by_identifier: Dict[str, Theme] = {}
+        self.themes_by_name: Dict[Tuple[str, int], Theme] = {}
+        self.children_by_identifier: Dict[str, List[Theme]] = {}
+
+        for theme in themes:
+            if not isinstance(theme, Theme):
+                theme = Theme(**theme)
+            self.themes_by_identifier[theme.unique_identifier] = theme
+            self.themes_by_name[(theme.name, theme.level)] = theme
+
+        for theme in self.themes_by_identifier.values():
+            if theme.parent_theme_identifier is not None:
+                self.children_by_identifier.setdefault(
+                    theme.parent_theme_identifier, []
+                ).append(theme)
+
+    def __len__(self) -> int:
+        return len(self.themes_by_identifier)
+
+    @classmethod
+    def from_hierarchy(cls, hierarchy: List[Dict[str, Any]]) -> "ThemeTree":
+        """
+        Build the tree from the nested representation of `data/hierarchy.json`.
+
+        Parameters
+        ----------
+        hierarchy: List[Dict[str, Any]]
+            The top-level themes, each one containing its `children`.
+
+        Returns
+        -------
+        ThemeTree
+            The themes tree.
+        """
+        return cls(flatten_hierarchy(hierarchy))
+
+    @classmethod
+    def from_hierarchy_file(cls, path: str | None = None) -> "ThemeTree":
+        """
+        Build the tree from a hierarchy JSON file.
+
+        Parameters
+        ----------
+        path: str | None, default=None
+            Path to the hierarchy file. Defaults to `data/hierarchy.json`.
+
+        Returns
+        -------
+        ThemeTree
+            The themes tree.
+        """
+        if path is None:
+            path = f"{get_src_path(Path(__file__))}/data/hierarchy.json"
+
+        with open(path, "r", encoding="utf-8") as file:
+            return cls.from_hierarchy(json.load(file))
+
+    def get(self, name: str, level: int) -> Theme:
+        """
+        Retrieve a theme from its name and level.
+
+        Raises
+        ------
+        ValueError
+            If the theme does not exist.
+        """
+        try:
+            return self.themes_by_name[(name, level)]
+        except KeyError:
+            raise ValueError(
+                f"There are no theme named '{name}' at level {level} in the hierarchy."
+            )
+
+    def get_many(self, names: Iterable[str], level: int) -> List[Theme]:
+        """
+        Retrieve the themes matching the given names at a given level, ignoring
+        the names which are not in the hierarchy.
+        """
+        return [
+            self.themes_by_name[(name, level)]
+            for name in names
+            if (name, level) in self.themes_by_name
+        ]
+
+    def get_level(self, level: int) -> List[Theme]:
+        """
+        Retrieve all the themes of a given level.
+        """
+        return [
+            theme
+            for (_, theme_level), theme in self.themes_by_name.items()
+            if theme_level == level
+        ]
+
+    def get_by_identifier(self, unique_identifier: str) -> Theme:
+        """
+        Retrieve a theme from its unique identifier.
+
+        Raises
+        ------
+        ValueError
+            If the theme does not exist.
+        """
+        try:
+            return self.themes_by_identifier[unique_identifier]
+        except KeyError:
+            raise ValueError(
+                f"There are no theme with identifier '{unique_identifier}' "
+                "in the hierarchy."
+            )
+
+    def parent(self, theme: Theme) -> Optional[Theme]:
+        """
+        Retrieve the direct parent of a theme, or None for a top-level theme.
+        """
+        if theme.parent_theme_identifier is None:
+            return None
+        return self.themes_by_identifier.get(theme.parent_theme_identifier)
+
+    def ancestors(self, theme: Theme) -> List[Theme]:
+        """
+        Retrieve all the ancestors of a theme, from its parent to the top-level theme.
+        """
+        ancestors = []
+        parent = self.parent(theme)
+        while parent is not None:
+            ancestors.append(parent)
+            parent = self.parent(parent)
+
+        return ancestors
+
+    def ancestor_at(self, theme: Theme, level: int) -> Theme:
+        """
+        Retrieve the ancestor of a theme at a given hierarchy level.
+
+        Parameters
+        ----------
+        theme: Theme
+            The theme from which to start.
+        level: int
+            The hierarchy level at which to stop.
+
+        Returns
+        -------
+        Theme
+            The ancestor at the given level. If the branch stops below that level
+            (e.g. level 1 themes without parent), the top-level theme of the
+            branch is returned.
+        """
+        while theme.level < level:
+            parent = self.parent(theme)
+            if parent is None:
+                break
+            theme = parent
+
+        return theme
+
+    def theme_ancestors(self, theme: Theme) -> Dict[str, ThemeAncestor]:
+        """
+        Compute the ancestor of a theme at each level of the hierarchy, as stored
+        on questions.
+
+        Parameters
+        ----------
+        theme: Theme
+            A level 0 theme.
+
+        Returns
+        -------
+        Dict[str, ThemeAncestor]
+            The ancestors indexed by level, from the theme level up to the deepest
+            level of the hierarchy (see `ancestor_at` for truncated branches).
+        """
+        max_level = max(level for _, level in self.themes_by_name)
+        ancestors = {}
+        for level in range(theme.level, max_level + 1):
+            ancestor = self.ancestor_at(theme, level)
+            ancestors[str(level)] = ThemeAncestor(
+                name=ancestor.name, unique_identifier=ancestor.unique_identifier
+            )
+
+        return ancestors
+
+    def question_theme_ancestors(self, theme_name: str) -> Dict[str, ThemeAncestor]:
+        """
+        Compute the ancestors of a question theme (a level 0 theme name). Unknown
+        themes have no ancestor.
+        """
+        theme = self.themes_by_name.get((theme_name, 0))
+        if theme is None:
+            return {}
+
+        return self.theme_ancestors(theme)
+
+    def rollup_totals(self, counts_by_theme_name: Dict[str, int]) -> Dict[str, int]:
+        """
+        Propagate the number of questions of each level 0 theme up the hierarchy:
+        the total of a theme is the sum of the totals of its children.
+
+        Parameters
+        ----------
+        counts_by_theme_name: Dict[str, int]
+            The number of questions indexed by level 0 theme name.
+
+        Returns
+        -------
+        Dict[str, int]
+            The total of every theme, indexed by unique identifier.
+        """
+        totals = {}
+        for theme in sorted(self.themes_by_identifier.values(), key=lambda t: t.level):
+            if theme.level == 0:
+                totals[theme.unique_identifier] = counts_by_theme_name.get(
+                    theme.name, 0
+                )
+            else:
+                totals[theme.unique_identifier] = sum(
+                    totals.get(child.unique_identifier, 0)
+                    for child in self.children(theme)
+                )
+
+        return totals
+
+    def children(self, theme: Theme) -> List[Theme]:
+        """
+        Retrieve the direct children of a theme.
+        """
+        return self.children_by_identifier.get(theme.unique_identifier, [])
+
+    def descendants(self, theme: Theme) -> List[Theme]:
+        """
+        Retrieve all the descendants of a theme, in depth-first order.
+        """
+        descendants = []
+        stack = list(reversed(self.children(theme)))
+        while stack:
+            child = stack.pop()
+            descendants.append(child)
+            stack.extend(reversed(self.children(child)))
+
+        return descendants
+
+    def sub_themes(self, theme_identifier: str) -> List[Dict[str, Any]]:
+        """
+        Build the nested list of sub-themes of a theme, in the same format as
+        `data/hierarchy.json` (`name`, `level`, `total` and optional `children`).
+
+        Parameters
+        ----------
+        theme_identifier: str
+            The unique identifier of the parent theme.
+
+        Returns
+        -------
+        List[Dict[str, Any]]
+            The nested sub-themes. Empty if the theme is unknown or has no child.
+        """
+        themes = []
+        for child in self.children_by_identifier.get(theme_identifier, []):
+            theme = {"name": child.name, "level": child.level, "total": child.total}
+            children = self.sub_themes(child.unique_identifier)
+            if len(children):
+                theme["children"] = children
+            themes.append(theme)
+
+        return themes
+
+    def expand(self, theme_identifiers: Iterable[str]) -> Dict[str, SubThemes]:
+        """
+        Expand several themes at once into their nested and flattened sub-themes.
+
+        Parameters
+        ----------
+        theme_identifiers: Iterable[str]
+            The unique identifiers of the themes to expand.
+
+        Returns
+        -------
+        Dict[str, SubThemes]
+            The sub-themes of each theme, indexed by the theme unique identifier.
+        """
+        expansions = {}
+        for theme_identifier in theme_identifiers:
+            nested = self.sub_themes(theme_identifier)
+            expansions[theme_identifier] = SubThemes(
+                nested=nested, flattened=flatten_list(nested, "children")
+            )
+
+        return expansions
+
+    def accepted_theme_names(self, themes: Iterable[Theme]) -> List[str]:
+        """
+        Retrieve the names of all the sub-themes of the given themes, without
+        duplicates and in hierarchy order.
+
+        Parameters
+        ----------
+        themes: Iterable[Theme]
+            The high-level themes.
+
+        Returns
+        -------
+        List[str]
+            The names of the sub-themes, used to filter questions by theme.
+        """
+        seen_names = set()
+        accepted_names = []
+        for theme in themes:
+            for descendant in self.descendants(theme):
+                if descendant.name not in seen_names:
+                    seen_names.add(descendant.name)
+                    accepted_names.append(descendant.name)
+
+        return accepted_names
+
+
+def flatten_hierarchy(
+    hierarchy: List[Dict[str, Any]], parent_identifier: str | None = None
+) -> List[Theme]:
+    """
+    Flatten the nested themes hierarchy into theme documents, computing the
+    unique identifier of each theme and the one of its parent.
+
+    Parameters
+    ----------
+    hierarchy: List[Dict[str, Any]]
+        The nested themes hierarchy.
+    parent_identifier: str | None, default=None
+        The unique identifier of the parent of the given themes.
+
+    Returns
+    -------
+    List[Theme]
+        All the themes of the hierarchy, parents first.
+    """
+    themes = []
+    for node in hierarchy:
+        unique_identifier = generate_theme_unique_identifier(
+            node["name"], node["level"]
+        )
+        themes.append(
+            Theme(
+                name=node["name"],
+                parent_theme_identifier=parent_identifier,
+                unique_identifier=unique_identifier,
+                level=node["level"],
+                total=node["total"],
+            )
+        )
+        themes += flatten_hierarchy(node.get("children", []), unique_identifier)
+
+    return themes
+
+
+STRUCTURAL_THEME_FIELDS = ("name", "parent_theme_identifier", "level")
+
+
+def changed_themes(
+    themes: Iterable[Theme], existing_themes: Iterable[Dict[str, Any]]
+) -> List[Theme]:
+    """
+    Select the themes which are new or whose place in the hierarchy changed.
+
+    Parameters
+    ----------
+    themes: Iterable[Theme]
+        The themes to import.
+    existing_themes: Iterable[Dict[str, Any]]
+        The theme documents already in the database.
+
+    Returns
+    -------
+    List[Theme]
+        The themes to write. The `total` field is not compared, since it is
+        computed from the questions.
+    """
+    existing_themes_by_identifier = {
+        existing_theme["unique_identifier"]: existing_theme
+        for existing_theme in existing_themes
+    }
+
+    changes = []
+    for theme in themes:
+        existing_theme = existing_themes_by_identifier.get(theme.unique_identifier)
+        if existing_theme is None or any(
+            existing_theme.get(field) != getattr(theme, field)
+            for field in STRUCTURAL_THEME_FIELDS
+        ):
+            changes.append(theme)
+
+    return changes
+
+
+_theme_tree: ThemeTree | None = None
+_theme_tree_lock = threading.Lock()
+
+
+def cached_theme_tree(loader: Callable[[], Iterable[Dict[str, Any]]]) -> ThemeTree:
+    """
+    Retrieve the process-wide themes tree, building it on first use.
+
+    Parameters
+    ----------
+    loader: Callable[[], Iterable[Dict[str, Any]]]
+        A function returning all the theme documents. If it returns no theme,
+        the tree is built from `data/hierarchy.json`.
+
+    Returns
+    -------
+    ThemeTree
+        The themes tree.
+    """
+    global _theme_tree
+
+    with _theme_tree_lock:
+        if _theme_tree is None:
+            tree = ThemeTree(loader())
+            if not len(tree):
+                tree = ThemeTree.from_hierarchy_file()
+            _theme_tree = tree
+
+        return _theme_tree
+
+
+def invalidate_theme_tree() -> None:
+    """
+    Drop the process-wide themes tree. It is rebuilt on next use.
+    """
+    global _theme_tree
+
+    with _theme_tree_lock:
+        _theme_tree = None
@@ -0,0 +1,85 @@
+import threading
+from models.Pricing import Pricing
+from errors.BudgetExceededException import BudgetExceededException
+
+
+class TokenBudget:
+    """
+    Thread-safe hard limit on the tokens and the cost of a prompt run. Requests
+    reserve their estimated usage before being sent, so that concurrent
+    requests cannot exceed the budget together.
+
+    Parameters
+    ----------
+    pricing: Pricing
+        The price of the model.
+    max_tokens: int | None, default=None
+        Maximum number of prompt and response tokens.
+    max_cost: float | None, default=None
+        Maximum cost, in US dollars.
+    """
+
+    def __init__(
+        self,
+        pricing: Pricing,
+        max_tokens: int | None = None,
+        max_cost: float | None = None,
+    ) -> None:
+        self.pricing = pricing
+        self.max_tokens = max_tokens
+        self.max_cost = max_cost
+        self.lock = threading.Lock()
+
+        self.used_tokens = 0
+        self.used_cost = 0.0
+
+    def reserve(self, prompt_tokens: int, response_tokens: int) -> None:
+        """
+        Reserve the estimated usage of a request.
+
+        Raises
+        ------
+        BudgetExceededException
+            If the request could exceed the budget.
+        """
+        cost = self.pricing.cost(prompt_tokens, response_tokens)
+
+        with self.lock:
+            tokens = prompt_tokens + response_tokens
+            if self.max_tokens is not None and self.used_tokens + tokens > (
+                self.max_tokens
+            ):
+                raise BudgetExceededException(
+                    f"The token budget of {self.max_tokens} tokens is exhausted "
+                    f"({self.used_tokens} used)."
+                )
+            if self.max_cost is not None and self.used_cost + cost > self.max_cost:
+                raise BudgetExceededException(
+                    f"The budget of ${self.max_cost:.2f} is exhausted "
+                    f"(${self.used_cost:.2f} used)."
+                )
+
+            self.used_tokens += tokens
+            self.used_cost += cost
+
+    def record(
+        self,
+        reserved_prompt_tokens: int,
+        reserved_response_tokens: int,
+        prompt_tokens: int,
+        response_tokens: int,
+        cached_prompt_tokens: int = 0,
+    ) -> None:
+        """
+        Replace the reservation of a request by its actual usage.
+        """
+        with self.lock:
+            self.used_tokens += (
+                prompt_tokens
+                + response_tokens
+                - reserved_prompt_tokens
+                - reserved_response_tokens
+            )
+            self.used_cost += self.pricing.cost(
+                prompt_tokens, response_tokens, cached_prompt_tokens
+            ) - self.pricing.cost(reserved_prompt_tokens, reserved_response_tokens)
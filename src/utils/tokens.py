@@ -0,0 +1,99 @@
+import math
+from functools import lru_cache
+from typing import Any, Iterable
+from models.Prompt import WrapperEnum
+
+CHARACTERS_PER_TOKEN = 4
+
+# Average number of characters per token of French parliamentary questions, for
+# the providers without a local tokenizer.
+CALIBRATED_CHARACTERS_PER_TOKEN = {
+    WrapperEnum.OpenAI: 4.0,
+    WrapperEnum.Anthropic: 3.5,
+    WrapperEnum.Mistral: 3.4,
+    WrapperEnum.Google: 4.0,
+}
+
+# Tokens added by the chat format around each message.
+TOKENS_PER_MESSAGE = 4
+
+
+def estimate_tokens(texts: Iterable[str]) -> int:
+    """
+    Estimate the number of tokens of some texts, with the usual approximation of
+    four characters per token.
+
+    Parameters
+    ----------
+    texts: Iterable[str]
+        The texts sent to the LLM.
+
+    Returns
+    -------
+    int
+        The estimated number of tokens.
+    """
+    return sum(len(text) for text in texts) // CHARACTERS_PER_TOKEN + 1
+
+
+@lru_cache(maxsize=8)
+def _get_tiktoken_encoding(model: str) -> Any:
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as _:
+        # The encodings are downloaded on first use.
+        return None
+
+
+class TokenCounter:
+    """
+    Count the tokens of the texts sent to a provider model, with the model
+    tokenizer when it is available locally (tiktoken for OpenAI), otherwise
+    with a calibrated characters per token approximation.
+
+    Parameters
+    ----------
+    wrapper: WrapperEnum
+        The provider.
+    model: str
+        The model name.
+    """
+
+    def __init__(self, wrapper: WrapperEnum, model: str) -> None:
+        self.wrapper = wrapper
+        self.model = model
+        self.encoding = (
+            _get_tiktoken_encoding(model) if wrapper == WrapperEnum.OpenAI else None
+        )
+        self.characters_per_token = CALIBRATED_CHARACTERS_PER_TOKEN[wrapper]
+
+    @property
+    def is_exact(self) -> bool:
+        """
+        True if the counts come from the model tokenizer.
+        """
+        return self.encoding is not None
+
+    def count(self, text: str) -> int:
+        """
+        Count the tokens of a text.
+        """
+        if self.encoding is not None:
+            return len(self.encoding.encode(text))
+
+        return math.ceil(len(text) / self.characters_per_token)
+
+    def count_messages(self, messages: Iterable[dict]) -> int:
+        """
+        Count the tokens of chat messages, formatting overhead included.
+        """
+        return sum(
+            self.count(message["content"]) + TOKENS_PER_MESSAGE for message in messages
+        )